@@ -1,10 +1,20 @@
+import base64
+import json
 import logging
-import httpx
 from datetime import datetime
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, Body, status
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Path,
+    Query,
+    Response,
+    status,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, insert, func
+from sqlalchemy import select, insert, func, any_, tuple_
 from sqlalchemy.exc import IntegrityError
 
 from app.models.inventory import (
@@ -14,13 +24,39 @@ from app.models.inventory import (
     InventoryItemUpdate,
     InventoryItemResponse,
     InventoryCheck,
+    InventoryCheckBatch,
     InventoryReserve,
     InventoryRelease,
+    InventoryReserveBatch,
+    InventoryReserveOrders,
+    InventoryReleaseBatch,
+    InventoryReleaseOrders,
     InventoryAdjust,
 )
 from app.api.dependencies import get_current_user, is_admin
 from app.db.postgresql import get_db
+from app.services.low_stock import low_stock_notifier
 from app.services.product import product_service
+from app.services.reservations import (
+    close_reservation,
+    close_reservations,
+    lock_orders,
+    record_reservations,
+)
+from app.services.stock import (
+    TOTAL_AVAILABLE,
+    TOTAL_RESERVED,
+    adjust_stock,
+    fold_buckets,
+    items_with_escrow,
+    lock_items,
+    move_stock,
+    product_ids_param,
+    release_stock,
+    reserve_stock,
+    select_items,
+)
+from app.services.stock_cache import stock_cache
 from app.core.config import settings
 
 # Configure logger
@@ -30,6 +66,39 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="", tags=["inventory"])
 
 
+def _sum_quantities(items) -> Dict[str, int]:
+    """Sum requested quantities per product, keyed in product_id order."""
+    requested: Dict[str, int] = {}
+    for line in items:
+        requested[line.product_id] = requested.get(line.product_id, 0) + line.quantity
+    return dict(sorted(requested.items()))
+
+
+async def _order_movements(db: AsyncSession, order_id: str) -> set:
+    """Return which of reserve/release have already been recorded for an order."""
+    result = await db.execute(
+        select(InventoryHistory.change_type)
+        .where(
+            InventoryHistory.reference_id == order_id,
+            InventoryHistory.change_type.in_(["reserve", "release"]),
+        )
+        .distinct()
+    )
+    return set(result.scalars().all())
+
+
+def _current_items(locked: Dict[str, Any], quantities: Dict[str, int]):
+    return [
+        {
+            "product_id": product_id,
+            "quantity": quantities.get(product_id, 0),
+            "available_quantity": row.available_quantity,
+            "reserved_quantity": row.reserved_quantity,
+        }
+        for product_id, row in locked.items()
+    ]
+
+
 @router.post("/", response_model=InventoryItemResponse, status_code=201)
 async def create_inventory_item(
     item: InventoryItemCreate,
@@ -103,16 +172,14 @@ async def get_inventory_items(
     """
     Get all inventory items with optional filtering.
     """
-    query = select(InventoryItem)
+    query = select_items()
 
     if low_stock_only:
-        query = query.where(
-            InventoryItem.available_quantity <= InventoryItem.reorder_threshold
-        )
+        query = query.where(TOTAL_AVAILABLE <= InventoryItem.reorder_threshold)
 
     query = query.offset(skip).limit(limit)
     result = await db.execute(query)
-    items = result.scalars().all()
+    items = items_with_escrow(result)
 
     return items
 
@@ -121,31 +188,83 @@ async def get_inventory_items(
 async def check_inventory(
     product_id: str = Query(..., description="Product ID to check"),
     quantity: int = Query(..., gt=0, description="Quantity to check"),
+    strict: bool = Query(
+        False, description="Read from the database instead of the cache"
+    ),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Check if a product has sufficient available inventory.
+
+    Quantities may be served from a cache that lags writes by the time a
+    change notification takes to arrive; pass strict=true to bypass it.
     """
-    query = select(InventoryItem).where(InventoryItem.product_id == product_id)
-    result = await db.execute(query)
-    item = result.scalars().first()
+    quantities = await stock_cache.get_quantities(db, product_id, strict=strict)
 
-    if not item:
+    if quantities is None:
         return {
             "available": False,
             "message": f"Product {product_id} not found in inventory",
         }
 
-    is_available = item.available_quantity >= quantity
+    available_quantity, _ = quantities
+    is_available = available_quantity >= quantity
 
     return {
         "available": is_available,
-        "current_quantity": item.available_quantity,
+        "current_quantity": available_quantity,
         "requested_quantity": quantity,
         "product_id": product_id,
     }
 
 
+@router.post("/check-batch", response_model=Dict[str, Any])
+async def check_inventory_batch(
+    batch: InventoryCheckBatch,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Check availability for several products with a single query.
+
+    Quantities for a product listed more than once are summed before
+    being compared with its available quantity.
+    """
+    requested = _sum_quantities(batch.items)
+
+    query = select(
+        InventoryItem.product_id, TOTAL_AVAILABLE.label("available_quantity")
+    ).where(InventoryItem.product_id == any_(product_ids_param(list(requested))))
+    result = await db.execute(query)
+    current = {row.product_id: row.available_quantity for row in result}
+
+    items = []
+    for product_id, quantity in requested.items():
+        if product_id not in current:
+            items.append(
+                {
+                    "product_id": product_id,
+                    "available": False,
+                    "requested_quantity": quantity,
+                    "message": f"Product {product_id} not found in inventory",
+                }
+            )
+            continue
+
+        items.append(
+            {
+                "product_id": product_id,
+                "available": current[product_id] >= quantity,
+                "current_quantity": current[product_id],
+                "requested_quantity": quantity,
+            }
+        )
+
+    return {
+        "available": all(item["available"] for item in items),
+        "items": items,
+    }
+
+
 @router.get("/{product_id}", response_model=InventoryItemResponse)
 async def get_inventory_item(
     product_id: str = Path(..., description="The product ID"),
@@ -155,9 +274,9 @@ async def get_inventory_item(
     """
     Get inventory for a specific product.
     """
-    query = select(InventoryItem).where(InventoryItem.product_id == product_id)
+    query = select_items(InventoryItem.product_id == product_id)
     result = await db.execute(query)
-    item = result.scalars().first()
+    item = next(iter(items_with_escrow(result)), None)
 
     if not item:
         raise HTTPException(
@@ -177,9 +296,9 @@ async def get_inventory_item(
     """
     Get inventory for a specific product.
     """
-    query = select(InventoryItem).where(InventoryItem.product_id == product_id)
+    query = select_items(InventoryItem.product_id == product_id)
     result = await db.execute(query)
-    item = result.scalars().first()
+    item = next(iter(items_with_escrow(result)), None)
 
     if not item:
         raise HTTPException(
@@ -218,6 +337,10 @@ async def update_inventory_item(
                 detail=f"Inventory for product {product_id} not found",
             )
 
+        # The new quantities replace the product's escrowed stock as well
+        if await fold_buckets(db, [product_id]):
+            await db.refresh(existing_item)
+
         previous_quantity = existing_item.available_quantity
 
         # Calculate new values
@@ -289,19 +412,128 @@ async def update_inventory_item(
     await db.refresh(existing_item)
 
     # Outside transaction
-    await check_and_notify_low_stock(existing_item)
+    low_stock_notifier.notify(existing_item)
 
     logger.info(f"Updated inventory for product {product_id}")
 
     return existing_item
 
 
+async def _get_quantities(db: AsyncSession, product_id: str):
+    """Read current quantities; used only to explain a failed fast-path update."""
+    result = await db.execute(
+        select(
+            TOTAL_AVAILABLE.label("available_quantity"),
+            TOTAL_RESERVED.label("reserved_quantity"),
+        ).where(InventoryItem.product_id == product_id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Inventory for product {product_id} not found",
+        )
+    return row
+
+
+async def _reserve_inventory_fast(reservation: InventoryReserve, db: AsyncSession):
+    """Reserve with one guarded UPDATE + history INSERT statement."""
+    item = await reserve_stock(
+        db, reservation.product_id, reservation.quantity, reservation.order_id
+    )
+    await db.commit()
+
+    if not item:
+        current = await _get_quantities(db, reservation.product_id)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Insufficient inventory. Requested: {reservation.quantity}, Available: {current.available_quantity}",
+        )
+
+    low_stock_notifier.notify(item)
+
+    logger.info(
+        f"Reserved {reservation.quantity} units of product {reservation.product_id}"
+    )
+
+    return {
+        "reserved": True,
+        "product_id": reservation.product_id,
+        "quantity": reservation.quantity,
+        "available_quantity": item.available_quantity,
+        "reserved_quantity": item.reserved_quantity,
+    }
+
+
+async def _release_inventory_fast(release: InventoryRelease, db: AsyncSession):
+    """Release with one guarded UPDATE + history INSERT statement."""
+    item = await release_stock(
+        db, release.product_id, release.quantity, release.order_id
+    )
+    await db.commit()
+
+    if not item:
+        await _get_quantities(db, release.product_id)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No reserved inventory to release",
+        )
+
+    if item.released < release.quantity:
+        logger.warning(
+            f"Release capped. Requested={release.quantity}, Released={item.released}"
+        )
+
+    low_stock_notifier.notify(item)
+
+    logger.info(f"Released {item.released} units of product {release.product_id}")
+
+    return {
+        "released": True,
+        "product_id": release.product_id,
+        "quantity": item.released,
+        "available_quantity": item.available_quantity,
+        "reserved_quantity": item.reserved_quantity,
+    }
+
+
+async def _adjust_inventory_fast(adjustment: InventoryAdjust, db: AsyncSession):
+    """Adjust with one guarded UPDATE + history INSERT statement."""
+    item = await adjust_stock(
+        db, adjustment.product_id, adjustment.quantity_change, adjustment.reference_id
+    )
+    await db.commit()
+
+    if not item:
+        current = await _get_quantities(db, adjustment.product_id)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                f"Cannot reduce inventory below zero. "
+                f"Current={current.available_quantity}, "
+                f"Adjustment={adjustment.quantity_change}"
+            ),
+        )
+
+    low_stock_notifier.notify(item)
+
+    logger.info(
+        f"Adjusted inventory for product {adjustment.product_id} "
+        f"by {adjustment.quantity_change}"
+    )
+
+    return dict(item._mapping)
+
+
 @router.post("/reserve", response_model=Dict[str, Any])
 async def reserve_inventory(
     reservation: InventoryReserve,
     db: AsyncSession = Depends(get_db),
     current_user: Dict[str, Any] = Depends(get_current_user),
 ):
+    if settings.INVENTORY_FAST_PATH:
+        return await _reserve_inventory_fast(reservation, db)
+
     async with db.begin():
 
         """
@@ -313,9 +545,10 @@ async def reserve_inventory(
         3. Create a history entry
         """
         # Check if inventory exists and has sufficient quantity
-        query = (select(InventoryItem)
-                .where(InventoryItem.product_id == reservation.product_id)
-                .with_for_update()
+        query = (
+            select(InventoryItem)
+            .where(InventoryItem.product_id == reservation.product_id)
+            .with_for_update()
         )
         result = await db.execute(query)
         item = result.scalars().first()
@@ -326,6 +559,9 @@ async def reserve_inventory(
                 detail=f"Inventory for product {reservation.product_id} not found",
             )
 
+        if await fold_buckets(db, [reservation.product_id]):
+            await db.refresh(item)
+
         if item.available_quantity < reservation.quantity:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -336,11 +572,9 @@ async def reserve_inventory(
         new_available = item.available_quantity - reservation.quantity
         new_reserved = item.reserved_quantity + reservation.quantity
 
-
-        item.available_quantity=new_available,
-        item.reserved_quantity=new_reserved,
-        item.updated_at=func.now(),
-   
+        item.available_quantity = new_available
+        item.reserved_quantity = new_reserved
+        item.updated_at = func.now()
 
         # result = await db.execute(query)
         # updated_item = result.scalars().first()
@@ -361,9 +595,8 @@ async def reserve_inventory(
         # Transaction committed here
         await db.refresh(item)
 
-
         # Check for low stock
-        await check_and_notify_low_stock(item)
+        low_stock_notifier.notify(item)
 
         logger.info(
             f"Reserved {reservation.quantity} units of product {reservation.product_id}"
@@ -387,6 +620,8 @@ async def release_inventory(
     """
     Release previously reserved inventory safely using row-level locking.
     """
+    if settings.INVENTORY_FAST_PATH:
+        return await _release_inventory_fast(release, db)
 
     async with db.begin():
 
@@ -405,6 +640,9 @@ async def release_inventory(
                 detail=f"Inventory for product {release.product_id} not found",
             )
 
+        if await fold_buckets(db, [release.product_id]):
+            await db.refresh(item)
+
         # Safe release calculation (no mutation of request object)
         release_qty = release.quantity
 
@@ -446,9 +684,9 @@ async def release_inventory(
 
     await db.refresh(item)
 
-    logger.info(
-        f"Released {release_qty} units of product {release.product_id}"
-    )
+    low_stock_notifier.notify(item)
+
+    logger.info(f"Released {release_qty} units of product {release.product_id}")
 
     return {
         "released": True,
@@ -459,6 +697,411 @@ async def release_inventory(
     }
 
 
+@router.post("/reserve-batch", response_model=Dict[str, Any])
+async def reserve_inventory_batch(
+    reservation: InventoryReserveBatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Reserve inventory for every item of an order in one transaction.
+
+    This will:
+    1. Lock all affected rows in product_id order
+    2. Fail the whole batch if any product is missing or short on stock
+    3. Move the quantities from available to reserved with one UPDATE
+    4. Write all history entries with one INSERT
+
+    Repeating a reservation for the same order_id is a no-op, so callers
+    can safely retry.
+    """
+    requested = _sum_quantities(reservation.items)
+
+    async with db.begin():
+        # Checked under the order's lock so concurrent retries cannot both apply
+        await lock_orders(db, [reservation.order_id])
+        locked = await lock_items(db, list(requested), requested)
+
+        if reservation.order_id and "reserve" in await _order_movements(
+            db, reservation.order_id
+        ):
+            logger.info(f"Order {reservation.order_id} is already reserved")
+            return {
+                "reserved": True,
+                "duplicate": True,
+                "order_id": reservation.order_id,
+                "items": _current_items(locked, {}),
+            }
+
+        missing = [product_id for product_id in requested if product_id not in locked]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Inventory for products {', '.join(missing)} not found",
+            )
+
+        insufficient = [
+            f"{product_id} (requested: {quantity}, available: {locked[product_id].available_quantity})"
+            for product_id, quantity in requested.items()
+            if locked[product_id].available_quantity < quantity
+        ]
+        if insufficient:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient inventory for: {', '.join(insufficient)}",
+            )
+
+        updated = await move_stock(db, locked, requested)
+
+        await db.execute(
+            insert(InventoryHistory).values(
+                [
+                    {
+                        "product_id": product_id,
+                        "quantity_change": -quantity,
+                        "previous_quantity": locked[product_id].available_quantity,
+                        "new_quantity": updated[product_id].available_quantity,
+                        "change_type": "reserve",
+                        "reference_id": reservation.order_id,
+                    }
+                    for product_id, quantity in requested.items()
+                ]
+            )
+        )
+        if reservation.order_id:
+            await record_reservations(db, {reservation.order_id: requested})
+
+    # Transaction committed here
+
+    low_stock_notifier.notify_many(updated.values())
+
+    logger.info(f"Reserved {len(requested)} products for order {reservation.order_id}")
+
+    return {
+        "reserved": True,
+        "order_id": reservation.order_id,
+        "items": [
+            {
+                "product_id": product_id,
+                "quantity": quantity,
+                "available_quantity": updated[product_id].available_quantity,
+                "reserved_quantity": updated[product_id].reserved_quantity,
+            }
+            for product_id, quantity in requested.items()
+        ],
+    }
+
+
+@router.post("/reserve-orders", response_model=Dict[str, Any])
+async def reserve_inventory_for_orders(
+    batch: InventoryReserveOrders,
+    db: AsyncSession = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Reserve inventory for several orders in one transaction.
+
+    Orders are all-or-nothing individually but independent of each other:
+    they are allocated in the given order against the locked stock, and an
+    order that does not fit is rejected without affecting the others. The
+    quantities of all accepted orders are applied with one UPDATE per batch.
+
+    Orders that already have a reservation are reported as reserved without
+    being reserved again, so callers can safely retry.
+    """
+    # Upper bound of what the batch reserves per product
+    needed = _sum_quantities(item for order in batch.orders for item in order.items)
+    order_ids = [order.order_id for order in batch.orders]
+
+    async with db.begin():
+        await lock_orders(db, order_ids)
+        locked = await lock_items(db, list(needed), needed)
+
+        result = await db.execute(
+            select(InventoryHistory.reference_id)
+            .where(
+                InventoryHistory.reference_id.in_(order_ids),
+                InventoryHistory.change_type == "reserve",
+            )
+            .distinct()
+        )
+        already_reserved = set(result.scalars().all())
+
+        remaining = {
+            product_id: row.available_quantity for product_id, row in locked.items()
+        }
+        totals: Dict[str, int] = {}
+        history = []
+        results: Dict[str, Dict[str, Any]] = {}
+        reserved_orders: Dict[str, Dict[str, int]] = {}
+
+        for order in batch.orders:
+            if order.order_id in already_reserved or order.order_id in results:
+                results[order.order_id] = {"reserved": True, "duplicate": True}
+                continue
+
+            requested = _sum_quantities(order.items)
+            missing = [
+                product_id for product_id in requested if product_id not in locked
+            ]
+            insufficient = [
+                f"{product_id} (requested: {quantity}, "
+                f"available: {remaining[product_id]})"
+                for product_id, quantity in requested.items()
+                if product_id in remaining and remaining[product_id] < quantity
+            ]
+            if missing or insufficient:
+                detail = (
+                    f"Inventory for products {', '.join(missing)} not found"
+                    if missing
+                    else f"Insufficient inventory for: {', '.join(insufficient)}"
+                )
+                results[order.order_id] = {"reserved": False, "detail": detail}
+                continue
+
+            for product_id, quantity in requested.items():
+                history.append(
+                    {
+                        "product_id": product_id,
+                        "quantity_change": -quantity,
+                        "previous_quantity": remaining[product_id],
+                        "new_quantity": remaining[product_id] - quantity,
+                        "change_type": "reserve",
+                        "reference_id": order.order_id,
+                    }
+                )
+                remaining[product_id] -= quantity
+                totals[product_id] = totals.get(product_id, 0) + quantity
+            results[order.order_id] = {"reserved": True}
+            reserved_orders[order.order_id] = requested
+
+        updated = {}
+        if totals:
+            updated = await move_stock(db, locked, dict(sorted(totals.items())))
+            await db.execute(insert(InventoryHistory).values(history))
+            await record_reservations(db, reserved_orders)
+
+    # Transaction committed here
+
+    low_stock_notifier.notify_many(updated.values())
+
+    reserved = sum(1 for outcome in results.values() if outcome["reserved"])
+    logger.info(f"Reserved inventory for {reserved} of {len(results)} orders")
+
+    return {"results": results}
+
+
+@router.post("/release-batch", response_model=Dict[str, Any])
+async def release_inventory_batch(
+    release: InventoryReleaseBatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Release previously reserved inventory for every item of an order in one
+    transaction.
+
+    As with single releases, each quantity is capped at what is currently
+    reserved; products with nothing reserved are skipped.
+
+    With an order_id, only a reservation recorded for that order is released,
+    and only once, so callers can safely retry.
+    """
+    requested = _sum_quantities(release.items)
+
+    async with db.begin():
+        if release.order_id:
+            await lock_orders(db, [release.order_id])
+            # Before the inventory rows, in the same order as the sweeper
+            await close_reservation(db, release.order_id)
+
+        locked = await lock_items(db, list(requested), requested, releasing=True)
+
+        if release.order_id:
+            movements = await _order_movements(db, release.order_id)
+            if "release" in movements or "reserve" not in movements:
+                logger.info(f"Nothing to release for order {release.order_id}")
+                return {
+                    "released": True,
+                    "duplicate": "release" in movements,
+                    "order_id": release.order_id,
+                    "items": _current_items(locked, {}),
+                }
+
+        missing = [product_id for product_id in requested if product_id not in locked]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Inventory for products {', '.join(missing)} not found",
+            )
+
+        release_quantities = {}
+        for product_id, quantity in requested.items():
+            reserved = locked[product_id].reserved_quantity
+            if quantity > reserved:
+                logger.warning(
+                    f"Release capped for {product_id}. Requested={quantity}, "
+                    f"Reserved={reserved}"
+                )
+            if min(quantity, reserved) > 0:
+                release_quantities[product_id] = min(quantity, reserved)
+
+        updated = {}
+        if release_quantities:
+            updated = await move_stock(
+                db,
+                locked,
+                {
+                    product_id: -quantity
+                    for product_id, quantity in release_quantities.items()
+                },
+            )
+
+            await db.execute(
+                insert(InventoryHistory).values(
+                    [
+                        {
+                            "product_id": product_id,
+                            "quantity_change": quantity,
+                            "previous_quantity": locked[product_id].available_quantity,
+                            "new_quantity": updated[product_id].available_quantity,
+                            "change_type": "release",
+                            "reference_id": release.order_id,
+                        }
+                        for product_id, quantity in release_quantities.items()
+                    ]
+                )
+            )
+
+    # transaction commits here
+
+    low_stock_notifier.notify_many(updated.values())
+
+    logger.info(
+        f"Released {len(release_quantities)} products for order {release.order_id}"
+    )
+
+    return {
+        "released": True,
+        "order_id": release.order_id,
+        "items": _current_items({**locked, **updated}, release_quantities),
+    }
+
+
+@router.post("/release-orders", response_model=Dict[str, Any])
+async def release_inventory_for_orders(
+    batch: InventoryReleaseOrders,
+    db: AsyncSession = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Release the reservations of several orders in one transaction.
+
+    Each order is released as by release-batch with its order_id: only a
+    reservation recorded for the order is released, and only once, each
+    quantity capped at what is still reserved. Orders are independent of
+    each other, and the quantities of all of them are applied with one
+    UPDATE per batch.
+    """
+    # Upper bound of what the batch releases per product
+    needed = _sum_quantities(item for order in batch.orders for item in order.items)
+    order_ids = [order.order_id for order in batch.orders]
+
+    async with db.begin():
+        await lock_orders(db, order_ids)
+        # Before the inventory rows, in the same order as the sweeper
+        await close_reservations(db, order_ids)
+        locked = await lock_items(db, list(needed), needed, releasing=True)
+
+        result = await db.execute(
+            select(InventoryHistory.reference_id, InventoryHistory.change_type)
+            .where(
+                InventoryHistory.reference_id.in_(order_ids),
+                InventoryHistory.change_type.in_(["reserve", "release"]),
+            )
+            .distinct()
+        )
+        movements: Dict[str, set] = {}
+        for order_id, change_type in result:
+            movements.setdefault(order_id, set()).add(change_type)
+
+        available = {
+            product_id: row.available_quantity for product_id, row in locked.items()
+        }
+        reserved = {
+            product_id: row.reserved_quantity for product_id, row in locked.items()
+        }
+        totals: Dict[str, int] = {}
+        history = []
+        results: Dict[str, Dict[str, Any]] = {}
+
+        for order in batch.orders:
+            order_movements = movements.get(order.order_id, set())
+            if order.order_id in results:
+                results[order.order_id] = {"released": True, "duplicate": True}
+                continue
+            if "release" in order_movements or "reserve" not in order_movements:
+                results[order.order_id] = {
+                    "released": True,
+                    "duplicate": "release" in order_movements,
+                }
+                continue
+
+            requested = _sum_quantities(order.items)
+            missing = [
+                product_id for product_id in requested if product_id not in locked
+            ]
+            if missing:
+                detail = f"Inventory for products {', '.join(missing)} not found"
+                results[order.order_id] = {"released": False, "detail": detail}
+                continue
+
+            for product_id, quantity in requested.items():
+                released = min(quantity, reserved[product_id])
+                if released < quantity:
+                    logger.warning(
+                        f"Release capped for {product_id} of order {order.order_id}. "
+                        f"Requested={quantity}, Reserved={reserved[product_id]}"
+                    )
+                if released <= 0:
+                    continue
+
+                history.append(
+                    {
+                        "product_id": product_id,
+                        "quantity_change": released,
+                        "previous_quantity": available[product_id],
+                        "new_quantity": available[product_id] + released,
+                        "change_type": "release",
+                        "reference_id": order.order_id,
+                    }
+                )
+                available[product_id] += released
+                reserved[product_id] -= released
+                totals[product_id] = totals.get(product_id, 0) + released
+            results[order.order_id] = {"released": True}
+
+        updated = {}
+        if totals:
+            updated = await move_stock(
+                db,
+                locked,
+                {
+                    product_id: -quantity
+                    for product_id, quantity in sorted(totals.items())
+                },
+            )
+            await db.execute(insert(InventoryHistory).values(history))
+
+    # Transaction committed here
+
+    low_stock_notifier.notify_many(updated.values())
+
+    logger.info(f"Released inventory for {len(results)} orders")
+
+    return {"results": results}
+
+
 @router.post("/adjust", response_model=InventoryItemResponse)
 async def adjust_inventory(
     adjustment: InventoryAdjust,
@@ -468,6 +1111,8 @@ async def adjust_inventory(
     """
     Adjust inventory levels (add or remove) safely with row-level locking.
     """
+    if settings.INVENTORY_FAST_PATH:
+        return await _adjust_inventory_fast(adjustment, db)
 
     async with db.begin():
 
@@ -486,6 +1131,9 @@ async def adjust_inventory(
                 detail=f"Inventory for product {adjustment.product_id} not found",
             )
 
+        if await fold_buckets(db, [adjustment.product_id]):
+            await db.refresh(item)
+
         previous_quantity = item.available_quantity
 
         # Calculate new quantity safely
@@ -507,11 +1155,7 @@ async def adjust_inventory(
         item.updated_at = func.now()
 
         # Determine change type
-        change_type = (
-            "add"
-            if adjustment.quantity_change > 0
-            else "remove"
-        )
+        change_type = "add" if adjustment.quantity_change > 0 else "remove"
 
         # Create history entry
         history_entry = InventoryHistory(
@@ -530,7 +1174,7 @@ async def adjust_inventory(
     await db.refresh(item)
 
     # Post-transaction side effect
-    await check_and_notify_low_stock(item)
+    low_stock_notifier.notify(item)
 
     logger.info(
         f"Adjusted inventory for product {adjustment.product_id} "
@@ -548,98 +1192,170 @@ async def get_low_stock_items(
     """
     Get all items with inventory below their reorder threshold.
     """
-    query = select(InventoryItem).where(
-        InventoryItem.available_quantity <= InventoryItem.reorder_threshold
-    )
+    query = select_items(TOTAL_AVAILABLE <= InventoryItem.reorder_threshold)
 
     result = await db.execute(query)
-    items = result.scalars().all()
+    items = items_with_escrow(result)
 
     return items
 
 
+HISTORY_COLUMNS = (
+    InventoryHistory.id,
+    InventoryHistory.product_id,
+    InventoryHistory.quantity_change,
+    InventoryHistory.previous_quantity,
+    InventoryHistory.new_quantity,
+    InventoryHistory.change_type,
+    InventoryHistory.reference_id,
+    InventoryHistory.timestamp,
+)
+
+
+def _encode_cursor(timestamp: datetime, history_id: int) -> str:
+    payload = json.dumps([timestamp.isoformat(), history_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        timestamp, history_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp), int(history_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid history cursor",
+        )
+
+
+async def _history_page(
+    db: AsyncSession,
+    response: Response,
+    criteria: List[Any],
+    limit: int,
+    cursor: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    change_type: Optional[List[str]],
+) -> List[Dict[str, Any]]:
+    """
+    Read one page of history, newest first, ordered by (timestamp, id).
+
+    The page continues after the given cursor; the cursor of the next page,
+    if there may be one, is returned in the X-Next-Cursor header. Time
+    bounds, including the cursor's, limit the query to the monthly
+    partitions they cover.
+    """
+    query = select(*HISTORY_COLUMNS).where(*criteria)
+    if since is not None:
+        query = query.where(InventoryHistory.timestamp >= since)
+    if until is not None:
+        query = query.where(InventoryHistory.timestamp < until)
+    if change_type:
+        query = query.where(InventoryHistory.change_type.in_(change_type))
+    if cursor is not None:
+        after_timestamp, after_id = _decode_cursor(cursor)
+        query = query.where(
+            InventoryHistory.timestamp <= after_timestamp,
+            tuple_(InventoryHistory.timestamp, InventoryHistory.id)
+            < tuple_(after_timestamp, after_id),
+        )
+    query = query.order_by(
+        InventoryHistory.timestamp.desc(), InventoryHistory.id.desc()
+    ).limit(limit)
+
+    result = await db.execute(query)
+    history = [dict(row._mapping) for row in result]
+
+    if len(history) == limit:
+        last = history[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(
+            last["timestamp"], last["id"]
+        )
+    return history
+
+
+@router.get("/history/reference/{reference_id}", response_model=List[Dict[str, Any]])
+async def get_reference_history(
+    response: Response,
+    reference_id: str = Path(..., description="Order ID or other reference"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor header of the previous page"
+    ),
+    since: Optional[datetime] = Query(
+        None, description="Only movements at or after this time"
+    ),
+    until: Optional[datetime] = Query(
+        None, description="Only movements before this time"
+    ),
+    change_type: Optional[List[str]] = Query(
+        None, description="Only movements of these types"
+    ),
+    db: AsyncSession = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Get every inventory movement recorded for an order or other reference,
+    across products, newest first.
+    """
+    return await _history_page(
+        db,
+        response,
+        [InventoryHistory.reference_id == reference_id],
+        limit,
+        cursor,
+        since,
+        until,
+        change_type,
+    )
+
+
 @router.get("/history/{product_id}", response_model=List[Dict[str, Any]])
 async def get_inventory_history(
     product_id: str,
+    response: Response,
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor header of the previous page"
+    ),
+    since: Optional[datetime] = Query(
+        None, description="Only movements at or after this time"
+    ),
+    until: Optional[datetime] = Query(
+        None, description="Only movements before this time"
+    ),
+    change_type: Optional[List[str]] = Query(
+        None, description="Only movements of these types"
+    ),
+    reference_id: Optional[str] = Query(
+        None, description="Only movements for this order or other reference"
+    ),
     db: AsyncSession = Depends(get_db),
     current_user: Dict[str, Any] = Depends(get_current_user),
 ):
     """
-    Get inventory history for a product.
+    Get inventory history for a product, newest first.
+
+    Pages are keyed on (timestamp, id): pass the X-Next-Cursor header of a
+    page as cursor to get the next one. History is partitioned by month; a
+    time range limits the query to the partitions it covers. Movements past
+    retention are only kept as daily totals and are not returned.
     """
     # First check if product exists in inventory
-    query = select(InventoryItem).where(InventoryItem.product_id == product_id)
+    query = select(InventoryItem.id).where(InventoryItem.product_id == product_id)
     result = await db.execute(query)
-    item = result.scalars().first()
 
-    if not item:
+    if result.first() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Inventory for product {product_id} not found",
         )
 
-    # Get history
-    query = (
-        select(InventoryHistory)
-        .where(InventoryHistory.product_id == product_id)
-        .order_by(InventoryHistory.timestamp.desc())
-        .limit(limit)
-    )
-
-    result = await db.execute(query)
-    history = result.all()
+    criteria = [InventoryHistory.product_id == product_id]
+    if reference_id is not None:
+        criteria.append(InventoryHistory.reference_id == reference_id)
 
-    # Convert to list of dicts
-    history_list = [
-        {
-            "id": h.id,
-            "product_id": h.product_id,
-            "quantity_change": h.quantity_change,
-            "previous_quantity": h.previous_quantity,
-            "new_quantity": h.new_quantity,
-            "change_type": h.change_type,
-            "reference_id": h.reference_id,
-            "timestamp": h.timestamp,
-        }
-        for h in history
-    ]
-
-    return history_list
-
-
-async def check_and_notify_low_stock(inventory_item: InventoryItem):
-    """
-    Check if an item is below its reorder threshold and send notification if needed.
-    """
-    if not settings.ENABLE_NOTIFICATIONS or not settings.NOTIFICATION_URL:
-        return
-
-    if inventory_item.available_quantity <= inventory_item.reorder_threshold:
-        try:
-            product = await product_service.get_product(inventory_item.product_id)
-            product_name = (
-                product.get("name", inventory_item.product_id)
-                if product
-                else inventory_item.product_id
-            )
-
-            notification_data = {
-                "type": "low_stock",
-                "product_id": inventory_item.product_id,
-                "product_name": product_name,
-                "current_quantity": inventory_item.available_quantity,
-                "threshold": inventory_item.reorder_threshold,
-                "timestamp": datetime.utcnow().isoformat(),
-            }
-
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                await client.post(
-                    str(settings.NOTIFICATION_URL), json=notification_data
-                )
-
-            logger.info(
-                f"Sent low stock notification for product {inventory_item.product_id}"
-            )
-        except Exception as e:
-            logger.error(f"Failed to send low stock notification: {str(e)}")
+    return await _history_page(
+        db, response, criteria, limit, cursor, since, until, change_type
+    )
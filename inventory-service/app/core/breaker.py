@@ -0,0 +1,138 @@
+# Shared module: order-service/app/core/breaker.py is the source of truth.
+# Each service is built from its own directory, so it is copied into
+# product-service and inventory-service.
+# Change it there and copy it over; the copies must stay identical.
+
+import time
+from collections import deque
+from typing import Any, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker over a rolling window of recent calls.
+
+    While closed, calls pass and their outcomes are recorded. Once the window
+    holds at least min_calls outcomes, the breaker opens when the failure
+    rate or the slow-call rate reaches its threshold. While open, calls are
+    rejected until open_seconds have passed. It then turns half-open and lets
+    half_open_calls probe calls through: if they all succeed the breaker
+    closes, and any failed or slow probe opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call_rate: float = 0.5,
+        slow_call_seconds: float = 2.0,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 3,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate
+        self.slow_call_rate_threshold = slow_call_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self.state = CLOSED
+        self._outcomes: deque = deque(maxlen=window)  # (failed, slow) pairs
+        self._changed_at = time.monotonic()
+        self._probes = 0
+        self._probe_successes = 0
+
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def allow_request(self) -> bool:
+        """Return whether a call may be made now; counts it as a probe if so."""
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self._changed_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                # Probes whose outcome never came back must not wedge the breaker
+                if now - self._changed_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self._transition(HALF_OPEN)
+            self._probes += 1
+
+        return True
+
+    def record(self, failed: bool, latency: float):
+        """Record the outcome of a call that allow_request let through."""
+        slow = latency >= self.slow_call_seconds
+        self.calls += 1
+        self.failures += failed
+        self.slow_calls += slow
+
+        if self.state == HALF_OPEN:
+            if failed or slow:
+                self._transition(OPEN)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._transition(CLOSED)
+            return
+
+        if self.state == OPEN:
+            # A call that started before the breaker opened
+            return
+
+        self._outcomes.append((failed, slow))
+        if len(self._outcomes) >= self.min_calls:
+            failure_rate, slow_call_rate = self._rates()
+            if (
+                failure_rate >= self.failure_rate_threshold
+                or slow_call_rate >= self.slow_call_rate_threshold
+            ):
+                self._transition(OPEN)
+
+    def _rates(self):
+        if not self._outcomes:
+            return 0.0, 0.0
+        total = len(self._outcomes)
+        failed = sum(1 for outcome in self._outcomes if outcome[0])
+        slow = sum(1 for outcome in self._outcomes if outcome[1])
+        return failed / total, slow / total
+
+    def _transition(self, state: str):
+        if state == OPEN and self.state != OPEN:
+            self.opened += 1
+        self.state = state
+        self._changed_at = time.monotonic()
+        self._probes = 0
+        self._probe_successes = 0
+        if state == CLOSED:
+            self._outcomes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the breaker state and call counters."""
+        failure_rate, slow_call_rate = self._rates()
+        return {
+            "state": self.state,
+            "state_seconds": round(time.monotonic() - self._changed_at, 3),
+            "failure_rate": round(failure_rate, 4),
+            "slow_call_rate": round(slow_call_rate, 4),
+            "calls": self.calls,
+            "failures": self.failures,
+            "slow_calls": self.slow_calls,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
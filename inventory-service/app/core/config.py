@@ -1,5 +1,5 @@
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 from pydantic import BaseSettings, AnyHttpUrl, validator, PostgresDsn
 
@@ -17,9 +17,42 @@ class Settings(BaseSettings):
     # Service URLs
     PRODUCT_SERVICE_URL: AnyHttpUrl
 
-    # Retry Configuration
-    MAX_RETRIES: int = 3
-    RETRY_DELAY: int = 1  # seconds
+    # HTTP client pool settings (shared by all inter-service clients)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    HTTP_TIMEOUT: float = 5.0  # seconds
+    HTTP_CONNECT_TIMEOUT: float = 2.0  # seconds
+    HTTP2_ENABLED: bool = False  # requires the 'h2' package
+
+    # Retries of idempotent inter-service requests
+    HTTP_RETRY_ATTEMPTS: int = 3
+    HTTP_RETRY_BACKOFF_BASE: float = 0.1  # seconds, doubled per attempt, jittered
+    HTTP_RETRY_BACKOFF_MAX: float = 1.0  # seconds
+    HTTP_RETRY_BUDGET: float = 5.0  # seconds for all attempts of one request
+
+    # Share one upstream call between identical concurrent requests
+    HTTP_COALESCING_ENABLED: bool = True
+
+    # Circuit breaker per upstream service
+    BREAKER_WINDOW: int = 20  # most recent calls considered
+    BREAKER_MIN_CALLS: int = 10  # calls needed in the window before tripping
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_SLOW_CALL_RATE: float = 0.5
+    BREAKER_SLOW_CALL_SECONDS: float = 2.0
+    BREAKER_OPEN_SECONDS: float = 30.0  # before probing again
+    BREAKER_HALF_OPEN_CALLS: int = 3  # probe calls that must succeed to close
+
+    # Product cache settings (product-service client)
+    PRODUCT_CACHE_SIZE: int = 2048
+    PRODUCT_CACHE_TTL: float = 300.0  # seconds
+    PRODUCT_CACHE_NEGATIVE_TTL: float = 30.0  # seconds, for 404s
+
+    # Product change events from product-service (Redis pub/sub); cached
+    # products are evicted as they change, with the TTLs above as fallback
+    REDIS_URL: Optional[str] = None
+    PRODUCT_EVENTS_CHANNEL: str = "product:changes"
+    PRODUCT_EVENTS_RECONNECT_DELAY: float = 5.0  # seconds
 
     # JWT Auth settings (for testing/development)
     SECRET_KEY: str = "development-secret-key"
@@ -29,9 +62,54 @@ class Settings(BaseSettings):
     LOW_STOCK_THRESHOLD: int = 5
     ENABLE_NOTIFICATIONS: bool = True
     NOTIFICATION_URL: Optional[AnyHttpUrl] = None
+    # Low-stock alerts are queued and delivered in the background: one per
+    # product per debounce period, none again within the dedupe window
+    # unless the product runs out
+    LOW_STOCK_DEBOUNCE: float = 5.0  # seconds
+    LOW_STOCK_DEDUPE_WINDOW: float = 3600.0  # seconds
+    NOTIFICATION_BATCH_SIZE: int = 50
+    NOTIFICATION_BATCH_PATH: Optional[str] = None  # e.g. "/batch"
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_RETRY_BACKOFF: float = 2.0  # seconds, doubled per attempt
+    NOTIFICATION_RETRY_BACKOFF_MAX: float = 60.0  # seconds
+    # Use single-statement guarded UPDATEs for reserve/release/adjust
+    INVENTORY_FAST_PATH: bool = True
+
+    # Reservations made for an order expire RESERVATION_TTL seconds later
+    # unless the order has moved past pending; the sweeper then cancels the
+    # order through order-service and releases its stock. 0 disables expiry.
+    RESERVATION_TTL: int = 1800  # seconds
+    RESERVATION_SWEEP_INTERVAL: float = 30.0  # seconds
+    RESERVATION_SWEEP_BATCH_SIZE: int = 100
+    ORDER_SERVICE_URL: Optional[AnyHttpUrl] = None
+
+    # GET /check reads quantities through an in-process cache, invalidated
+    # through Postgres LISTEN/NOTIFY on every change. 0 disables the cache.
+    INVENTORY_CACHE_TTL: float = 30.0  # seconds
+    INVENTORY_CACHE_NEGATIVE_TTL: float = 2.0  # seconds
+    INVENTORY_CACHE_SIZE: int = 10000
+    INVENTORY_CHANGES_CHANNEL: str = "inventory_changes"
+    INVENTORY_CACHE_HEALTH_INTERVAL: float = 10.0  # seconds
+    INVENTORY_CACHE_RECONNECT_DELAY: float = 5.0  # seconds
+
+    # Hot products whose stock is split across ESCROW_BUCKETS escrow rows, so
+    # that concurrent reservations lock different rows. Must be the same on
+    # every replica; the rebalancer spreads stock evenly across the buckets.
+    ESCROW_PRODUCTS: List[str] = []  # JSON list in the environment
+    ESCROW_BUCKETS: int = 8
+    ESCROW_REBALANCE_INTERVAL: float = 5.0  # seconds
+
+    # inventory_history is partitioned by month. Partitions are created
+    # HISTORY_PARTITIONS_AHEAD months ahead; those older than
+    # HISTORY_RETENTION_MONTHS are rolled up into daily per-product totals
+    # and dropped (0 keeps everything). Order reserve/release deduplication
+    # reads history, so retention must outlast any order still in flight.
+    HISTORY_PARTITIONS_AHEAD: int = 3
+    HISTORY_RETENTION_MONTHS: int = 24
+    HISTORY_MAINTENANCE_INTERVAL: float = 3600.0  # seconds
 
     # Validate URLs are properly formatted
-    @validator("PRODUCT_SERVICE_URL", "NOTIFICATION_URL", pre=True)
+    @validator("PRODUCT_SERVICE_URL", "NOTIFICATION_URL", "ORDER_SERVICE_URL", pre=True)
     def validate_service_urls(cls, v):
         if isinstance(v, str) and not v.startswith(("http://", "https://")):
             return f"http://{v}"
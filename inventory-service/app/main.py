@@ -4,6 +4,18 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import inventory
 from app.core.config import settings
 from app.db.postgresql import initialize_db, close_db_connection
+from app.services.http import (
+    breaker_stats,
+    close_http_clients,
+    coalescing_stats,
+    start_http_clients,
+)
+from app.services.escrow import escrow_rebalancer
+from app.services.history import history_partitions
+from app.services.low_stock import low_stock_notifier
+from app.services.product import product_events, product_service
+from app.services.reservations import reservation_sweeper
+from app.services.stock_cache import stock_cache
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -21,6 +33,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # history pagination
 )
 
 
@@ -29,7 +42,21 @@ app.include_router(inventory.router, prefix=settings.API_PREFIX)
 
 # Reister startup and shutdown events
 app.add_event_handler("startup", initialize_db)
+app.add_event_handler("startup", history_partitions.start)
+app.add_event_handler("startup", start_http_clients)
+app.add_event_handler("startup", product_events.start)
+app.add_event_handler("startup", reservation_sweeper.start)
+app.add_event_handler("startup", low_stock_notifier.start)
+app.add_event_handler("startup", stock_cache.start)
+app.add_event_handler("startup", escrow_rebalancer.start)
+app.add_event_handler("shutdown", reservation_sweeper.stop)
+app.add_event_handler("shutdown", low_stock_notifier.stop)
+app.add_event_handler("shutdown", stock_cache.stop)
+app.add_event_handler("shutdown", escrow_rebalancer.stop)
+app.add_event_handler("shutdown", history_partitions.stop)
 app.add_event_handler("shutdown", close_db_connection)
+app.add_event_handler("shutdown", close_http_clients)
+app.add_event_handler("shutdown", product_events.stop)
 
 
 # Health check endpoint
@@ -41,6 +68,26 @@ async def health_check():
     return {"status": "ok", "message": "Inventory Service is running"}
 
 
+# Metrics endpoint
+@app.get("/metrics", tags=["health"])
+async def metrics():
+    """
+    Expose in-process cache counters, circuit breaker states and background
+    task counters.
+    """
+    return {
+        "product_cache": product_service.cache.stats(),
+        "product_events": product_events.stats(),
+        "inventory_cache": stock_cache.stats(),
+        "reservation_sweeper": reservation_sweeper.stats(),
+        "low_stock_notifications": low_stock_notifier.stats(),
+        "escrow_rebalancer": escrow_rebalancer.stats(),
+        "history_partitions": history_partitions.stats(),
+        "circuit_breakers": breaker_stats(),
+        "request_coalescing": coalescing_stats(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
 
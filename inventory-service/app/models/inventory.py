@@ -2,15 +2,19 @@ from sqlalchemy import (
     Column,
     Integer,
     String,
+    Date,
     DateTime,
     ForeignKey,
     Boolean,
     CheckConstraint,
+    Index,
+    JSON,
+    UniqueConstraint,
 )
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 from app.db.postgresql import Base
@@ -47,12 +51,19 @@ class InventoryItem(Base):
 
 
 class InventoryHistory(Base):
-    """Database model for inventory history tracking."""
+    """
+    Database model for inventory history tracking.
+
+    The table is range-partitioned by month of timestamp; partitions are
+    created ahead and rolled up into InventoryHistoryDaily once past
+    retention by app.services.history.
+    """
 
     __tablename__ = "inventory_history"
 
-    id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(String, index=True, nullable=False)
+    # The partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    product_id = Column(String, nullable=False)
     quantity_change = Column(Integer, nullable=False)
     previous_quantity = Column(Integer, nullable=False)
     new_quantity = Column(Integer, nullable=False)
@@ -60,7 +71,118 @@ class InventoryHistory(Base):
         String, nullable=False
     )  # "add", "remove", "reserve", "release"
     reference_id = Column(String, nullable=True)  # Order ID or other reference
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(
+        DateTime(timezone=True),
+        primary_key=True,
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    # History pages are read newest first, keyed on (timestamp, id), by
+    # product or by reference; the other columns are included so that the
+    # pages and the order reserve/release lookups are index-only scans.
+    __table_args__ = (
+        Index(
+            "ix_inventory_history_product_timestamp_id",
+            "product_id",
+            "timestamp",
+            "id",
+            postgresql_include=[
+                "quantity_change",
+                "previous_quantity",
+                "new_quantity",
+                "change_type",
+                "reference_id",
+            ],
+        ),
+        Index(
+            "ix_inventory_history_reference_timestamp_id",
+            "reference_id",
+            "timestamp",
+            "id",
+            postgresql_include=[
+                "product_id",
+                "quantity_change",
+                "previous_quantity",
+                "new_quantity",
+                "change_type",
+            ],
+        ),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+
+class InventoryHistoryDaily(Base):
+    """Database model for history past retention, summed per product and day."""
+
+    __tablename__ = "inventory_history_daily"
+
+    product_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC
+    change_type = Column(String, primary_key=True)
+    movements = Column(Integer, nullable=False)
+    quantity_change = Column(Integer, nullable=False)
+
+
+class InventoryBucket(Base):
+    """
+    Database model for a share of a hot product's stock held in escrow.
+
+    A product's stock is the sum of its inventory item and its buckets.
+    """
+
+    __tablename__ = "inventory_buckets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(String, nullable=False)
+    bucket = Column(Integer, nullable=False)
+    available_quantity = Column(Integer, nullable=False, default=0)
+    reserved_quantity = Column(Integer, nullable=False, default=0)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    __table_args__ = (
+        UniqueConstraint(
+            "product_id", "bucket", name="uq_inventory_buckets_product_bucket"
+        ),
+        CheckConstraint(
+            "available_quantity >= 0", name="check_bucket_available_positive"
+        ),
+        CheckConstraint(
+            "reserved_quantity >= 0", name="check_bucket_reserved_positive"
+        ),
+    )
+
+
+# Reservation statuses
+RESERVATION_ACTIVE = "active"
+RESERVATION_RELEASED = "released"  # released by the order (cancellation)
+RESERVATION_EXPIRED = "expired"  # released by the sweeper
+RESERVATION_CONFIRMED = "confirmed"  # the order moved past pending; kept
+
+
+class Reservation(Base):
+    """Database model for the stock held for one order, with its expiry."""
+
+    __tablename__ = "inventory_reservations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(String, unique=True, nullable=False)
+    items = Column(JSON, nullable=False)  # {product_id: quantity}
+    status = Column(String, nullable=False, default=RESERVATION_ACTIVE)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    closed_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Only active reservations are ever looked up by expiry
+    __table_args__ = (
+        Index(
+            "ix_inventory_reservations_active_expires_at",
+            "expires_at",
+            postgresql_where=status == RESERVATION_ACTIVE,
+        ),
+    )
 
 
 # Pydantic Models for API
@@ -105,6 +227,12 @@ class InventoryCheck(BaseModel):
     quantity: int = Field(..., gt=0)
 
 
+class InventoryCheckBatch(BaseModel):
+    """Model for checking availability of several products at once."""
+
+    items: List[InventoryCheck] = Field(..., min_items=1, max_items=500)
+
+
 class InventoryReserve(BaseModel):
     """Model for reserving inventory."""
 
@@ -133,6 +261,39 @@ class InventoryRelease(BaseModel):
         return v
 
 
+class InventoryReserveBatch(BaseModel):
+    """Model for reserving several products for one order."""
+
+    items: List[InventoryCheck] = Field(..., min_items=1, max_items=500)
+    order_id: Optional[str] = None
+
+
+class OrderReservation(BaseModel):
+    """Model for the reservation of one order within a multi-order batch."""
+
+    order_id: str = Field(..., min_length=1)
+    items: List[InventoryCheck] = Field(..., min_items=1, max_items=500)
+
+
+class InventoryReserveOrders(BaseModel):
+    """Model for reserving inventory for several orders at once."""
+
+    orders: List[OrderReservation] = Field(..., min_items=1, max_items=500)
+
+
+class InventoryReleaseBatch(BaseModel):
+    """Model for releasing several products for one order."""
+
+    items: List[InventoryCheck] = Field(..., min_items=1, max_items=500)
+    order_id: Optional[str] = None
+
+
+class InventoryReleaseOrders(BaseModel):
+    """Model for releasing the reservations of several orders at once."""
+
+    orders: List[OrderReservation] = Field(..., min_items=1, max_items=500)
+
+
 class InventoryAdjust(BaseModel):
     """Model for adjusting inventory levels."""
 
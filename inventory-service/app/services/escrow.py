@@ -0,0 +1,225 @@
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+from sqlalchemy import Integer, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.postgresql import AsyncSessionLocal
+from app.services.stock import (
+    array_param,
+    fold_buckets,
+    inventory_buckets,
+    inventory_items,
+    lock_items,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _spread(total: int, parts: int) -> List[int]:
+    share, extra = divmod(total, parts)
+    return [share + 1 if part < extra else share for part in range(parts)]
+
+
+async def rebalance_product(db: AsyncSession, product_id: str) -> bool:
+    """
+    Spread a product's available stock evenly over its ESCROW_BUCKETS
+    buckets, and gather its reserved stock in the inventory row.
+
+    The stock of the inventory row and of every bucket not locked by a
+    reservation in progress is pooled and split again; buckets in use are
+    left for the next pass. Reserved stock is not spread, so that releases,
+    which lock the row, find all of it there. Missing buckets are created
+    and those numbered ESCROW_BUCKETS or above are deleted. Nothing is
+    written while the row holds no available stock, no bucket holds
+    reserved stock, and every bucket still holds at least half of an even
+    share of available stock.
+
+    Returns:
+        bool: True if stock was moved
+    """
+    result = await db.execute(
+        select(
+            inventory_items.c.available_quantity, inventory_items.c.reserved_quantity
+        )
+        .where(inventory_items.c.product_id == product_id)
+        .with_for_update()
+    )
+    row = result.first()
+    if not row:
+        return False
+
+    result = await db.execute(
+        select(inventory_buckets.c.bucket).where(
+            inventory_buckets.c.product_id == product_id
+        )
+    )
+    missing = set(range(settings.ESCROW_BUCKETS)) - set(result.scalars().all())
+    if missing:
+        await db.execute(
+            inventory_buckets.insert().values(
+                [
+                    {
+                        "product_id": product_id,
+                        "bucket": bucket,
+                        "available_quantity": 0,
+                        "reserved_quantity": 0,
+                    }
+                    for bucket in sorted(missing)
+                ]
+            )
+        )
+
+    result = await db.execute(
+        select(
+            inventory_buckets.c.id,
+            inventory_buckets.c.bucket,
+            inventory_buckets.c.available_quantity,
+            inventory_buckets.c.reserved_quantity,
+        )
+        .where(inventory_buckets.c.product_id == product_id)
+        .order_by(inventory_buckets.c.bucket)
+        .with_for_update(skip_locked=True)
+    )
+    buckets = result.all()
+    targets = [b for b in buckets if b.bucket < settings.ESCROW_BUCKETS]
+    extra = [b for b in buckets if b.bucket >= settings.ESCROW_BUCKETS]
+    if not targets:
+        return False
+
+    available = row.available_quantity + sum(b.available_quantity for b in buckets)
+    reserved = row.reserved_quantity + sum(b.reserved_quantity for b in buckets)
+    share = available // len(targets)
+    if (
+        not extra
+        and row.available_quantity == 0
+        and all(b.reserved_quantity == 0 for b in targets)
+        and min(b.available_quantity for b in targets) * 2 >= share
+    ):
+        return False
+
+    await db.execute(
+        update(inventory_items)
+        .where(inventory_items.c.product_id == product_id)
+        .values(available_quantity=0, reserved_quantity=reserved, updated_at=func.now())
+    )
+    shares = (
+        func.unnest(
+            array_param([b.id for b in targets], Integer),
+            array_param(_spread(available, len(targets)), Integer),
+        )
+        .table_valued("id", "available_quantity")
+        .render_derived(name="shares")
+    )
+    await db.execute(
+        update(inventory_buckets)
+        .where(inventory_buckets.c.id == shares.c.id)
+        .values(
+            available_quantity=shares.c.available_quantity,
+            reserved_quantity=0,
+            updated_at=func.now(),
+        )
+    )
+    if extra:
+        await db.execute(
+            delete(inventory_buckets).where(
+                inventory_buckets.c.id.in_([b.id for b in extra])
+            )
+        )
+    return True
+
+
+class EscrowRebalancer:
+    """
+    Background task that keeps the available stock of ESCROW_PRODUCTS
+    spread over their escrow buckets, so reservations keep finding a bucket
+    that can cover them without falling back to the inventory row.
+
+    Buckets of products no longer listed are folded back into their
+    inventory rows. With no product listed, that is done once at startup.
+    """
+
+    def __init__(self):
+        self._task = None
+        self.passes = 0
+        self.rebalanced = 0
+        self.folded = 0
+        self.errors = 0
+
+    async def start(self):
+        """Start rebalancing in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop rebalancing."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.rebalance_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Escrow rebalance failed: {str(e)}")
+
+            if not settings.ESCROW_PRODUCTS:
+                return
+            await asyncio.sleep(settings.ESCROW_REBALANCE_INTERVAL)
+
+    async def rebalance_once(self) -> int:
+        """
+        Fold the buckets of unlisted products, then rebalance each listed
+        product in its own transaction.
+
+        Returns:
+            int: The number of products whose stock was moved
+        """
+        self.passes += 1
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                listed = inventory_buckets.c.product_id.in_(settings.ESCROW_PRODUCTS)
+                result = await db.execute(
+                    select(inventory_buckets.c.product_id).where(~listed).distinct()
+                )
+                unlisted = sorted(result.scalars().all())
+                if unlisted:
+                    # Buckets left without stock are not folded by lock_items
+                    await lock_items(db, unlisted)
+                    await fold_buckets(db, unlisted)
+        if unlisted:
+            self.folded += len(unlisted)
+            logger.info(f"Folded escrow buckets of {', '.join(unlisted)}")
+
+        moved = 0
+        for product_id in sorted(settings.ESCROW_PRODUCTS):
+            async with AsyncSessionLocal() as db:
+                async with db.begin():
+                    moved += await rebalance_product(db, product_id)
+        self.rebalanced += moved
+        return moved
+
+    def stats(self) -> Dict[str, Any]:
+        """Return rebalancing counters."""
+        return {
+            "products": len(settings.ESCROW_PRODUCTS),
+            "buckets": settings.ESCROW_BUCKETS,
+            "running": self._task is not None and not self._task.done(),
+            "passes": self.passes,
+            "rebalanced": self.rebalanced,
+            "folded": self.folded,
+            "errors": self.errors,
+        }
+
+
+escrow_rebalancer = EscrowRebalancer()
@@ -0,0 +1,397 @@
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import column, func, literal_column, select, table, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.db.postgresql import engine
+from app.models.inventory import InventoryHistory, InventoryHistoryDaily
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TABLE = InventoryHistory.__tablename__
+# Written by earlier versions; its rows are moved into monthly partitions
+DEFAULT_PARTITION = f"{HISTORY_TABLE}_default"
+PARTITION_NAME = re.compile(rf"^{HISTORY_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Name of the partition holding the given month's history."""
+    return f"{HISTORY_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def _partition_month(name: str) -> Optional[date]:
+    match = PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+async def _is_partitioned(conn: AsyncConnection) -> bool:
+    result = await conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": HISTORY_TABLE},
+    )
+    return result.scalar() == "p"
+
+
+def _detaches_concurrently(conn: AsyncConnection) -> bool:
+    # DETACH PARTITION CONCURRENTLY, and the pending detaches it can leave
+    # behind, came with Postgres 14
+    return conn.dialect.server_version_info >= (14,)
+
+
+async def _partitions(conn: AsyncConnection) -> Dict[str, bool]:
+    """Return whether each partition is being detached, by name."""
+    pending = "i.inhdetachpending" if _detaches_concurrently(conn) else "false"
+    result = await conn.execute(
+        text(
+            f"SELECT c.relname, {pending} FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:name)"
+        ),
+        {"name": HISTORY_TABLE},
+    )
+    return {name: pending for name, pending in result}
+
+
+async def _detached(conn: AsyncConnection) -> List[str]:
+    """Return the partitions that were detached but not rolled up yet."""
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_class c "
+            "WHERE c.relnamespace = current_schema()::regnamespace "
+            "AND c.relkind = 'r' AND c.relname ~ :pattern "
+            "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)"
+        ),
+        {"pattern": PARTITION_NAME.pattern},
+    )
+    return sorted(result.scalars().all())
+
+
+async def _create_partition(conn: AsyncConnection, month: date):
+    end = _add_months(month, 1)
+    await conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+            f"PARTITION OF {HISTORY_TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+            f"TO ('{end.isoformat()} 00:00:00+00')"
+        )
+    )
+
+
+async def _absorb(conn: AsyncConnection, source: str, existing: Iterable[str]) -> int:
+    """
+    Move the rows of a table with inventory_history's columns into it,
+    creating the partitions they need, and drop the table.
+
+    Rows without a timestamp are dated now.
+
+    Returns:
+        int: The number of rows moved
+    """
+    timestamp = "COALESCE(timestamp, now())"
+    result = await conn.execute(
+        text(
+            f"SELECT DISTINCT date_trunc('month', {timestamp} AT TIME ZONE 'UTC') "
+            f"FROM {source}"
+        )
+    )
+    for month in result.scalars().all():
+        if partition_name(month.date()) not in existing:
+            await _create_partition(conn, month.date())
+
+    columns = [c.name for c in InventoryHistory.__table__.c if c.name != "timestamp"]
+    result = await conn.execute(
+        text(
+            f"INSERT INTO {HISTORY_TABLE} ({', '.join(columns)}, timestamp) "
+            f"SELECT {', '.join(columns)}, {timestamp} FROM {source}"
+        )
+    )
+    await conn.execute(text(f"DROP TABLE {source}"))
+    return result.rowcount
+
+
+async def partition_table(conn: AsyncConnection) -> bool:
+    """
+    Replace an inventory_history created before partitioning was introduced
+    by a partitioned one, moving its rows into monthly partitions.
+
+    The table is locked for the whole copy, so history writes wait for it.
+
+    Returns:
+        bool: True if the table was converted
+    """
+    if await _is_partitioned(conn):
+        return False
+    # Replicas starting together wait here, then find the table converted
+    await conn.execute(text(f"LOCK TABLE {HISTORY_TABLE} IN ACCESS EXCLUSIVE MODE"))
+    if await _is_partitioned(conn):
+        return False
+
+    legacy = f"{HISTORY_TABLE}_unpartitioned"
+    await conn.execute(text(f"ALTER TABLE {HISTORY_TABLE} RENAME TO {legacy}"))
+    # Free the names of its indexes and id sequence for the new table
+    result = await conn.execute(
+        text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = :name"
+        ),
+        {"name": legacy},
+    )
+    for index in result.scalars().all():
+        renamed = index.replace(HISTORY_TABLE, legacy, 1)
+        await conn.execute(text(f"ALTER INDEX {index} RENAME TO {renamed}"))
+    result = await conn.execute(
+        text("SELECT pg_get_serial_sequence(:name, 'id')"), {"name": legacy}
+    )
+    sequence = result.scalar()
+    if sequence:
+        await conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {legacy}_id_seq"))
+
+    await conn.run_sync(InventoryHistory.__table__.create)
+    moved = await _absorb(conn, legacy, {})
+    await conn.execute(
+        text(
+            "SELECT setval(pg_get_serial_sequence(:name, 'id'), max(id)) "
+            f"FROM {HISTORY_TABLE} HAVING count(*) > 0"
+        ),
+        {"name": HISTORY_TABLE},
+    )
+    logger.info(f"Partitioned {HISTORY_TABLE}, moving {moved} rows")
+    return True
+
+
+async def create_indexes(conn: AsyncConnection) -> List[str]:
+    """
+    Create the indexes of the model that an existing inventory_history
+    lacks, and drop the product_id index they superseded.
+
+    Building an index blocks history writes until it is done.
+
+    Returns:
+        list: The names of the indexes created
+    """
+    result = await conn.execute(
+        text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = :name"
+        ),
+        {"name": HISTORY_TABLE},
+    )
+    existing = set(result.scalars().all())
+    created = []
+    for index in sorted(InventoryHistory.__table__.indexes, key=lambda i: i.name):
+        if index.name not in existing:
+            await conn.execute(CreateIndex(index, if_not_exists=True))
+            created.append(index.name)
+    await conn.execute(text(f"DROP INDEX IF EXISTS ix_{HISTORY_TABLE}_product_id"))
+    return created
+
+
+async def create_partitions(conn: AsyncConnection, today: date) -> List[str]:
+    """
+    Create the partitions from the current month to HISTORY_PARTITIONS_AHEAD
+    months ahead.
+
+    Bounds are UTC month starts, so a day never spans two partitions. There
+    is no default partition: history written outside the partitions fails.
+
+    Returns:
+        list: The names of the partitions created
+    """
+    existing = await _partitions(conn)
+    if DEFAULT_PARTITION in existing:
+        await conn.execute(
+            text(f"ALTER TABLE {HISTORY_TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+        )
+        moved = await _absorb(conn, DEFAULT_PARTITION, existing)
+        logger.info(f"Moved {moved} rows out of {DEFAULT_PARTITION}")
+        existing = await _partitions(conn)
+
+    created = []
+    month = today.replace(day=1)
+    for offset in range(settings.HISTORY_PARTITIONS_AHEAD + 1):
+        start = _add_months(month, offset)
+        name = partition_name(start)
+        if name not in existing:
+            await _create_partition(conn, start)
+            created.append(name)
+    return created
+
+
+async def detach_partition(name: str, pending: bool = False):
+    """
+    Detach a partition without blocking writes to the other partitions.
+
+    Runs outside of any transaction, as DETACH PARTITION CONCURRENTLY has
+    to; a detach that was interrupted (pending) is finalized instead. Before
+    Postgres 14, the partition is detached with a plain DETACH PARTITION,
+    which holds up writes to the table until it is done.
+    """
+    mode = "FINALIZE" if pending else "CONCURRENTLY"
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if not _detaches_concurrently(conn):
+            mode = ""
+        await conn.execute(
+            text(f"ALTER TABLE {HISTORY_TABLE} DETACH PARTITION {name} {mode}")
+        )
+
+
+async def roll_up_partition(conn: AsyncConnection, name: str) -> int:
+    """
+    Add a detached partition's movements to the daily per-product totals
+    and drop it, in the caller's transaction.
+
+    Returns:
+        int: The number of daily totals written
+    """
+    partition = table(
+        name,
+        column("product_id"),
+        column("timestamp"),
+        column("change_type"),
+        column("quantity_change"),
+    )
+    day = func.date(func.timezone(literal_column("'UTC'"), partition.c.timestamp))
+    totals = select(
+        partition.c.product_id,
+        day,
+        partition.c.change_type,
+        func.count(),
+        func.sum(partition.c.quantity_change),
+    ).group_by(partition.c.product_id, day, partition.c.change_type)
+
+    daily = InventoryHistoryDaily.__table__
+    insert = pg_insert(daily).from_select(
+        ["product_id", "day", "change_type", "movements", "quantity_change"], totals
+    )
+    result = await conn.execute(
+        insert.on_conflict_do_update(
+            index_elements=["product_id", "day", "change_type"],
+            set_={
+                "movements": daily.c.movements + insert.excluded.movements,
+                "quantity_change": daily.c.quantity_change
+                + insert.excluded.quantity_change,
+            },
+        )
+    )
+    await conn.execute(text(f"DROP TABLE {name}"))
+    return result.rowcount
+
+
+class HistoryPartitionManager:
+    """
+    Keeps inventory_history partitioned: creates each month's partition
+    ahead of time and rolls up the ones past retention.
+
+    start() creates the partitions before returning, so history writes
+    always find theirs. A table created before partitioning was introduced
+    is converted first (see partition_table), and one created before its
+    current indexes gets them (see create_indexes).
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.partitioned = False
+        self.created = 0
+        self.rolled_up = 0
+        self.daily_rows = 0
+        self.errors = 0
+
+    async def start(self):
+        """
+        Partition the table if needed and create the upcoming partitions,
+        then maintain them in the background.
+        """
+        async with engine.begin() as conn:
+            if not await partition_table(conn):
+                indexes = await create_indexes(conn)
+                if indexes:
+                    logger.info(f"Created history indexes {', '.join(indexes)}")
+        self.partitioned = True
+
+        try:
+            await self.maintain_once()
+        except Exception as e:
+            # Another replica may be creating the same partitions
+            self.errors += 1
+            logger.error(f"History partition maintenance failed: {str(e)}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop maintaining partitions."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.HISTORY_MAINTENANCE_INTERVAL)
+            try:
+                await self.maintain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"History partition maintenance failed: {str(e)}")
+
+    async def maintain_once(self, today: Optional[date] = None):
+        """
+        Create upcoming partitions, then detach the expired ones and roll
+        up each detached partition in its own transaction.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        async with engine.begin() as conn:
+            created = await create_partitions(conn, today)
+            partitions = await _partitions(conn)
+        self.created += len(created)
+        if created:
+            logger.info(f"Created history partitions {', '.join(created)}")
+
+        if settings.HISTORY_RETENTION_MONTHS <= 0:
+            return
+        cutoff = _add_months(today.replace(day=1), -settings.HISTORY_RETENTION_MONTHS)
+        for name, pending in sorted(partitions.items()):
+            month = _partition_month(name)
+            if month is not None and month < cutoff:
+                # Dropping an attached partition would lock the whole table
+                await detach_partition(name, pending)
+
+        async with engine.begin() as conn:
+            detached = await _detached(conn)
+        for name in detached:
+            async with engine.begin() as conn:
+                daily_rows = await roll_up_partition(conn, name)
+            self.rolled_up += 1
+            self.daily_rows += daily_rows
+            logger.info(f"Rolled up {name} into {daily_rows} daily totals")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return partition maintenance counters."""
+        return {
+            "partitioned": self.partitioned,
+            "created": self.created,
+            "rolled_up": self.rolled_up,
+            "daily_rows": self.daily_rows,
+            "errors": self.errors,
+        }
+
+
+history_partitions = HistoryPartitionManager()
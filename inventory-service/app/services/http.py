@@ -0,0 +1,298 @@
+# Shared module: order-service/app/services/http.py is the source of truth.
+# Each service is built from its own directory, so it is copied into
+# product-service and inventory-service.
+# Change it there and copy it over; the copies must stay identical.
+
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+import httpx
+
+from app.core.breaker import CircuitBreaker
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+COALESCED_METHODS = {"GET", "HEAD"}
+# Request arguments that can be part of a coalescing key
+COALESCED_KWARGS = {"params", "headers", "json"}
+
+
+class CircuitOpenError(httpx.RequestError):
+    """
+    Raised instead of calling an upstream whose circuit breaker is open.
+
+    It subclasses httpx.RequestError, so clients handle it like any other
+    failure to reach the upstream.
+    """
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled, keep-alive HTTP client configured from settings."""
+    http2 = settings.HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning(
+                "HTTP2_ENABLED is set but 'h2' is not installed; using HTTP/1.1"
+            )
+            http2 = False
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT
+        ),
+        http2=http2,
+    )
+
+
+class ServiceClient:
+    """
+    Base class for clients of another service.
+
+    Every instance owns one long-lived ``httpx.AsyncClient`` so connections
+    to its upstream are pooled and reused across requests. The client is
+    opened by ``start_http_clients`` on application startup and closed by
+    ``close_http_clients`` on shutdown.
+    """
+
+    def __init__(self, base_url: str, name: Optional[str] = None):
+        self.base_url = base_url
+        self.name = name or type(self).__name__
+        self._client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(
+            self.name,
+            window=settings.BREAKER_WINDOW,
+            min_calls=settings.BREAKER_MIN_CALLS,
+            failure_rate=settings.BREAKER_FAILURE_RATE,
+            slow_call_rate=settings.BREAKER_SLOW_CALL_RATE,
+            slow_call_seconds=settings.BREAKER_SLOW_CALL_SECONDS,
+            open_seconds=settings.BREAKER_OPEN_SECONDS,
+            half_open_calls=settings.BREAKER_HALF_OPEN_CALLS,
+        )
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.coalescable = 0
+        self.coalesced = 0
+        _registry.append(self)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily as well, so the clients keep working outside the app
+        # lifecycle (scripts, tests)
+        if self._client is None or self._client.is_closed:
+            self._client = create_http_client()
+        return self._client
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        idempotent: Optional[bool] = None,
+        budget: Optional[float] = None,
+        coalesce: Optional[bool] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Send a request to the upstream through its circuit breaker.
+
+        Idempotent requests that fail with a network error or a 429, 502, 503
+        or 504 response are retried with jittered exponential backoff, for at
+        most HTTP_RETRY_ATTEMPTS attempts and within a time budget that also
+        caps each attempt's timeout.
+
+        Concurrent identical requests that are safe to share (same method,
+        path, params, headers and JSON body) are coalesced: they wait on a
+        single upstream call and all get its response, or its error.
+
+        Args:
+            method: The HTTP method
+            path: The path below base_url
+            idempotent: Whether retrying is safe; defaults to the method's
+                semantics, so POSTs are not retried unless this is set
+            budget: Seconds for all attempts, HTTP_RETRY_BUDGET by default
+            coalesce: Whether identical concurrent requests may share one
+                call; defaults to True for GET and HEAD
+            **kwargs: Passed on to httpx.AsyncClient.request
+
+        Returns:
+            httpx.Response: The response of the last attempt
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+            httpx.RequestError: If the last attempt failed to get a response
+        """
+        if coalesce is None:
+            coalesce = method.upper() in COALESCED_METHODS
+        key = (
+            self._coalescing_key(method, path, kwargs)
+            if coalesce and settings.HTTP_COALESCING_ENABLED
+            else None
+        )
+        if key is None:
+            return await self._send(method, path, idempotent, budget, **kwargs)
+
+        self.coalescable += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._send(method, path, idempotent, budget, **kwargs)
+            )
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._call_done(key, done))
+        else:
+            self.coalesced += 1
+
+        # Shielded so that a cancelled caller does not cancel the shared call
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _coalescing_key(
+        method: str, path: str, kwargs: Dict[str, Any]
+    ) -> Optional[Hashable]:
+        if not set(kwargs) <= COALESCED_KWARGS:
+            return None
+        try:
+            arguments = json.dumps(kwargs, sort_keys=True, default=str)
+        except (TypeError, ValueError):
+            return None
+        return method.upper(), path, arguments
+
+    def _call_done(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Every waiter may have been cancelled; retrieve the error regardless
+        if not task.cancelled():
+            task.exception()
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        idempotent: Optional[bool],
+        budget: Optional[float],
+        **kwargs: Any,
+    ) -> httpx.Response:
+        url = f"{self.base_url}{path}"
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempts = settings.HTTP_RETRY_ATTEMPTS if idempotent else 1
+        deadline = time.monotonic() + (budget or settings.HTTP_RETRY_BUDGET)
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                raise CircuitOpenError(
+                    f"Circuit breaker for {self.name} is open",
+                    request=httpx.Request(method, url),
+                )
+
+            remaining = max(deadline - time.monotonic(), 0.001)
+            timeout = min(settings.HTTP_TIMEOUT, remaining)
+            started = time.monotonic()
+            try:
+                response = await self.client.request(
+                    method,
+                    url,
+                    timeout=httpx.Timeout(
+                        timeout, connect=min(settings.HTTP_CONNECT_TIMEOUT, timeout)
+                    ),
+                    **kwargs,
+                )
+            except httpx.RequestError as e:
+                self.breaker.record(True, time.monotonic() - started)
+                error: Optional[httpx.RequestError] = e
+                response = None
+            else:
+                self.breaker.record(
+                    response.status_code >= 500, time.monotonic() - started
+                )
+                error = None
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+
+            # Full jitter: a random delay up to the exponential backoff
+            attempt += 1
+            delay = random.uniform(
+                0,
+                min(
+                    settings.HTTP_RETRY_BACKOFF_MAX,
+                    settings.HTTP_RETRY_BACKOFF_BASE * 2 ** (attempt - 1),
+                ),
+            )
+            if attempt >= attempts or time.monotonic() + delay >= deadline:
+                if error is not None:
+                    raise error
+                return response
+
+            logger.warning(
+                f"{method} {url} failed (attempt {attempt}), retrying in "
+                f"{delay:.2f}s: {error or response.status_code}"
+            )
+            await asyncio.sleep(delay)
+
+    def coalescing_stats(self) -> Dict[str, Any]:
+        """Return how many coalescable requests shared an in-flight call."""
+        return {
+            "coalescable": self.coalescable,
+            "coalesced": self.coalesced,
+            "coalesce_rate": (
+                round(self.coalesced / self.coalescable, 4) if self.coalescable else 0.0
+            ),
+            "in_flight": len(self._in_flight),
+        }
+
+    async def start(self):
+        """Open the pooled HTTP client."""
+        if self._client is None or self._client.is_closed:
+            self._client = create_http_client()
+
+    async def close(self):
+        """Close the pooled HTTP client and its connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_registry: List[ServiceClient] = []
+
+
+async def start_http_clients():
+    """Open the HTTP client of every service client."""
+    for service_client in _registry:
+        await service_client.start()
+    logger.info(f"Started {len(_registry)} HTTP client pools")
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """Return the circuit breaker state of every service client."""
+    return {
+        service_client.name: service_client.breaker.stats()
+        for service_client in _registry
+    }
+
+
+def coalescing_stats() -> Dict[str, Dict[str, Any]]:
+    """Return the request coalescing counters of every service client."""
+    return {
+        service_client.name: service_client.coalescing_stats()
+        for service_client in _registry
+    }
+
+
+async def close_http_clients():
+    """Close the HTTP client of every service client."""
+    for service_client in _registry:
+        await service_client.close()
+    logger.info("HTTP client pools closed")
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.services.notification import notification_service
+from app.services.product import product_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Alert:
+    product_id: str
+    available_quantity: int
+    threshold: int
+    triggered_at: str
+    due_at: float
+    attempts: int = 0
+    # Set when the product is restocked while the alert is being delivered
+    cancelled: bool = False
+
+
+class LowStockNotifier:
+    """
+    Background queue of low-stock notifications.
+
+    Request handlers only call notify() with the inventory rows they
+    changed; it does no I/O. The queue holds at most one alert per product:
+    a product that keeps changing while low is sent once, with its latest
+    quantity, LOW_STOCK_DEBOUNCE seconds after it first went low. After an
+    alert is sent, the product is not alerted again for
+    LOW_STOCK_DEDUPE_WINDOW seconds unless it runs out of stock, and not
+    at all until it is restocked above its threshold and goes low again.
+
+    Due alerts are delivered in batches of NOTIFICATION_BATCH_SIZE. Failed
+    ones are retried with exponential backoff, up to
+    NOTIFICATION_MAX_ATTEMPTS times.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, _Alert] = {}
+        self._delivering: Dict[str, _Alert] = {}
+        # product_id -> (monotonic time, quantity) of the last alert sent
+        self._sent: Dict[str, tuple] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.queued = 0
+        self.suppressed = 0
+        self.sent = 0
+        self.retried = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ENABLE_NOTIFICATIONS and bool(settings.NOTIFICATION_URL)
+
+    def notify(self, inventory_item: Any):
+        """
+        Queue a low-stock alert for an inventory row if it is at or below its
+        reorder threshold.
+
+        Args:
+            inventory_item: A row with product_id, available_quantity and
+                reorder_threshold, as read after the change
+        """
+        if not self.enabled:
+            return
+
+        product_id = inventory_item.product_id
+        quantity = inventory_item.available_quantity
+        threshold = inventory_item.reorder_threshold
+        if quantity > threshold:
+            # Restocked: the next drop is a new alert
+            self._sent.pop(product_id, None)
+            self._pending.pop(product_id, None)
+            delivering = self._delivering.pop(product_id, None)
+            if delivering is not None:
+                delivering.cancelled = True
+            return
+
+        alert = self._pending.get(product_id) or self._delivering.get(product_id)
+        if alert is not None:
+            alert.available_quantity = quantity
+            alert.threshold = threshold
+            return
+
+        now = time.monotonic()
+        last = self._sent.get(product_id)
+        if last is not None:
+            sent_at, sent_quantity = last
+            ran_out = quantity == 0 and sent_quantity > 0
+            if now - sent_at < settings.LOW_STOCK_DEDUPE_WINDOW and not ran_out:
+                self.suppressed += 1
+                return
+
+        self._pending[product_id] = _Alert(
+            product_id=product_id,
+            available_quantity=quantity,
+            threshold=threshold,
+            triggered_at=datetime.utcnow().isoformat(),
+            due_at=now + settings.LOW_STOCK_DEBOUNCE,
+        )
+        self.queued += 1
+        self._wakeup.set()
+
+    def notify_many(self, inventory_items: Iterable[Any]):
+        """Queue low-stock alerts for several inventory rows."""
+        for inventory_item in inventory_items:
+            self.notify(inventory_item)
+
+    async def start(self):
+        """Start delivering alerts in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop delivering alerts; queued alerts are dropped."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.deliver_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Low stock notification delivery failed: {str(e)}")
+
+            self._wakeup.clear()
+            delay = self._next_due()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _next_due(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        due_at = min(alert.due_at for alert in self._pending.values())
+        return max(due_at - time.monotonic(), 0)
+
+    async def deliver_due(self) -> int:
+        """
+        Deliver every alert that is due, in batches.
+
+        Returns:
+            int: The number of alerts delivered
+        """
+        delivered = 0
+        while True:
+            now = time.monotonic()
+            due = sorted(
+                (alert for alert in self._pending.values() if alert.due_at <= now),
+                key=lambda alert: alert.due_at,
+            )[: settings.NOTIFICATION_BATCH_SIZE]
+            if not due:
+                return delivered
+            for alert in due:
+                self._delivering[alert.product_id] = self._pending.pop(alert.product_id)
+
+            try:
+                failed = await self._deliver(due)
+            finally:
+                self._delivering.clear()
+            failed_ids = {alert.product_id for alert in failed}
+            for alert in due:
+                if alert.cancelled:
+                    # Restocked meanwhile, so neither resent nor deduplicated
+                    continue
+                if alert.product_id in failed_ids:
+                    self._retry(alert)
+                else:
+                    self._sent[alert.product_id] = (now, alert.available_quantity)
+            self.sent += len(due) - len(failed)
+            delivered += len(due) - len(failed)
+
+    async def _deliver(self, alerts: List[_Alert]) -> List[_Alert]:
+        products = await asyncio.gather(
+            *(product_service.get_product(alert.product_id) for alert in alerts),
+            return_exceptions=True,
+        )
+        notifications = []
+        for alert, product in zip(alerts, products):
+            name = alert.product_id
+            if isinstance(product, dict):
+                name = product.get("name", alert.product_id)
+            notifications.append(
+                {
+                    "type": "low_stock",
+                    "product_id": alert.product_id,
+                    "product_name": name,
+                    "current_quantity": alert.available_quantity,
+                    "threshold": alert.threshold,
+                    "timestamp": alert.triggered_at,
+                }
+            )
+
+        failed = await notification_service.send_notifications(notifications)
+        return [alerts[index] for index in failed]
+
+    def _retry(self, alert: _Alert):
+        if alert.product_id in self._pending:
+            # A newer alert for the product was queued meanwhile
+            return
+
+        alert.attempts += 1
+        if alert.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            self.dropped += 1
+            logger.error(
+                f"Dropping low stock notification for {alert.product_id} "
+                f"after {alert.attempts} attempts"
+            )
+            return
+
+        self.retried += 1
+        alert.due_at = time.monotonic() + min(
+            settings.NOTIFICATION_RETRY_BACKOFF_MAX,
+            settings.NOTIFICATION_RETRY_BACKOFF * 2 ** (alert.attempts - 1),
+        )
+        self._pending[alert.product_id] = alert
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue size and delivery counters."""
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "queued": self.queued,
+            "suppressed": self.suppressed,
+            "sent": self.sent,
+            "retried": self.retried,
+            "dropped": self.dropped,
+        }
+
+
+low_stock_notifier = LowStockNotifier()
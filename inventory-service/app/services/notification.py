@@ -0,0 +1,79 @@
+import asyncio
+import httpx
+import logging
+from typing import Any, Dict, List
+
+from app.core.config import settings
+from app.services.http import ServiceClient
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationServiceClient(ServiceClient):
+    """Client for sending notifications to the Notification Service."""
+
+    def __init__(self):
+        super().__init__(
+            str(settings.NOTIFICATION_URL or ""), name="notification-service"
+        )
+
+    async def send_notification(self, notification_data: Dict[str, Any]) -> bool:
+        """
+        Send a notification.
+
+        Args:
+            notification_data: The notification payload
+
+        Returns:
+            bool: True if the notification was accepted, False otherwise
+        """
+        response = await self.request("POST", "", json=notification_data)
+        if response.status_code >= 400:
+            logger.error(f"Notification rejected: {response.text}")
+            return False
+        return True
+
+    async def send_notifications(
+        self, notifications: List[Dict[str, Any]]
+    ) -> List[int]:
+        """
+        Send several notifications.
+
+        With NOTIFICATION_BATCH_PATH set they are posted as one JSON list,
+        which succeeds or fails as a whole; otherwise they are posted one by
+        one, concurrently.
+
+        Args:
+            notifications: The notification payloads
+
+        Returns:
+            List[int]: The indexes of the notifications that were not accepted
+        """
+        if settings.NOTIFICATION_BATCH_PATH:
+            try:
+                response = await self.request(
+                    "POST", settings.NOTIFICATION_BATCH_PATH, json=notifications
+                )
+            except httpx.RequestError as e:
+                logger.error(f"Request error sending notifications: {str(e)}")
+                return list(range(len(notifications)))
+            if response.status_code >= 400:
+                logger.error(f"Notifications rejected: {response.text}")
+                return list(range(len(notifications)))
+            return []
+
+        results = await asyncio.gather(
+            *(self.send_notification(data) for data in notifications),
+            return_exceptions=True,
+        )
+        failed = []
+        for index, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.error(f"Request error sending notification: {str(result)}")
+            if result is not True:
+                failed.append(index)
+        return failed
+
+
+# Create a singleton instance
+notification_service = NotificationServiceClient()
@@ -0,0 +1,49 @@
+import httpx
+import logging
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.services.http import ServiceClient
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of order-service's POST /expire per order
+EXPIRE_CANCELLED = "cancelled"
+EXPIRE_ALREADY_CANCELLED = "already_cancelled"
+EXPIRE_KEPT = "kept"
+EXPIRE_MISSING = "missing"
+
+
+class OrderServiceClient(ServiceClient):
+    """Client for interacting with the Order Service."""
+
+    def __init__(self):
+        super().__init__(str(settings.ORDER_SERVICE_URL or ""), name="order-service")
+
+    async def expire_orders(self, order_ids: List[str]) -> Optional[Dict[str, str]]:
+        """
+        Cancel orders whose reservations expired, if they are still pending.
+
+        Args:
+            order_ids: The IDs of the orders
+
+        Returns:
+            dict: The outcome per order ID (EXPIRE_*), or None if order-service
+            could not be reached or rejected the request
+        """
+        try:
+            response = await self.request(
+                "POST", "/orders/expire", json={"order_ids": order_ids}, idempotent=True
+            )
+        except httpx.RequestError as e:
+            logger.error(f"Request error expiring orders: {str(e)}")
+            return None
+
+        if response.status_code != 200:
+            logger.error(f"Error expiring orders: {response.text}")
+            return None
+        return response.json()["results"]
+
+
+# Create a singleton instance
+order_service = OrderServiceClient()
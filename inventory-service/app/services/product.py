@@ -1,46 +1,69 @@
 import httpx
 import logging
 from typing import Dict, Optional
-from tenacity import retry, stop_after_attempt, wait_fixed
 
+from app.core.cache import MISSING, TTLCache
 from app.core.config import settings
+from app.services.http import ServiceClient
+from app.services.product_events import ProductEventSubscriber
 
 logger = logging.getLogger(__name__)
 
 
-class ProductServiceClient:
+class ProductServiceClient(ServiceClient):
     """Client for interacting with the Product Service."""
 
     def __init__(self):
-        self.base_url = str(settings.PRODUCT_SERVICE_URL)
-        self.timeout = 5.0  # seconds
-        self.max_retries = settings.MAX_RETRIES
-        self.retry_delay = settings.RETRY_DELAY
+        super().__init__(str(settings.PRODUCT_SERVICE_URL), name="product-service")
+        self.cache = TTLCache(
+            maxsize=settings.PRODUCT_CACHE_SIZE,
+            ttl=settings.PRODUCT_CACHE_TTL,
+            negative_ttl=settings.PRODUCT_CACHE_NEGATIVE_TTL,
+        )
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
     async def get_product(self, product_id: str) -> Optional[Dict]:
         """
         Get product details by ID.
 
+        Products and 404s are served from the in-process cache when present.
+
         Args:
             product_id: The ID of the product
 
         Returns:
             dict: Product details or None if not found
         """
+        product = self.cache.get(product_id)
+        if product is not MISSING:
+            return product
+
+        return await self._fetch_product(product_id)
+
+    def invalidate_product(self, product_id: str) -> bool:
+        """
+        Evict a product from the cache, e.g. after it was updated or deleted.
+
+        Returns:
+            bool: True if the product was cached
+        """
+        return self.cache.invalidate(product_id)
+
+    async def _fetch_product(self, product_id: str) -> Optional[Dict]:
         logger.info(f"Getting product details for ID: {product_id}")
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(f"{self.base_url}/products/{product_id}")
-
-                if response.status_code == 200:
-                    return response.json()
-                elif response.status_code == 404:
-                    logger.warning(f"Product not found: {product_id}")
-                    return None
-                else:
-                    logger.error(f"Error getting product: {response.text}")
-                    return None
+            response = await self.request("GET", f"/products/{product_id}")
+
+            if response.status_code == 200:
+                product = response.json()
+                self.cache.set(product_id, product)
+                return product
+            elif response.status_code == 404:
+                logger.warning(f"Product not found: {product_id}")
+                self.cache.set(product_id, None)
+                return None
+            else:
+                logger.error(f"Error getting product: {response.text}")
+                return None
         except httpx.RequestError as e:
             logger.error(f"Request error getting product: {str(e)}")
             return None
@@ -48,3 +71,9 @@ class ProductServiceClient:
 
 # Create a singleton instance
 product_service = ProductServiceClient()
+product_events = ProductEventSubscriber(
+    settings.REDIS_URL,
+    settings.PRODUCT_EVENTS_CHANNEL,
+    on_change=product_service.invalidate_product,
+    on_resync=product_service.cache.clear,
+)
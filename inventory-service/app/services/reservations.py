@@ -0,0 +1,327 @@
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import String, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.postgresql import AsyncSessionLocal
+from app.models.inventory import (
+    RESERVATION_ACTIVE,
+    RESERVATION_CONFIRMED,
+    RESERVATION_EXPIRED,
+    RESERVATION_RELEASED,
+    InventoryHistory,
+    Reservation,
+)
+from app.services.low_stock import low_stock_notifier
+from app.services.order import (
+    EXPIRE_ALREADY_CANCELLED,
+    EXPIRE_CANCELLED,
+    EXPIRE_KEPT,
+    EXPIRE_MISSING,
+    order_service,
+)
+from app.services.stock import array_param, lock_items, move_stock
+
+logger = logging.getLogger(__name__)
+
+# Outcomes after which the sweeper releases the stock
+RELEASE_OUTCOMES = (EXPIRE_CANCELLED, EXPIRE_ALREADY_CANCELLED, EXPIRE_MISSING)
+
+
+async def lock_orders(db: AsyncSession, order_ids: List[str]):
+    """
+    Serialize transactions on the given orders until they end.
+
+    Take it before locking any stock, and before checking whether an order
+    was already reserved or released: stock locks alone do not serialize
+    retries of one order, as escrowed products lock a random bucket.
+
+    Args:
+        db: The session, inside the transaction to serialize
+        order_ids: The order IDs
+    """
+    # One statement, keys in a fixed order, so batches cannot deadlock
+    keys = sorted({order_id for order_id in order_ids if order_id})
+    if not keys:
+        return
+    key = func.hashtext(func.unnest(array_param(keys, String))).label("key")
+    ordered = select(key).distinct().order_by(key).subquery()
+    await db.execute(select(func.pg_advisory_xact_lock(ordered.c.key)))
+
+
+async def record_reservations(
+    db: AsyncSession, reservations: Dict[str, Dict[str, int]]
+):
+    """
+    Record the stock reserved for orders, expiring RESERVATION_TTL from now.
+
+    Must run in the transaction that reserved the stock.
+
+    Args:
+        db: The session, inside the reserving transaction
+        reservations: Reserved quantities per product, keyed by order ID
+    """
+    if settings.RESERVATION_TTL <= 0 or not reservations:
+        return
+
+    expires_at = func.now() + timedelta(seconds=settings.RESERVATION_TTL)
+    await db.execute(
+        pg_insert(Reservation)
+        .values(
+            [
+                {
+                    "order_id": order_id,
+                    "items": items,
+                    "status": RESERVATION_ACTIVE,
+                    "expires_at": expires_at,
+                }
+                for order_id, items in reservations.items()
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=["order_id"])
+    )
+
+
+async def close_reservation(db: AsyncSession, order_id: str) -> bool:
+    """
+    Mark an order's reservation as released, so the sweeper leaves it alone.
+
+    Call it before locking any inventory rows: the sweeper locks reservation
+    rows first as well, and releases only the ones it could still close.
+
+    Returns:
+        bool: True if the order had an open reservation
+    """
+    result = await db.execute(
+        update(Reservation)
+        .where(
+            Reservation.order_id == order_id,
+            Reservation.status.in_([RESERVATION_ACTIVE, RESERVATION_CONFIRMED]),
+        )
+        .values(status=RESERVATION_RELEASED, closed_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+async def close_reservations(db: AsyncSession, order_ids: List[str]) -> int:
+    """
+    Mark the reservations of several orders as released; see
+    close_reservation.
+
+    Returns:
+        int: The number of open reservations closed
+    """
+    result = await db.execute(
+        update(Reservation)
+        .where(
+            Reservation.order_id.in_(order_ids),
+            Reservation.status.in_([RESERVATION_ACTIVE, RESERVATION_CONFIRMED]),
+        )
+        .values(status=RESERVATION_RELEASED, closed_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def _confirm_reservations(db: AsyncSession, order_ids: List[str]) -> int:
+    result = await db.execute(
+        update(Reservation)
+        .where(
+            Reservation.order_id.in_(order_ids),
+            Reservation.status == RESERVATION_ACTIVE,
+        )
+        .values(status=RESERVATION_CONFIRMED, closed_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def _release_reservations(db: AsyncSession, order_ids: List[str]) -> int:
+    """
+    Expire the given reservations and give their stock back in bulk.
+
+    Reservations closed in the meantime (e.g. released by a cancellation)
+    are not matched and not released again. As with release-batch, each
+    release is capped at what is still reserved.
+    """
+    result = await db.execute(
+        update(Reservation)
+        .where(
+            Reservation.order_id.in_(order_ids),
+            Reservation.status == RESERVATION_ACTIVE,
+        )
+        .values(status=RESERVATION_EXPIRED, closed_at=func.now())
+        .returning(Reservation.order_id, Reservation.items)
+        .execution_options(synchronize_session=False)
+    )
+    reservations = {row.order_id: row.items for row in result}
+    if not reservations:
+        return 0
+
+    requested: Dict[str, int] = {}
+    for items in reservations.values():
+        for product_id, quantity in items.items():
+            requested[product_id] = requested.get(product_id, 0) + quantity
+    locked = await lock_items(
+        db, sorted(requested), dict(sorted(requested.items())), releasing=True
+    )
+    available = {pid: row.available_quantity for pid, row in locked.items()}
+    reserved = {pid: row.reserved_quantity for pid, row in locked.items()}
+
+    totals: Dict[str, int] = {}
+    history = []
+    for order_id, items in reservations.items():
+        for product_id, quantity in sorted(items.items()):
+            released = min(quantity, reserved.get(product_id, 0))
+            if released < quantity:
+                logger.warning(
+                    f"Expiry release capped for {product_id} of order {order_id}. "
+                    f"Requested={quantity}, Reserved={reserved.get(product_id, 0)}"
+                )
+            if released <= 0:
+                continue
+
+            history.append(
+                {
+                    "product_id": product_id,
+                    "quantity_change": released,
+                    "previous_quantity": available[product_id],
+                    "new_quantity": available[product_id] + released,
+                    "change_type": "release",
+                    "reference_id": order_id,
+                }
+            )
+            available[product_id] += released
+            reserved[product_id] -= released
+            totals[product_id] = totals.get(product_id, 0) + released
+
+    if totals:
+        updated = await move_stock(
+            db,
+            locked,
+            {product_id: -quantity for product_id, quantity in sorted(totals.items())},
+        )
+        await db.execute(insert(InventoryHistory).values(history))
+        low_stock_notifier.notify_many(updated.values())
+
+    return len(reservations)
+
+
+class ReservationSweeper:
+    """
+    Background task that releases the stock of reservations past expiry.
+
+    Expired reservations are handled oldest first, in batches found through
+    the partial index on active reservations' expires_at. order-service is
+    asked to cancel each batch's orders first and has the final say: the
+    stock of orders it cancelled (or does not know) is released, while the
+    reservations of orders that moved past pending are confirmed and kept.
+    If order-service cannot be reached, nothing is released.
+    """
+
+    def __init__(self):
+        self._task = None
+        self.sweeps = 0
+        self.expired = 0
+        self.confirmed = 0
+        self.errors = 0
+
+    async def start(self):
+        """Start sweeping in the background, if reservations expire."""
+        if settings.RESERVATION_TTL <= 0:
+            return
+        if not settings.ORDER_SERVICE_URL:
+            logger.warning(
+                "ORDER_SERVICE_URL is not set; expired reservations are not swept"
+            )
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop sweeping."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # A full batch means more reservations may be waiting
+                while await self.sweep_once() >= settings.RESERVATION_SWEEP_BATCH_SIZE:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Reservation sweep failed: {str(e)}")
+
+            await asyncio.sleep(settings.RESERVATION_SWEEP_INTERVAL)
+
+    async def sweep_once(self) -> int:
+        """
+        Handle one batch of expired reservations.
+
+        Returns:
+            int: The number of reservations expired or confirmed
+        """
+        self.sweeps += 1
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Reservation.order_id)
+                .where(
+                    Reservation.status == RESERVATION_ACTIVE,
+                    Reservation.expires_at <= func.now(),
+                )
+                .order_by(Reservation.expires_at)
+                .limit(settings.RESERVATION_SWEEP_BATCH_SIZE)
+            )
+            order_ids = list(result.scalars().all())
+        if not order_ids:
+            return 0
+
+        outcomes = await order_service.expire_orders(order_ids)
+        if outcomes is None:
+            return 0
+        to_release = [oid for oid in order_ids if outcomes.get(oid) in RELEASE_OUTCOMES]
+        to_confirm = [oid for oid in order_ids if outcomes.get(oid) == EXPIRE_KEPT]
+
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                confirmed = (
+                    await _confirm_reservations(db, to_confirm) if to_confirm else 0
+                )
+                expired = (
+                    await _release_reservations(db, to_release) if to_release else 0
+                )
+
+        self.expired += expired
+        self.confirmed += confirmed
+        logger.info(
+            f"Swept {len(order_ids)} expired reservations: "
+            f"{expired} released, {confirmed} kept"
+        )
+        return expired + confirmed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return sweep counters."""
+        return {
+            "running": self._task is not None,
+            "sweeps": self.sweeps,
+            "expired": self.expired,
+            "confirmed": self.confirmed,
+            "errors": self.errors,
+        }
+
+
+reservation_sweeper = ReservationSweeper()
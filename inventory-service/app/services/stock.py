@@ -0,0 +1,639 @@
+import logging
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy import (
+    Integer,
+    String,
+    any_,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.models.inventory import InventoryBucket, InventoryHistory, InventoryItem
+
+logger = logging.getLogger(__name__)
+
+# Core tables: data-modifying CTEs have to be built on the tables, not the
+# ORM entities.
+inventory_items = InventoryItem.__table__
+inventory_history = InventoryHistory.__table__
+inventory_buckets = InventoryBucket.__table__
+
+
+def _escrowed(column_name: str):
+    """Sum a quantity over the escrow buckets of the enclosing inventory row."""
+    buckets = inventory_buckets.alias("escrow")
+    return (
+        select(func.coalesce(func.sum(buckets.c[column_name]), 0))
+        .where(buckets.c.product_id == inventory_items.c.product_id)
+        .correlate(inventory_items)
+        .scalar_subquery()
+    )
+
+
+# A product's stock is its inventory row plus its escrow buckets
+ESCROWED_AVAILABLE = _escrowed("available_quantity")
+ESCROWED_RESERVED = _escrowed("reserved_quantity")
+TOTAL_AVAILABLE = inventory_items.c.available_quantity + ESCROWED_AVAILABLE
+TOTAL_RESERVED = inventory_items.c.reserved_quantity + ESCROWED_RESERVED
+HAS_BUCKETS = (
+    select(inventory_buckets.c.id)
+    .where(inventory_buckets.c.product_id == inventory_items.c.product_id)
+    .correlate(inventory_items)
+    .exists()
+)
+
+
+@dataclass
+class StockLevel:
+    """A product's stock as locked by lock_items, totalled over its buckets."""
+
+    product_id: str
+    available_quantity: int
+    reserved_quantity: int
+    reorder_threshold: int
+    # The escrow bucket that was locked instead of the inventory row
+    bucket_id: Optional[int] = None
+    # Set by release_stock: the quantity actually released
+    released: int = 0
+
+
+def select_items(*criteria):
+    """
+    Select inventory items along with their escrowed quantities.
+
+    Pass the result to items_with_escrow().
+    """
+    return select(
+        InventoryItem,
+        ESCROWED_AVAILABLE.label("escrowed_available"),
+        ESCROWED_RESERVED.label("escrowed_reserved"),
+    ).where(*criteria)
+
+
+def items_with_escrow(result) -> List[InventoryItem]:
+    """
+    Return the items of a select_items() result with their escrowed
+    quantities added in.
+
+    The totals are set as the loaded state, so they are never written back.
+    """
+    items = []
+    for item, escrowed_available, escrowed_reserved in result:
+        if escrowed_available or escrowed_reserved:
+            set_committed_value(
+                item,
+                "available_quantity",
+                item.available_quantity + escrowed_available,
+            )
+            set_committed_value(
+                item, "reserved_quantity", item.reserved_quantity + escrowed_reserved
+            )
+        items.append(item)
+    return items
+
+
+def array_param(values: List, item_type):
+    """
+    Bind a list as a single Postgres array parameter.
+
+    The parameter is cast, as functions such as unnest() cannot infer the
+    type of an untyped one.
+    """
+    array_type = ARRAY(item_type)
+    return cast(literal(list(values), array_type), array_type)
+
+
+def product_ids_param(product_ids: List[str]):
+    """Bind a list of product IDs as a single Postgres varchar[] parameter."""
+    return array_param(product_ids, String)
+
+
+def quantities_table(quantities: Dict[str, int]):
+    """Expose per-product quantities as an unnest() derived table."""
+    return (
+        func.unnest(
+            product_ids_param(list(quantities)),
+            array_param(list(quantities.values()), Integer),
+        )
+        .table_valued("product_id", "quantity")
+        .render_derived(name="requested")
+    )
+
+
+async def fold_buckets(db: AsyncSession, product_ids: List[str]) -> Dict[str, Row]:
+    """
+    Move the stock held in the products' escrow buckets back into their
+    inventory rows, deleting the buckets; the rebalancer recreates them for
+    products still in ESCROW_PRODUCTS.
+
+    The caller must hold the inventory rows' locks: rows are always locked
+    before their buckets.
+
+    Returns:
+        dict: The new quantities of the products that had buckets
+    """
+    drained = (
+        delete(inventory_buckets)
+        .where(inventory_buckets.c.product_id == any_(product_ids_param(product_ids)))
+        .returning(
+            inventory_buckets.c.product_id,
+            inventory_buckets.c.available_quantity,
+            inventory_buckets.c.reserved_quantity,
+        )
+        .cte("drained")
+    )
+    totals = (
+        select(
+            drained.c.product_id,
+            func.sum(drained.c.available_quantity).label("available_quantity"),
+            func.sum(drained.c.reserved_quantity).label("reserved_quantity"),
+        )
+        .group_by(drained.c.product_id)
+        .cte("totals")
+    )
+    result = await db.execute(
+        update(inventory_items)
+        .where(inventory_items.c.product_id == totals.c.product_id)
+        .values(
+            available_quantity=inventory_items.c.available_quantity
+            + totals.c.available_quantity,
+            reserved_quantity=inventory_items.c.reserved_quantity
+            + totals.c.reserved_quantity,
+            updated_at=func.now(),
+        )
+        .returning(
+            inventory_items.c.product_id,
+            inventory_items.c.available_quantity,
+            inventory_items.c.reserved_quantity,
+        )
+    )
+    return {row.product_id: row for row in result}
+
+
+async def _lock_rows(
+    db: AsyncSession,
+    product_ids: List[str],
+    quantities: Optional[Dict[str, int]] = None,
+    releasing: bool = False,
+) -> Dict[str, StockLevel]:
+    """
+    Lock inventory rows in product_id order and fold the escrow buckets of
+    those that have stock in any, except where the row alone holds the
+    given quantity available (or reserved, when releasing).
+    """
+    if not product_ids:
+        return {}
+    result = await db.execute(
+        select(
+            inventory_items.c.product_id,
+            inventory_items.c.available_quantity,
+            inventory_items.c.reserved_quantity,
+            inventory_items.c.reorder_threshold,
+            ESCROWED_AVAILABLE.label("escrowed_available"),
+            ESCROWED_RESERVED.label("escrowed_reserved"),
+        )
+        .where(inventory_items.c.product_id == any_(product_ids_param(product_ids)))
+        .order_by(inventory_items.c.product_id)
+        .with_for_update(of=inventory_items)
+    )
+    locked = {}
+    to_fold = []
+    for row in result:
+        locked[row.product_id] = StockLevel(
+            row.product_id,
+            row.available_quantity + row.escrowed_available,
+            row.reserved_quantity + row.escrowed_reserved,
+            row.reorder_threshold,
+        )
+        held = row.reserved_quantity if releasing else row.available_quantity
+        if (row.escrowed_available or row.escrowed_reserved) and (
+            quantities is None or held < quantities[row.product_id]
+        ):
+            to_fold.append(row.product_id)
+
+    if to_fold:
+        for product_id, row in (await fold_buckets(db, to_fold)).items():
+            locked[product_id].available_quantity = row.available_quantity
+            locked[product_id].reserved_quantity = row.reserved_quantity
+    return locked
+
+
+async def _claim_bucket(
+    db: AsyncSession, product_id: str, quantity: int
+) -> Optional[StockLevel]:
+    """
+    Lock a random bucket of the product holding at least quantity available,
+    skipping buckets locked by others.
+    """
+    result = await db.execute(
+        select(
+            inventory_buckets.c.id,
+            inventory_items.c.reorder_threshold,
+            TOTAL_AVAILABLE.label("available_quantity"),
+            TOTAL_RESERVED.label("reserved_quantity"),
+        )
+        .where(
+            inventory_buckets.c.product_id == product_id,
+            inventory_items.c.product_id == inventory_buckets.c.product_id,
+            inventory_buckets.c.available_quantity >= quantity,
+        )
+        .order_by(func.random())
+        .limit(1)
+        .with_for_update(of=inventory_buckets, skip_locked=True)
+    )
+    row = result.first()
+    if not row:
+        return None
+    return StockLevel(
+        product_id,
+        row.available_quantity,
+        row.reserved_quantity,
+        row.reorder_threshold,
+        bucket_id=row.id,
+    )
+
+
+async def lock_items(
+    db: AsyncSession,
+    product_ids: List[str],
+    quantities: Optional[Dict[str, int]] = None,
+    releasing: bool = False,
+) -> Dict[str, StockLevel]:
+    """
+    Lock the stock of the given products in a deterministic order.
+
+    Inventory rows are locked in product_id order, which prevents deadlocks
+    between concurrent batch operations touching overlapping products, and
+    the stock of their escrow buckets is folded back into them.
+
+    Products in ESCROW_PRODUCTS are locked after the others, one at a time
+    in product_id order. With the quantities about to be reserved, one of
+    their buckets holding the quantity is locked, so concurrent callers do
+    not queue on the same row; the row is locked instead if none is free.
+    Releases always lock the row, which the rebalancer keeps holding their
+    reserved stock. Buckets are only folded when the row cannot cover the
+    quantity on its own.
+
+    Every caller thus locks the other products' rows, then each escrowed
+    product's row before its buckets, and the sets of products on either
+    side are the same for all callers as long as every replica has the
+    same ESCROW_PRODUCTS.
+
+    Returns:
+        dict: StockLevel per product_id, in product_id order. Quantities are
+        totals over the row and its buckets; those of other buckets are read
+        without locking them.
+    """
+    escrowed = set(settings.ESCROW_PRODUCTS).intersection(product_ids)
+    locked = await _lock_rows(db, sorted(set(product_ids) - escrowed))
+
+    for product_id in sorted(escrowed):
+        level = None
+        if quantities is not None and not releasing:
+            level = await _claim_bucket(db, product_id, quantities[product_id])
+        if level is None:
+            level = (await _lock_rows(db, [product_id], quantities, releasing)).get(
+                product_id
+            )
+        if level is not None:
+            locked[product_id] = level
+
+    return dict(sorted(locked.items()))
+
+
+async def move_stock(
+    db: AsyncSession, locked: Dict[str, StockLevel], quantities: Dict[str, int]
+) -> Dict[str, StockLevel]:
+    """
+    Move quantities from available to reserved stock, or back for negative
+    quantities, on what lock_items locked: one UPDATE per table.
+
+    The caller must have checked that the locked stock covers the move.
+
+    Returns:
+        dict: The new StockLevel of each product moved
+    """
+    rows = {}
+    buckets = {}
+    for product_id, quantity in quantities.items():
+        bucket_id = locked[product_id].bucket_id
+        if bucket_id is None:
+            rows[product_id] = quantity
+        else:
+            buckets[bucket_id] = quantity
+
+    if rows:
+        requested = quantities_table(rows)
+        await db.execute(
+            update(inventory_items)
+            .where(inventory_items.c.product_id == requested.c.product_id)
+            .values(
+                available_quantity=inventory_items.c.available_quantity
+                - requested.c.quantity,
+                reserved_quantity=inventory_items.c.reserved_quantity
+                + requested.c.quantity,
+                updated_at=func.now(),
+            )
+        )
+    if buckets:
+        requested = (
+            func.unnest(
+                array_param(list(buckets), Integer),
+                array_param(list(buckets.values()), Integer),
+            )
+            .table_valued("id", "quantity")
+            .render_derived(name="requested")
+        )
+        await db.execute(
+            update(inventory_buckets)
+            .where(inventory_buckets.c.id == requested.c.id)
+            .values(
+                available_quantity=inventory_buckets.c.available_quantity
+                - requested.c.quantity,
+                reserved_quantity=inventory_buckets.c.reserved_quantity
+                + requested.c.quantity,
+                updated_at=func.now(),
+            )
+        )
+
+    return {
+        product_id: replace(
+            locked[product_id],
+            available_quantity=locked[product_id].available_quantity - quantity,
+            reserved_quantity=locked[product_id].reserved_quantity + quantity,
+        )
+        for product_id, quantity in quantities.items()
+    }
+
+
+def _with_history(
+    updated, quantity_change, previous_quantity, change_type: str, reference_id
+):
+    """
+    Wrap an UPDATE ... RETURNING CTE so that the history row is inserted by
+    the same statement and the updated row is selected back.
+    """
+    history = (
+        insert(inventory_history)
+        .from_select(
+            [
+                "product_id",
+                "quantity_change",
+                "previous_quantity",
+                "new_quantity",
+                "change_type",
+                "reference_id",
+            ],
+            select(
+                updated.c.product_id,
+                quantity_change,
+                previous_quantity,
+                updated.c.available_quantity,
+                literal(change_type, String),
+                literal(reference_id, String),
+            ),
+        )
+        .cte("history")
+    )
+
+    return select(updated).add_cte(history)
+
+
+async def _record_movement(
+    db: AsyncSession,
+    level: StockLevel,
+    quantity_change: int,
+    change_type: str,
+    reference_id: Optional[str],
+):
+    await db.execute(
+        insert(inventory_history).values(
+            product_id=level.product_id,
+            quantity_change=quantity_change,
+            previous_quantity=level.available_quantity - quantity_change,
+            new_quantity=level.available_quantity,
+            change_type=change_type,
+            reference_id=reference_id,
+        )
+    )
+
+
+async def _reserve_escrowed(
+    db: AsyncSession, product_id: str, quantity: int, reference_id: Optional[str]
+) -> Optional[StockLevel]:
+    locked = await lock_items(db, [product_id], {product_id: quantity})
+    if product_id not in locked or locked[product_id].available_quantity < quantity:
+        return None
+
+    level = (await move_stock(db, locked, {product_id: quantity}))[product_id]
+    await _record_movement(db, level, -quantity, "reserve", reference_id)
+    return level
+
+
+async def _release_escrowed(
+    db: AsyncSession, product_id: str, quantity: int, reference_id: Optional[str]
+) -> Optional[StockLevel]:
+    locked = await lock_items(db, [product_id], {product_id: quantity}, releasing=True)
+    if product_id not in locked or locked[product_id].reserved_quantity <= 0:
+        return None
+
+    released = min(quantity, locked[product_id].reserved_quantity)
+    level = (await move_stock(db, locked, {product_id: -released}))[product_id]
+    await _record_movement(db, level, released, "release", reference_id)
+    return replace(level, released=released)
+
+
+def _reserved(product_id: str, quantity: int, reference_id: Optional[str], *criteria):
+    updated = (
+        update(inventory_items)
+        .where(
+            inventory_items.c.product_id == product_id,
+            inventory_items.c.available_quantity >= quantity,
+            *criteria,
+        )
+        .values(
+            available_quantity=inventory_items.c.available_quantity - quantity,
+            reserved_quantity=inventory_items.c.reserved_quantity + quantity,
+            updated_at=func.now(),
+        )
+        .returning(*inventory_items.c)
+        .cte("updated")
+    )
+    return _with_history(
+        updated,
+        literal(-quantity),
+        updated.c.available_quantity + quantity,
+        "reserve",
+        reference_id,
+    )
+
+
+async def reserve_stock(
+    db: AsyncSession, product_id: str, quantity: int, reference_id: Optional[str] = None
+) -> Optional[Union[Row, StockLevel]]:
+    """
+    Move quantity from available to reserved in a single guarded UPDATE.
+
+    Products in ESCROW_PRODUCTS are reserved from one of their escrow
+    buckets instead (see lock_items). As in adjust_stock, the UPDATE of
+    other products is guarded on them having no leftover buckets, and only
+    retried after folding those if it failed.
+
+    Returns:
+        Row: The updated inventory row (a StockLevel for escrowed
+        products), or None if the product does not exist or has less than
+        quantity available
+    """
+    if product_id in settings.ESCROW_PRODUCTS:
+        return await _reserve_escrowed(db, product_id, quantity, reference_id)
+
+    result = await db.execute(
+        _reserved(product_id, quantity, reference_id, ~HAS_BUCKETS)
+    )
+    item = result.first()
+    if item is None and await lock_items(db, [product_id]):
+        result = await db.execute(_reserved(product_id, quantity, reference_id))
+        item = result.first()
+    return item
+
+
+def _released(product_id: str, quantity: int, reference_id: Optional[str], *criteria):
+    previous = (
+        select(
+            inventory_items.c.product_id,
+            inventory_items.c.available_quantity,
+            inventory_items.c.reserved_quantity,
+        )
+        .where(inventory_items.c.product_id == product_id)
+        .with_for_update()
+        .subquery("previous")
+    )
+    released = func.least(quantity, previous.c.reserved_quantity)
+    updated = (
+        update(inventory_items)
+        .where(
+            inventory_items.c.product_id == previous.c.product_id,
+            previous.c.reserved_quantity > 0,
+            *criteria,
+        )
+        .values(
+            available_quantity=inventory_items.c.available_quantity + released,
+            reserved_quantity=inventory_items.c.reserved_quantity - released,
+            updated_at=func.now(),
+        )
+        .returning(
+            *inventory_items.c,
+            released.label("released"),
+            previous.c.available_quantity.label("previous_quantity"),
+        )
+        .cte("updated")
+    )
+    return _with_history(
+        updated,
+        updated.c.released,
+        updated.c.previous_quantity,
+        "release",
+        reference_id,
+    )
+
+
+async def release_stock(
+    db: AsyncSession, product_id: str, quantity: int, reference_id: Optional[str] = None
+) -> Optional[Union[Row, StockLevel]]:
+    """
+    Move up to quantity from reserved back to available in a single UPDATE.
+
+    The release is capped at the currently reserved quantity. The pre-update
+    values are read through a locking self-join so the actual amount
+    released is known without another round trip. Products in
+    ESCROW_PRODUCTS are released through lock_items instead; other products
+    with leftover buckets are released after folding those, as in
+    reserve_stock.
+
+    Returns:
+        Row: The updated inventory row with an extra ``released`` column (a
+        StockLevel for escrowed products), or None if the product does not
+        exist or has nothing reserved
+    """
+    if product_id in settings.ESCROW_PRODUCTS:
+        return await _release_escrowed(db, product_id, quantity, reference_id)
+
+    result = await db.execute(
+        _released(product_id, quantity, reference_id, ~HAS_BUCKETS)
+    )
+    item = result.first()
+    if item is None and await lock_items(db, [product_id]):
+        result = await db.execute(_released(product_id, quantity, reference_id))
+        item = result.first()
+    return item
+
+
+def _adjusted(
+    product_id: str, quantity_change: int, reference_id: Optional[str], *criteria
+):
+    updated = (
+        update(inventory_items)
+        .where(
+            inventory_items.c.product_id == product_id,
+            inventory_items.c.available_quantity + quantity_change >= 0,
+            *criteria,
+        )
+        .values(
+            available_quantity=inventory_items.c.available_quantity + quantity_change,
+            updated_at=func.now(),
+        )
+        .returning(*inventory_items.c)
+        .cte("updated")
+    )
+    return _with_history(
+        updated,
+        literal(quantity_change),
+        updated.c.available_quantity - quantity_change,
+        "add" if quantity_change > 0 else "remove",
+        reference_id,
+    )
+
+
+async def adjust_stock(
+    db: AsyncSession,
+    product_id: str,
+    quantity_change: int,
+    reference_id: Optional[str] = None,
+) -> Optional[Row]:
+    """
+    Add to or remove from available stock in a single guarded UPDATE.
+
+    The inventory row has to hold all of the product's stock. Escrow
+    buckets of products in ESCROW_PRODUCTS are folded back into it first;
+    other products have none but leftovers, so their UPDATE is guarded on
+    that instead and only retried after folding if it failed.
+
+    Returns:
+        Row: The updated inventory row, or None if the product does not
+        exist or the change would take available stock below zero
+    """
+    if product_id in settings.ESCROW_PRODUCTS:
+        await lock_items(db, [product_id])
+        result = await db.execute(_adjusted(product_id, quantity_change, reference_id))
+        return result.first()
+
+    result = await db.execute(
+        _adjusted(product_id, quantity_change, reference_id, ~HAS_BUCKETS)
+    )
+    item = result.first()
+    if item is None and await lock_items(db, [product_id]):
+        result = await db.execute(_adjusted(product_id, quantity_change, reference_id))
+        item = result.first()
+    return item
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import MISSING, TTLCache
+from app.core.config import settings
+from app.db.postgresql import engine
+from app.models.inventory import InventoryItem
+from app.services.stock import TOTAL_AVAILABLE, TOTAL_RESERVED
+
+logger = logging.getLogger(__name__)
+
+# Every change to an inventory row's (or escrow bucket's) quantities notifies
+# INVENTORY_CHANGES_CHANNEL with its product_id when the transaction
+# commits, whichever code path or replica made it.
+# Replicas may start together: the lock serializes their DDL until commit, as
+# concurrent CREATE OR REPLACE FUNCTION statements can fail, and a trigger
+# that exists already is left alone.
+CHANGE_TRIGGER_DDL: List[str] = [
+    "SELECT pg_advisory_xact_lock(hashtext('notify_inventory_change'), 0)",
+    f"""
+    CREATE OR REPLACE FUNCTION notify_inventory_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('{settings.INVENTORY_CHANGES_CHANNEL}', OLD.product_id);
+        ELSIF TG_OP = 'INSERT' THEN
+            PERFORM pg_notify('{settings.INVENTORY_CHANGES_CHANNEL}', NEW.product_id);
+        ELSIF OLD.available_quantity IS DISTINCT FROM NEW.available_quantity
+            OR OLD.reserved_quantity IS DISTINCT FROM NEW.reserved_quantity THEN
+            PERFORM pg_notify('{settings.INVENTORY_CHANGES_CHANNEL}', NEW.product_id);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    *(
+        f"""
+        DO $$
+        BEGIN
+            CREATE TRIGGER {table}_notify_change
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION notify_inventory_change();
+        EXCEPTION WHEN duplicate_object THEN
+            NULL;
+        END
+        $$
+        """
+        # Escrow buckets hold part of their product's stock
+        for table in ("inventory_items", "inventory_buckets")
+    ),
+]
+
+Quantities = Tuple[int, int]  # (available_quantity, reserved_quantity)
+
+
+class StockCache:
+    """
+    Read-through cache of each product's available and reserved quantities.
+
+    Entries are evicted when Postgres notifies a change to the product (see
+    CHANGE_TRIGGER_DDL), so every replica sees every write shortly after it
+    commits; INVENTORY_CACHE_TTL only bounds the damage of a lost
+    notification. The cache is bypassed while the LISTEN connection is
+    down and cleared whenever it is (re)established.
+
+    A read that raced with a change is not cached: each product has a
+    generation that invalidation bumps, and a value read from the database
+    is only stored if the generation did not move meanwhile.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(
+            maxsize=settings.INVENTORY_CACHE_SIZE,
+            ttl=settings.INVENTORY_CACHE_TTL,
+            negative_ttl=settings.INVENTORY_CACHE_NEGATIVE_TTL,
+        )
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._task: Optional[asyncio.Task] = None
+
+        self.listening = False
+        self.notifications = 0
+        self.resyncs = 0
+        self.bypassed = 0
+
+    @property
+    def active(self) -> bool:
+        return self.listening and settings.INVENTORY_CACHE_TTL > 0
+
+    async def get_quantities(
+        self, db: AsyncSession, product_id: str, strict: bool = False
+    ) -> Optional[Quantities]:
+        """
+        Get a product's quantities, from the cache unless strict is set.
+
+        Args:
+            db: The session used on a cache miss
+            product_id: The product ID
+            strict: Always read from the database
+
+        Returns:
+            tuple: (available_quantity, reserved_quantity), or None if the
+            product has no inventory
+        """
+        if strict or not self.active:
+            self.bypassed += 1
+            return await self._read(db, product_id)
+
+        quantities = self._cache.get(product_id)
+        if quantities is not MISSING:
+            return quantities
+
+        generation = (self._epoch, self._generations.get(product_id, 0))
+        quantities = await self._read(db, product_id)
+        if self.active and generation == (
+            self._epoch,
+            self._generations.get(product_id, 0),
+        ):
+            self._cache.set(product_id, quantities)
+        return quantities
+
+    async def _read(self, db: AsyncSession, product_id: str) -> Optional[Quantities]:
+        result = await db.execute(
+            select(
+                TOTAL_AVAILABLE.label("available_quantity"),
+                TOTAL_RESERVED.label("reserved_quantity"),
+            ).where(InventoryItem.product_id == product_id)
+        )
+        row = result.first()
+        return (row.available_quantity, row.reserved_quantity) if row else None
+
+    def invalidate(self, product_id: str):
+        """Evict a product and fail any read of it that is in progress."""
+        self._generations[product_id] = self._generations.get(product_id, 0) + 1
+        self._cache.invalidate(product_id)
+
+    def clear(self):
+        """Evict every product and fail every read in progress."""
+        self._epoch += 1
+        self._generations.clear()
+        self._cache.clear()
+
+    async def start(self):
+        """Install the change trigger and start listening for changes."""
+        if settings.INVENTORY_CACHE_TTL <= 0:
+            return
+        async with engine.begin() as conn:
+            for statement in CHANGE_TRIGGER_DDL:
+                await conn.execute(text(statement))
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Stop listening; the cache is bypassed from then on."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        while True:
+            connection = None
+            try:
+                dsn = str(settings.DATABASE_URL).replace("+asyncpg", "", 1)
+                connection = await asyncpg.connect(dsn)
+                await connection.add_listener(
+                    settings.INVENTORY_CHANGES_CHANNEL, self._on_notification
+                )
+                # Changes made while nobody listened were missed
+                self.clear()
+                self.resyncs += 1
+                self.listening = True
+                logger.info("Listening for inventory changes")
+
+                while True:
+                    await asyncio.sleep(settings.INVENTORY_CACHE_HEALTH_INTERVAL)
+                    # Notifications stop silently on a dead connection
+                    await connection.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Inventory change listener failed: {str(e)}")
+            finally:
+                self.listening = False
+                self.clear()
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+            await asyncio.sleep(settings.INVENTORY_CACHE_RECONNECT_DELAY)
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self.notifications += 1
+        self.invalidate(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the listener state and cache counters."""
+        return {
+            **self._cache.stats(),
+            "listening": self.listening,
+            "notifications": self.notifications,
+            "resyncs": self.resyncs,
+            "bypassed": self.bypassed,
+        }
+
+
+stock_cache = StockCache()
@@ -0,0 +1,35 @@
+import os
+from datetime import date
+
+import pytest
+import pytest_asyncio
+
+# Tests using the database fixture need a real Postgres; the app reads its
+# settings at import time
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+
+def pytest_collection_modifyitems(config, items):
+    if TEST_DATABASE_URL:
+        return
+    skip = pytest.mark.skip(reason="TEST_DATABASE_URL is not set")
+    for item in items:
+        if "database" in item.fixturenames:
+            item.add_marker(skip)
+
+
+@pytest_asyncio.fixture
+async def database():
+    """A freshly created schema, with the current month's history partitions."""
+    from app.db.postgresql import Base, engine
+    from app.services.history import create_partitions
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await create_partitions(conn, date.today())
+    yield
+    # Pooled connections belong to this test's event loop
+    await engine.dispose()
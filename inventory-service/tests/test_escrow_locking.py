@@ -0,0 +1,287 @@
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, func, select
+
+from app.api.routes.inventory import release_inventory_batch, reserve_inventory_batch
+from app.core.config import settings
+from app.db.postgresql import AsyncSessionLocal, engine
+from app.models.inventory import (
+    InventoryBucket,
+    InventoryCheck,
+    InventoryHistory,
+    InventoryItem,
+    InventoryReleaseBatch,
+    InventoryReserveBatch,
+)
+from app.services.escrow import rebalance_product
+from app.services.stock import (
+    TOTAL_AVAILABLE,
+    TOTAL_RESERVED,
+    adjust_stock,
+    release_stock,
+    reserve_stock,
+)
+
+HOT = "hot-product"
+COLD = "cold-product"
+
+
+async def _stock(product_id, available=0, reserved=0, buckets=()):
+    """Create a product holding the given quantities, plus one bucket per
+    (available, reserved) pair."""
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            db.add(
+                InventoryItem(
+                    product_id=product_id,
+                    available_quantity=available,
+                    reserved_quantity=reserved,
+                )
+            )
+            for bucket, (bucket_available, bucket_reserved) in enumerate(buckets):
+                db.add(
+                    InventoryBucket(
+                        product_id=product_id,
+                        bucket=bucket,
+                        available_quantity=bucket_available,
+                        reserved_quantity=bucket_reserved,
+                    )
+                )
+
+
+async def _totals(product_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(TOTAL_AVAILABLE, TOTAL_RESERVED).where(
+                InventoryItem.product_id == product_id
+            )
+        )
+        return tuple(result.one())
+
+
+async def _movements(order_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(InventoryHistory.change_type, func.count())
+            .where(InventoryHistory.reference_id == order_id)
+            .group_by(InventoryHistory.change_type)
+        )
+        return dict(result.all())
+
+
+async def _row(product_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(
+                InventoryItem.available_quantity, InventoryItem.reserved_quantity
+            ).where(InventoryItem.product_id == product_id)
+        )
+        return tuple(result.one())
+
+
+async def _buckets(product_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(
+                InventoryBucket.available_quantity, InventoryBucket.reserved_quantity
+            )
+            .where(InventoryBucket.product_id == product_id)
+            .order_by(InventoryBucket.bucket)
+        )
+        return [tuple(row) for row in result]
+
+
+@contextmanager
+def _statements():
+    """Collect the SQL statements executed meanwhile."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+async def _reserve_batch(request):
+    async with AsyncSessionLocal() as db:
+        return await reserve_inventory_batch(request, db=db, current_user={})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_retries_of_an_order_reserve_once(database, monkeypatch):
+    monkeypatch.setattr(settings, "ESCROW_PRODUCTS", [HOT])
+    # Enough free buckets for every retry to lock a different one
+    await _stock(HOT, buckets=[(10, 0)] * 4)
+    request = InventoryReserveBatch(
+        items=[InventoryCheck(product_id=HOT, quantity=3)], order_id="order-1"
+    )
+
+    results = await asyncio.gather(*(_reserve_batch(request) for _ in range(4)))
+
+    assert sorted(bool(result.get("duplicate")) for result in results) == [
+        False,
+        True,
+        True,
+        True,
+    ]
+    assert await _movements("order-1") == {"reserve": 1}
+    assert await _totals(HOT) == (37, 3)
+
+
+@pytest.mark.asyncio
+async def test_reserve_falls_back_to_the_row_when_no_bucket_covers_it(
+    database, monkeypatch
+):
+    monkeypatch.setattr(settings, "ESCROW_PRODUCTS", [HOT])
+    await _stock(HOT, buckets=[(2, 0), (2, 0)])
+    await _stock(COLD, available=5)
+
+    result = await _reserve_batch(
+        InventoryReserveBatch(
+            items=[
+                InventoryCheck(product_id=HOT, quantity=3),
+                InventoryCheck(product_id=COLD, quantity=1),
+            ],
+            order_id="order-1",
+        )
+    )
+
+    assert result["reserved"] is True
+    assert await _totals(HOT) == (1, 3)
+    assert await _totals(COLD) == (4, 1)
+    # The buckets were folded into the row to cover the reservation
+    assert await _buckets(HOT) == []
+
+
+@pytest.mark.asyncio
+async def test_release_uses_the_row_without_folding(database, monkeypatch):
+    monkeypatch.setattr(settings, "ESCROW_PRODUCTS", [HOT])
+    await _stock(HOT, reserved=5, buckets=[(10, 0), (10, 0)])
+
+    await _reserve_batch(
+        InventoryReserveBatch(
+            items=[InventoryCheck(product_id=HOT, quantity=2)], order_id="order-1"
+        )
+    )
+    async with AsyncSessionLocal() as db:
+        result = await release_inventory_batch(
+            InventoryReleaseBatch(
+                items=[InventoryCheck(product_id=HOT, quantity=2)],
+                order_id="order-1",
+            ),
+            db=db,
+            current_user={},
+        )
+
+    assert result["items"][0]["quantity"] == 2
+    assert await _totals(HOT) == (20, 5)
+    # Released from the row, which held enough reserved stock
+    assert await _row(HOT) == (2, 3)
+    assert len(await _buckets(HOT)) == 2
+
+
+@pytest.mark.asyncio
+async def test_rebalance_keeps_reserved_stock_in_the_row(database, monkeypatch):
+    monkeypatch.setattr(settings, "ESCROW_PRODUCTS", [HOT])
+    monkeypatch.setattr(settings, "ESCROW_BUCKETS", 2)
+    await _stock(HOT, available=7, reserved=1, buckets=[(1, 2), (0, 3)])
+
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            assert await rebalance_product(db, HOT)
+
+    assert await _totals(HOT) == (8, 6)
+    assert await _buckets(HOT) == [(4, 0), (4, 0)]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fallbacks_do_not_deadlock(database, monkeypatch):
+    monkeypatch.setattr(settings, "ESCROW_PRODUCTS", [HOT, "hot-2"])
+    # Buckets too small for most reservations, so most of them fall back
+    await _stock(HOT, buckets=[(1, 0)] * 4 + [(50, 0)])
+    await _stock("hot-2", buckets=[(1, 0)] * 4 + [(50, 0)])
+    await _stock(COLD, available=100)
+    await _stock("cold-2", available=100)
+
+    products = [COLD, HOT, "cold-2", "hot-2"]
+    requests = [
+        InventoryReserveBatch(
+            items=[
+                InventoryCheck(product_id=product_id, quantity=1 + (i + j) % 3)
+                for j, product_id in enumerate(products[i % 4 :] + products[: i % 4])
+            ],
+            order_id=f"order-{i}",
+        )
+        for i in range(20)
+    ]
+
+    results = await asyncio.gather(*(_reserve_batch(request) for request in requests))
+
+    assert all(result["reserved"] for result in results)
+    requested = sum(line.quantity for request in requests for line in request.items)
+    totals = [await _totals(product_id) for product_id in products]
+    assert sum(available for available, _ in totals) == 308 - requested
+    assert sum(reserved for _, reserved in totals) == requested
+
+
+@pytest.mark.asyncio
+async def test_products_without_buckets_are_not_folded(database):
+    await _stock(COLD, available=5)
+
+    with _statements() as statements:
+        await _reserve_batch(
+            InventoryReserveBatch(items=[InventoryCheck(product_id=COLD, quantity=1)])
+        )
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                assert await adjust_stock(db, COLD, 2)
+
+    assert not any("DELETE FROM inventory_buckets" in s for s in statements)
+    assert sum(s.startswith("WITH updated") for s in statements) == 1
+    assert await _totals(COLD) == (6, 1)
+
+
+@pytest.mark.asyncio
+async def test_adjust_folds_leftover_buckets_when_they_are_needed(database):
+    # Buckets left behind by a product removed from ESCROW_PRODUCTS
+    await _stock(COLD, available=4, buckets=[(3, 0)])
+
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            item = await adjust_stock(db, COLD, -5)
+
+    assert item.available_quantity == 2
+    assert await _buckets(COLD) == []
+
+
+@pytest.mark.asyncio
+async def test_reserve_folds_leftover_buckets_when_they_are_needed(database):
+    await _stock(COLD, available=2, buckets=[(3, 0)])
+
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            item = await reserve_stock(db, COLD, 4, "order-1")
+
+    assert (item.available_quantity, item.reserved_quantity) == (1, 4)
+    assert await _buckets(COLD) == []
+    assert await _movements("order-1") == {"reserve": 1}
+
+
+@pytest.mark.asyncio
+async def test_release_folds_leftover_buckets_when_they_are_needed(database):
+    await _stock(COLD, available=2, buckets=[(0, 3)])
+
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            item = await release_stock(db, COLD, 3, "order-1")
+
+    assert item.released == 3
+    assert (item.available_quantity, item.reserved_quantity) == (5, 0)
+    assert await _buckets(COLD) == []
+    assert await _movements("order-1") == {"release": 1}
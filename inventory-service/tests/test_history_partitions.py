@@ -0,0 +1,169 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import select, text
+
+from app.core.config import settings
+from app.db.postgresql import engine
+from app.models.inventory import InventoryHistory, InventoryHistoryDaily
+from app.services.history import (
+    DEFAULT_PARTITION,
+    HISTORY_TABLE,
+    _partitions,
+    history_partitions,
+    partition_name,
+)
+
+TODAY = date(2026, 10, 18)
+
+
+async def _history(timestamp, product_id="product-1", quantity_change=1):
+    async with engine.begin() as conn:
+        await conn.execute(
+            InventoryHistory.__table__.insert().values(
+                product_id=product_id,
+                quantity_change=quantity_change,
+                previous_quantity=0,
+                new_quantity=quantity_change,
+                change_type="add",
+                timestamp=timestamp,
+            )
+        )
+
+
+async def _partition_names():
+    async with engine.begin() as conn:
+        return set(await _partitions(conn))
+
+
+@pytest.mark.asyncio
+async def test_rows_of_a_default_partition_move_to_monthly_partitions(database):
+    # A default partition left by an earlier version, holding a future month
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {HISTORY_TABLE} DEFAULT"
+            )
+        )
+    await _history(datetime(2027, 6, 3, tzinfo=timezone.utc))
+
+    await history_partitions.maintain_once(TODAY)
+    await history_partitions.maintain_once(TODAY.replace(year=2027, month=6))
+
+    partitions = await _partition_names()
+    assert DEFAULT_PARTITION not in partitions
+    assert partition_name(date(2027, 6, 1)) in partitions
+    async with engine.begin() as conn:
+        result = await conn.execute(select(InventoryHistory.product_id))
+        assert result.scalars().all() == ["product-1"]
+
+
+@pytest.mark.asyncio
+async def test_writes_outside_the_partitions_fail(database):
+    with pytest.raises(Exception, match="no partition"):
+        await _history(datetime(2099, 1, 1, tzinfo=timezone.utc))
+
+
+@pytest.mark.asyncio
+# Postgres 13 has no DETACH PARTITION CONCURRENTLY
+@pytest.mark.parametrize("server_version", [None, (13, 11)])
+async def test_expired_partitions_are_detached_and_rolled_up(
+    database, monkeypatch, server_version
+):
+    if server_version is not None:
+        monkeypatch.setattr(engine.dialect, "server_version_info", server_version)
+    monkeypatch.setattr(settings, "HISTORY_RETENTION_MONTHS", 2)
+    await history_partitions.maintain_once(date(2026, 7, 1))
+    await _history(datetime(2026, 7, 5, 10, tzinfo=timezone.utc), quantity_change=2)
+    await _history(datetime(2026, 7, 5, 11, tzinfo=timezone.utc), quantity_change=3)
+    await _history(datetime(2026, 8, 1, tzinfo=timezone.utc))
+
+    await history_partitions.maintain_once(TODAY)
+
+    partitions = await _partition_names()
+    assert partition_name(date(2026, 7, 1)) not in partitions
+    assert partition_name(date(2026, 8, 1)) in partitions
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            select(
+                InventoryHistoryDaily.day,
+                InventoryHistoryDaily.movements,
+                InventoryHistoryDaily.quantity_change,
+            )
+        )
+        assert result.all() == [(date(2026, 7, 5), 2, 5)]
+        result = await conn.execute(
+            text("SELECT to_regclass(:name)"),
+            {"name": partition_name(date(2026, 7, 1))},
+        )
+        assert result.scalar() is None
+
+
+@pytest.mark.asyncio
+async def test_an_unpartitioned_table_is_converted(database):
+    # The table as created before partitioning was introduced
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE {HISTORY_TABLE}"))
+        await conn.execute(
+            text(
+                f"CREATE TABLE {HISTORY_TABLE} ("
+                "id SERIAL PRIMARY KEY, product_id VARCHAR NOT NULL, "
+                "quantity_change INTEGER NOT NULL, "
+                "previous_quantity INTEGER NOT NULL, "
+                "new_quantity INTEGER NOT NULL, change_type VARCHAR NOT NULL, "
+                "reference_id VARCHAR, timestamp TIMESTAMPTZ DEFAULT now())"
+            )
+        )
+        await conn.execute(
+            text(f"CREATE INDEX ix_{HISTORY_TABLE}_id ON {HISTORY_TABLE} (id)")
+        )
+    await _history(datetime(2025, 3, 1, 12, tzinfo=timezone.utc))
+    await _history(datetime.now(timezone.utc))
+
+    await history_partitions.start()
+    await history_partitions.stop()
+    await _history(datetime.now(timezone.utc), product_id="product-2")
+
+    assert partition_name(date(2025, 3, 1)) in await _partition_names()
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            select(InventoryHistory.id, InventoryHistory.product_id).order_by(
+                InventoryHistory.id
+            )
+        )
+        assert result.all() == [(1, "product-1"), (2, "product-1"), (3, "product-2")]
+        result = await conn.execute(
+            text("SELECT to_regclass(:name)"),
+            {"name": f"{HISTORY_TABLE}_unpartitioned"},
+        )
+        assert result.scalar() is None
+
+
+@pytest.mark.asyncio
+async def test_missing_indexes_are_created(database):
+    # The indexes of a table partitioned before the covering indexes
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(f"DROP INDEX ix_{HISTORY_TABLE}_reference_timestamp_id")
+        )
+        await conn.execute(
+            text(
+                f"CREATE INDEX ix_{HISTORY_TABLE}_product_id "
+                f"ON {HISTORY_TABLE} (product_id)"
+            )
+        )
+
+    await history_partitions.start()
+    await history_partitions.stop()
+
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            text("SELECT indexname FROM pg_indexes WHERE tablename = :name"),
+            {"name": HISTORY_TABLE},
+        )
+        assert set(result.scalars().all()) == {
+            f"{HISTORY_TABLE}_pkey",
+            f"ix_{HISTORY_TABLE}_id",
+            f"ix_{HISTORY_TABLE}_product_timestamp_id",
+            f"ix_{HISTORY_TABLE}_reference_timestamp_id",
+        }
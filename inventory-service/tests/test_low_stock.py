@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services.low_stock import LowStockNotifier
+
+
+def _row(quantity, product_id="product-1", threshold=5):
+    return SimpleNamespace(
+        product_id=product_id,
+        available_quantity=quantity,
+        reorder_threshold=threshold,
+    )
+
+
+@pytest.fixture
+def notifier(monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_NOTIFICATIONS", True)
+    monkeypatch.setattr(settings, "NOTIFICATION_URL", "http://notifications")
+    monkeypatch.setattr(settings, "LOW_STOCK_DEBOUNCE", 0)
+    monkeypatch.setattr(settings, "LOW_STOCK_DEDUPE_WINDOW", 3600)
+    monkeypatch.setattr(settings, "NOTIFICATION_RETRY_BACKOFF", 0)
+    return LowStockNotifier()
+
+
+def _deliver_with(notifier, monkeypatch, fail, during=None):
+    """Make deliveries succeed or fail, the first one running `during`."""
+    delivered = []
+
+    async def deliver(alerts):
+        if delivered == [] and during is not None:
+            during()
+        delivered.extend(alert.available_quantity for alert in alerts)
+        return list(alerts) if fail else []
+
+    monkeypatch.setattr(notifier, "_deliver", deliver)
+    return delivered
+
+
+@pytest.mark.asyncio
+async def test_alerts_are_sent_once_per_drop(notifier, monkeypatch):
+    delivered = _deliver_with(notifier, monkeypatch, fail=False)
+
+    notifier.notify(_row(4))
+    notifier.notify(_row(3))
+    assert await notifier.deliver_due() == 1
+    notifier.notify(_row(2))
+    assert await notifier.deliver_due() == 0
+
+    assert delivered == [3]
+    assert notifier.stats()["suppressed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_a_restock_during_delivery_is_not_overwritten(notifier, monkeypatch):
+    _deliver_with(
+        notifier, monkeypatch, fail=False, during=lambda: notifier.notify(_row(20))
+    )
+    notifier.notify(_row(4))
+    await notifier.deliver_due()
+
+    # The restock cleared the alert, so the next drop is alerted again
+    notifier.notify(_row(3))
+    assert notifier.stats()["pending"] == 1
+
+
+@pytest.mark.asyncio
+async def test_a_failed_alert_is_not_retried_after_a_restock(notifier, monkeypatch):
+    _deliver_with(
+        notifier, monkeypatch, fail=True, during=lambda: notifier.notify(_row(20))
+    )
+    notifier.notify(_row(4))
+    await notifier.deliver_due()
+
+    assert notifier.stats()["pending"] == 0
+    assert notifier.stats()["retried"] == 0
+
+
+@pytest.mark.asyncio
+async def test_a_drop_after_a_restock_during_delivery_is_queued(notifier, monkeypatch):
+    def restock_and_drop():
+        notifier.notify(_row(20))
+        notifier.notify(_row(1))
+
+    delivered = _deliver_with(
+        notifier, monkeypatch, fail=False, during=restock_and_drop
+    )
+    notifier.notify(_row(4))
+
+    # The drop after the restock is a new alert, delivered after the first
+    assert await notifier.deliver_due() == 2
+    assert delivered == [4, 1]
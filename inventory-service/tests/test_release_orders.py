@@ -0,0 +1,115 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.api.routes.inventory import (
+    release_inventory_for_orders,
+    reserve_inventory_for_orders,
+)
+from app.db.postgresql import AsyncSessionLocal
+from app.models.inventory import (
+    InventoryCheck,
+    InventoryHistory,
+    InventoryItem,
+    InventoryReleaseOrders,
+    InventoryReserveOrders,
+    OrderReservation,
+)
+
+
+def _orders(**orders):
+    return [
+        OrderReservation(
+            order_id=order_id,
+            items=[
+                InventoryCheck(product_id=product_id, quantity=quantity)
+                for product_id, quantity in items.items()
+            ],
+        )
+        for order_id, items in orders.items()
+    ]
+
+
+async def _stock(**available):
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            db.add_all(
+                InventoryItem(product_id=product_id, available_quantity=quantity)
+                for product_id, quantity in available.items()
+            )
+
+
+async def _quantities(product_id):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(
+                InventoryItem.available_quantity, InventoryItem.reserved_quantity
+            ).where(InventoryItem.product_id == product_id)
+        )
+        return tuple(result.one())
+
+
+async def _releases():
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(InventoryHistory.reference_id, func.count())
+            .where(InventoryHistory.change_type == "release")
+            .group_by(InventoryHistory.reference_id)
+        )
+        return dict(result.all())
+
+
+async def _release(orders):
+    async with AsyncSessionLocal() as db:
+        result = await release_inventory_for_orders(
+            InventoryReleaseOrders(orders=orders), db=db, current_user={}
+        )
+    return result["results"]
+
+
+@pytest.mark.asyncio
+async def test_release_orders_releases_each_reservation_once(database):
+    await _stock(a=10, b=10)
+    async with AsyncSessionLocal() as db:
+        await reserve_inventory_for_orders(
+            InventoryReserveOrders(
+                orders=_orders(**{"order-1": {"a": 2, "b": 1}, "order-2": {"a": 3}})
+            ),
+            db=db,
+            current_user={},
+        )
+
+    orders = _orders(
+        **{"order-1": {"a": 2, "b": 1}, "order-2": {"a": 3}, "order-3": {"b": 4}}
+    )
+    results = await _release(orders)
+
+    assert results == {
+        "order-1": {"released": True},
+        "order-2": {"released": True},
+        # Never reserved, so there is nothing to release
+        "order-3": {"released": True, "duplicate": False},
+    }
+    assert await _quantities("a") == (10, 0)
+    assert await _quantities("b") == (10, 0)
+    assert await _releases() == {"order-1": 2, "order-2": 1}
+
+    # A retry releases nothing again
+    results = await _release(orders)
+    assert results["order-1"] == {"released": True, "duplicate": True}
+    assert await _quantities("a") == (10, 0)
+
+
+@pytest.mark.asyncio
+async def test_release_orders_rejects_orders_with_unknown_products(database):
+    await _stock(a=10)
+    async with AsyncSessionLocal() as db:
+        await reserve_inventory_for_orders(
+            InventoryReserveOrders(orders=_orders(**{"order-1": {"a": 2}})),
+            db=db,
+            current_user={},
+        )
+
+    results = await _release(_orders(**{"order-1": {"a": 2, "missing": 1}}))
+
+    assert results["order-1"]["released"] is False
+    assert await _quantities("a") == (8, 2)
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.db.postgresql import engine
+from app.services.stock_cache import CHANGE_TRIGGER_DDL
+
+
+async def _install():
+    async with engine.begin() as conn:
+        for statement in CHANGE_TRIGGER_DDL:
+            await conn.execute(text(statement))
+
+
+@pytest.mark.asyncio
+async def test_replicas_can_install_the_change_trigger_together(database):
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("DROP FUNCTION IF EXISTS notify_inventory_change() CASCADE")
+        )
+
+    results = await asyncio.gather(
+        *(_install() for _ in range(4)), return_exceptions=True
+    )
+
+    assert results == [None] * 4
+    # Installing it again is a no-op
+    await _install()
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text(
+                "SELECT tgname FROM pg_trigger "
+                "WHERE tgname LIKE '%_notify_change' ORDER BY tgname"
+            )
+        )
+        assert result.scalars().all() == [
+            "inventory_buckets_notify_change",
+            "inventory_items_notify_change",
+        ]
@@ -28,3 +28,12 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     # In production, this function would verify the token signature
     # and decode the payload to get user information
     return {"sub": "authenticated-user", "is_admin": True}
+
+
+def is_admin(current_user=Depends(get_current_user)):
+    """Check if the current user is an admin."""
+    if not current_user.get("is_admin", False):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions"
+        )
+    return current_user
@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict
+
+from bson import ObjectId
+
+from app.api.pagination import ORDER_SORT
+from app.core.config import settings
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Only the fields of OrderResponse are read from Mongo
+EXPORT_PROJECTION = {
+    "user_id": 1,
+    "items": 1,
+    "total_price": 1,
+    "status": 1,
+    "inventory_status": 1,
+    "shipping_address": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+CSV_COLUMNS = [
+    "id",
+    "user_id",
+    "status",
+    "inventory_status",
+    "total_price",
+    "item_count",
+    "items",
+    "shipping_address",
+    "created_at",
+    "updated_at",
+]
+
+
+def _json_default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _to_ndjson(doc: Dict[str, Any]) -> str:
+    doc = {"id": str(doc.pop("_id")), **doc}
+    return json.dumps(doc, default=_json_default, separators=(",", ":")) + "\n"
+
+
+def _to_csv_row(doc: Dict[str, Any]):
+    items = doc.get("items", [])
+    return [
+        str(doc["_id"]),
+        doc.get("user_id"),
+        doc.get("status"),
+        doc.get("inventory_status") or "",
+        doc.get("total_price"),
+        sum(item["quantity"] for item in items),
+        json.dumps(items, separators=(",", ":")),
+        json.dumps(doc.get("shipping_address"), separators=(",", ":")),
+        doc["created_at"].isoformat() if doc.get("created_at") else "",
+        doc["updated_at"].isoformat() if doc.get("updated_at") else "",
+    ]
+
+
+async def stream_orders(db, query: Dict[str, Any], fmt: str) -> AsyncIterator[str]:
+    """
+    Stream the orders matching query as NDJSON or CSV.
+
+    Documents are read straight off the Motor cursor, ORDER_EXPORT_BATCH_SIZE
+    at a time, and each batch is written out as one chunk, so memory use
+    does not grow with the size of the export.
+
+    Args:
+        db: The order database
+        query: The Mongo filter, as built for the orders listing
+        fmt: "ndjson" or "csv"
+    """
+    batch_size = settings.ORDER_EXPORT_BATCH_SIZE
+    cursor = (
+        db["orders"]
+        .find(query, EXPORT_PROJECTION)
+        .sort(ORDER_SORT)
+        .batch_size(batch_size)
+    )
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(CSV_COLUMNS)
+
+    pending = 0
+    async for doc in cursor:
+        if writer:
+            writer.writerow(_to_csv_row(doc))
+        else:
+            buffer.write(_to_ndjson(doc))
+        pending += 1
+
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
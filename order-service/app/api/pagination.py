@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+# Header carrying the cursor for the next page of a listing
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Listing sort order; _id breaks ties between orders created at the same time
+ORDER_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def encode_cursor(document: Dict[str, Any]) -> str:
+    """Build an opaque cursor pointing just past the given document."""
+    payload = {"t": document["created_at"].isoformat(), "id": str(document["_id"])}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Turn a cursor back into the (created_at, _id) position it encodes."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        return {
+            "created_at": datetime.fromisoformat(payload["t"]),
+            "_id": ObjectId(payload["id"]),
+        }
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def apply_cursor(query: Dict[str, Any], cursor: Optional[str], skip: int):
+    """
+    Restrict a listing query to documents after the cursor position.
+
+    Keyset pagination uses the (created_at, _id) sort key instead of skip, so
+    the two cannot be combined.
+    """
+    if cursor is None:
+        return
+
+    if skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="skip cannot be combined with cursor",
+        )
+
+    position = decode_cursor(cursor)
+    query["$or"] = [
+        {"created_at": {"$lt": position["created_at"]}},
+        {"created_at": position["created_at"], "_id": {"$lt": position["_id"]}},
+    ]
+
+
+def next_cursor(documents: List[Dict[str, Any]], limit: int) -> Optional[str]:
+    """Return the cursor for the following page, or None on the last page."""
+    if len(documents) < limit:
+        return None
+    return encode_cursor(documents[-1])
@@ -1,17 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException, Path, Query, Body, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Path,
+    Query,
+    Body,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
+import asyncio
 import logging
-from app.models.order import OrderCreate, OrderUpdate, OrderResponse, OrderStatusUpdate
+from app.models.order import (
+    OrderCreate,
+    OrderUpdate,
+    OrderResponse,
+    OrderBulkCreate,
+    OrderBulkResponse,
+    OrderBulkResult,
+    OrderExpire,
+    OrderExpireResponse,
+    OrderStats,
+    OrderStatusUpdate,
+)
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from app.api.dependencies import get_db, get_current_user
+from app.api.dependencies import get_db, get_current_user, is_admin
+from app.api.export import EXPORT_FORMATS, stream_orders
+from app.api.serialization import DocumentSerializer, use_fast_serialization
+from app.api.pagination import (
+    NEXT_CURSOR_HEADER,
+    ORDER_SORT,
+    apply_cursor,
+    next_cursor,
+)
 from typing import List, Optional, Dict, Any
-from app.services.user import user_service
-from app.services.product import product_service
-from app.services.inventory import inventory_service
+from app.services.idempotency import (
+    claim_idempotency_key,
+    complete_idempotency_key,
+    release_idempotency_key,
+    request_fingerprint,
+)
+from app.services.outbox import (
+    INVENTORY_PENDING,
+    INVENTORY_RELEASED,
+    RELEASE,
+    RESERVE,
+    enqueue_outbox_entries,
+    enqueue_outbox_entry,
+    outbox_worker,
+)
+from app.services.stats import (
+    DAILY_STATS,
+    STATUS_STATS,
+    USER_STATS,
+    rebuild_order_stats,
+    record_order_created,
+    record_orders_created,
+    record_status_change,
+)
+from app.services.validation import (
+    OrderValidationError,
+    OrderValidationTimeout,
+    validate_order,
+    validate_orders_bulk,
+)
 from app.core.config import settings
+from app.db.indexes import explain_order_queries
 from bson import ObjectId
 from decimal import Decimal
 from datetime import datetime
 from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -20,10 +80,25 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter(prefix="", tags=["orders"])
 
+ORDER_SERIALIZER = DocumentSerializer(OrderResponse)
+
+# Outcomes of POST /expire per order
+EXPIRE_CANCELLED = "cancelled"
+EXPIRE_ALREADY_CANCELLED = "already_cancelled"
+EXPIRE_KEPT = "kept"
+EXPIRE_MISSING = "missing"
+
 
 @router.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order: OrderCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(
+        None,
+        alias="Idempotency-Key",
+        max_length=255,
+        description="Client-generated key that makes retries of this request safe",
+    ),
     db: AsyncIOMotorDatabase = Depends(get_db),
     current_user: Dict[str, Any] = Depends(get_current_user),
 ):
@@ -33,54 +108,71 @@ async def create_order(
     1. Verify the usesr exists.
     2. Verify all products exists and prices are correct.
     3. Check inventory availability for all the products.
-    4. Reserve inventory for all the products.
-    5. Create the order in the pending status
-
+       (steps 1-3 run concurrently with a shared deadline)
+    4. Create the order in the pending status and queue its inventory
+       reservation, which the outbox worker makes in the background.
+       If the reservation is rejected, the order is cancelled.
+
+    With an Idempotency-Key header, a retried request returns the order
+    created by the first one instead of running these steps again. Keys are
+    scoped to the order's user_id.
     """
-    # Verify user exists
-    user_valid = await user_service.verify_user(order.user_id)
-    if not user_valid:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user ID"
-        )
+    if not idempotency_key:
+        return await _create_order(order, db)
 
-    # Verify all products exist and prices are correct
-    products_valid = await product_service.verify_products(order.items)
-    if not products_valid:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="One or more products are invalid or have incorrect prices",
-        )
+    token, stored = await claim_idempotency_key(
+        db, order.user_id, idempotency_key, request_fingerprint(order.json())
+    )
+    if stored is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return stored
+
+    try:
+        created_order = await _create_order(order, db)
+    except BaseException:
+        # Including cancellation, so the client can retry with the same key
+        await release_idempotency_key(db, order.user_id, idempotency_key, token)
+        raise
+
+    await complete_idempotency_key(
+        db, order.user_id, idempotency_key, token, created_order
+    )
+    return created_order
 
-    # Check inventory availability for all items
-    inventory_checks = []
-    for item in order.items:
-        inventory_available = await inventory_service.check_inventory(
-            item.product_id, item.quantity
-        )
-        inventory_checks.append((item, inventory_available))
-
-    if not all(available for _, available in inventory_checks):
-        unavailable_items = [
-            f"Product {item.product_id} (quantity: {item.quantity})"
-            for item, available in inventory_checks
-            if not available
-        ]
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Insufficient inventory for: {', '.join(unavailable_items)}",
-        )
 
-    # Reserve inventory for all items
-    for item, _ in inventory_checks:
-        await inventory_service.reserve_inventory(item.product_id, item.quantity)
+async def _create_order(order: OrderCreate, db: AsyncIOMotorDatabase):
+    """Validate and insert a new order; returns the stored document."""
+    # Verify user, products and inventory concurrently
+    try:
+        await validate_order(order)
+    except OrderValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.detail)
+    except OrderValidationTimeout as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+
+    order_dict = _order_document(order, datetime.utcnow())
+    order_id = order_dict["_id"]
+
+    # Queue the reservation before writing the order: without multi-document
+    # transactions, a crash in between then leaves an outbox entry that the
+    # worker discards instead of an order that is never reserved
+    await enqueue_outbox_entry(db, str(order_id), RESERVE, order_dict["items"])
+    result = await db["orders"].insert_one(order_dict)
+    outbox_worker.wake()
+    await record_order_created(db, order_dict)
+
+    # Retrieve the created order
+    created_order = await db["orders"].find_one({"_id": result.inserted_id})
+
+    logger.info(f"Created order: {result.inserted_id}")
+    return created_order
+
 
+def _order_document(order: OrderCreate, now: datetime) -> Dict[str, Any]:
+    """Build the stored document of a new, validated order."""
     # Calculate total price
     total_price = sum(Decimal(str(item.price)) * item.quantity for item in order.items)
 
-    # Create the order
-    now = datetime.utcnow()
-
     # Convert order items to dictionary format, explicitly converting Decimal to float
     items_dict = []
     for item in order.items:
@@ -92,54 +184,107 @@ async def create_order(
             }
         )
 
-    order_dict = {
+    return {
+        "_id": ObjectId(),
         "user_id": order.user_id,
         "items": items_dict,
         "total_price": float(total_price),  # Convert Decimal to float for MongoDB
         "status": settings.ORDER_STATUS["PENDING"],
+        "inventory_status": INVENTORY_PENDING,
         "shipping_address": order.shipping_address.dict(),
         "created_at": now,
         "updated_at": now,
     }
 
-    result = await db["orders"].insert_one(order_dict)
 
-    # Retrieve the created order
-    created_order = await db["orders"].find_one({"_id": result.inserted_id})
-
-    logger.info(f"Created order: {result.inserted_id}")
-    return created_order
-
-
-@router.get("/", response_model=List[OrderResponse])
-async def get_orders(
-    skip: int = Query(0, ge=0, description="Number of orders to skip"),
-    limit: int = Query(10, ge=1, le=100, description="Max number of orders to return"),
-    status: Optional[str] = Query(None, description="Filter by order status"),
-    user_id: Optional[str] = Query(None, description="Filter by user ID"),
-    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
-    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+@router.post("/bulk", response_model=OrderBulkResponse)
+async def create_orders_bulk(
+    bulk: OrderBulkCreate,
     db: AsyncIOMotorDatabase = Depends(get_db),
     current_user: Dict[str, Any] = Depends(get_current_user),
 ):
     """
-    Get all orders with optional filtering.
+    Create a batch of orders at once.
 
-    This endpoint allows filtering by:
-    - Order status
-    - User ID
-    - Date range
+    1. Verify each distinct user and product once for the whole batch.
+    2. Check inventory per product in aggregate, allocating the available
+       stock to the orders in request order.
+    3. Insert the valid orders with one unordered insert_many and queue
+       their reservations, which the outbox worker makes in aggregate.
+
+    Orders fail individually: the response reports success or the error
+    for every order, by its index in the request.
     """
+    try:
+        errors = await validate_orders_bulk(bulk.orders)
+    except OrderValidationTimeout as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+
+    now = datetime.utcnow()
+    documents = {
+        index: _order_document(order, now)
+        for index, order in enumerate(bulk.orders)
+        if index not in errors
+    }
+
+    if documents:
+        # Reservations first, as in create_order
+        await enqueue_outbox_entries(
+            db,
+            RESERVE,
+            {
+                str(document["_id"]): document["items"]
+                for document in documents.values()
+            },
+        )
+
+        indexes = list(documents)
+        try:
+            await db["orders"].insert_many(list(documents.values()), ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                errors[indexes[error["index"]]] = (
+                    f"Failed to store order: {error['errmsg']}"
+                )
+
+        await record_orders_created(
+            db,
+            [document for index, document in documents.items() if index not in errors],
+        )
+        outbox_worker.wake()
+
+    results = [
+        OrderBulkResult(
+            index=index,
+            success=index not in errors,
+            order_id=None if index in errors else str(documents[index]["_id"]),
+            error=errors.get(index),
+        )
+        for index in range(len(bulk.orders))
+    ]
+    created = len(bulk.orders) - len(errors)
+    logger.info(f"Created {created} of {len(bulk.orders)} orders in bulk")
+
+    return OrderBulkResponse(created=created, failed=len(errors), results=results)
+
+
+def _build_order_query(
+    order_status: Optional[str],
+    user_id: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+) -> Dict[str, Any]:
+    """Build the Mongo filter for the orders listing and export."""
     query = {}
 
     # Apply filters if provided
-    if status:
-        if status not in settings.ORDER_STATUS.values():
+    if order_status:
+        if order_status not in settings.ORDER_STATUS.values():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Invalid status. Must be one of: {', '.join(settings.ORDER_STATUS.values())}",
             )
-        query["status"] = status
+        query["status"] = order_status
 
     if user_id:
         try:
@@ -176,13 +321,256 @@ async def get_orders(
     if date_filter:
         query["created_at"] = date_filter
 
+    return query
+
+
+@router.get("/", response_model=List[OrderResponse])
+async def get_orders(
+    response: Response,
+    skip: int = Query(0, ge=0, description="Number of orders to skip"),
+    limit: int = Query(10, ge=1, le=100, description="Max number of orders to return"),
+    status: Optional[str] = Query(None, description="Filter by order status"),
+    user_id: Optional[str] = Query(None, description="Filter by user ID"),
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    cursor: Optional[str] = Query(
+        None, description="Cursor from the X-Next-Cursor header of the previous page"
+    ),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Get all orders with optional filtering.
+
+    This endpoint allows filtering by:
+    - Order status
+    - User ID
+    - Date range
+
+    Pages can be requested by offset (skip) or, for deep pages, by passing
+    the cursor returned in the X-Next-Cursor header of the previous page.
+    """
+    query = _build_order_query(status, user_id, start_date, end_date)
+
+    apply_cursor(query, cursor, skip)
+
     # Run the query
-    cursor = db["orders"].find(query).sort("created_at", -1).skip(skip).limit(limit)
-    orders = await cursor.to_list(length=limit)
+    orders = (
+        await db["orders"]
+        .find(query)
+        .sort(ORDER_SORT)
+        .skip(skip)
+        .limit(limit)
+        .to_list(length=limit)
+    )
+
+    page_cursor = next_cursor(orders, limit)
+    headers = {NEXT_CURSOR_HEADER: page_cursor} if page_cursor else {}
+    response.headers.update(headers)
 
+    if use_fast_serialization("get_orders"):
+        return ORDER_SERIALIZER.response(orders, headers=headers)
     return orders
 
 
+@router.get("/export")
+async def export_orders(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson or csv"),
+    status: Optional[str] = Query(None, description="Filter by order status"),
+    user_id: Optional[str] = Query(None, description="Filter by user ID"),
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Export all matching orders as NDJSON or CSV.
+
+    Accepts the same filters as the orders listing. Orders are streamed
+    from the database cursor in batches instead of being loaded into memory.
+    """
+    query = _build_order_query(status, user_id, start_date, end_date)
+    filename = f"orders-{datetime.utcnow():%Y%m%d%H%M%S}.{format}"
+    return StreamingResponse(
+        stream_orders(db, query, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/admin/index-report", response_model=Dict[str, Dict[str, Any]])
+async def get_index_report(
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(is_admin),
+):
+    """
+    Explain the query shape of each order listing route.
+
+    Reports, per shape, whether the winning plan uses an index or falls back
+    to a COLLSCAN or an in-memory SORT.
+    """
+    return await explain_order_queries(db)
+
+
+@router.get("/stats/daily", response_model=List[OrderStats])
+async def get_daily_stats(
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    limit: int = Query(31, ge=1, le=366, description="Max number of days to return"),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Get order count, item count and revenue per day of order creation,
+    newest day first.
+    """
+    query = {}
+    for name, value, operator in (
+        ("start_date", start_date, "$gte"),
+        ("end_date", end_date, "$lte"),
+    ):
+        if value:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid {name} format. Use YYYY-MM-DD",
+                )
+            # Day keys are ISO dates, so they compare chronologically
+            query.setdefault("_id", {})[operator] = value
+
+    return (
+        await db[DAILY_STATS]
+        .find(query)
+        .sort("_id", -1)
+        .limit(limit)
+        .to_list(length=limit)
+    )
+
+
+@router.get("/stats/status", response_model=List[OrderStats])
+async def get_status_stats(
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Get order count, item count and revenue of the orders currently in each
+    status.
+    """
+    return await db[STATUS_STATS].find().sort("_id", 1).to_list(length=None)
+
+
+@router.get("/stats/users", response_model=List[OrderStats])
+async def get_user_stats(
+    skip: int = Query(0, ge=0, description="Number of users to skip"),
+    limit: int = Query(10, ge=1, le=100, description="Max number of users to return"),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Get order count, item count and revenue per user, highest revenue first.
+    """
+    return (
+        await db[USER_STATS]
+        .find()
+        .sort([("revenue", -1), ("_id", 1)])
+        .skip(skip)
+        .limit(limit)
+        .to_list(length=limit)
+    )
+
+
+@router.get("/stats/users/{user_id}", response_model=OrderStats)
+async def get_single_user_stats(
+    user_id: str = Path(..., description="User ID to get order stats for"),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Get order count, item count and revenue of a single user.
+    """
+    stats = await db[USER_STATS].find_one({"_id": user_id})
+    return stats or {"_id": user_id}
+
+
+@router.post("/stats/rebuild", response_model=Dict[str, int])
+async def rebuild_stats(
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(is_admin),
+):
+    """
+    Recompute all order rollups from the orders collection.
+
+    Also available as a command: python -m app.services.stats
+    """
+    return await rebuild_order_stats(db)
+
+
+@router.post("/expire", response_model=OrderExpireResponse)
+async def expire_orders(
+    expiry: OrderExpire,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(is_admin),
+):
+    """
+    Cancel orders whose inventory reservation expired before they were paid.
+
+    Called by inventory-service's reservation sweeper, which releases the
+    stock itself, so no release is queued here. Only pending orders are
+    cancelled; the sweeper keeps the stock of orders that moved on.
+
+    Each order is reported as cancelled, already_cancelled, kept (it is
+    past pending) or missing.
+    """
+    pending = settings.ORDER_STATUS["PENDING"]
+    cancelled = settings.ORDER_STATUS["CANCELLED"]
+    order_ids = [
+        order_id
+        for order_id in dict.fromkeys(expiry.order_ids)
+        if ObjectId.is_valid(order_id)
+    ]
+    results = {order_id: EXPIRE_MISSING for order_id in expiry.order_ids}
+
+    async def expire(order_id: str) -> Optional[Dict[str, Any]]:
+        order = await db["orders"].find_one_and_update(
+            {"_id": ObjectId(order_id), "status": pending},
+            {
+                "$set": {
+                    "status": cancelled,
+                    "inventory_status": INVENTORY_RELEASED,
+                    "updated_at": datetime.utcnow(),
+                }
+            },
+        )
+        if order is not None:
+            await record_status_change(db, order, cancelled)
+        return order
+
+    expired = await asyncio.gather(*(expire(order_id) for order_id in order_ids))
+    unmatched = []
+    for order_id, order in zip(order_ids, expired):
+        if order is None:
+            unmatched.append(ObjectId(order_id))
+        else:
+            results[order_id] = EXPIRE_CANCELLED
+
+    if unmatched:
+        cursor = db["orders"].find({"_id": {"$in": unmatched}}, {"status": 1})
+        async for order in cursor:
+            results[str(order["_id"])] = (
+                EXPIRE_ALREADY_CANCELLED
+                if order["status"] == cancelled
+                else EXPIRE_KEPT
+            )
+
+    logger.info(
+        f"Expired {len(order_ids) - len(unmatched)} of {len(results)} orders "
+        "with lapsed reservations"
+    )
+    return {"results": results}
+
+
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: str = Path(..., description="The ID of the order to retrieve"),
@@ -205,20 +593,28 @@ async def get_order(
             detail=f"Order with ID {order_id} not found",
         )
 
+    if use_fast_serialization("get_order"):
+        return ORDER_SERIALIZER.response(order)
     return order
 
 
 @router.get("/user/{user_id}", response_model=List[OrderResponse])
 async def get_user_orders(
+    response: Response,
     user_id: str = Path(..., description="User ID to get orders for"),
     skip: int = Query(0, ge=0, description="Number of orders to skip"),
     limit: int = Query(10, ge=1, le=100, description="Max number of orders to return"),
     status: Optional[str] = Query(None, description="Filter by order status"),
+    cursor: Optional[str] = Query(
+        None, description="Cursor from the X-Next-Cursor header of the previous page"
+    ),
     db: AsyncIOMotorDatabase = Depends(get_db),
     current_user: Dict[str, Any] = Depends(get_current_user),
 ):
     """
     Get all orders for a specific user.
+
+    Supports the same offset and cursor paging as the orders listing.
     """
     # Validate the user ID
     if not ObjectId.is_valid(user_id):
@@ -237,13 +633,82 @@ async def get_user_orders(
             )
         query["status"] = status
 
+    apply_cursor(query, cursor, skip)
+
     # Run the query
-    cursor = db["orders"].find(query).sort("created_at", -1).skip(skip).limit(limit)
-    orders = await cursor.to_list(length=limit)
+    orders = (
+        await db["orders"]
+        .find(query)
+        .sort(ORDER_SORT)
+        .skip(skip)
+        .limit(limit)
+        .to_list(length=limit)
+    )
+
+    page_cursor = next_cursor(orders, limit)
+    headers = {NEXT_CURSOR_HEADER: page_cursor} if page_cursor else {}
+    response.headers.update(headers)
 
+    if use_fast_serialization("get_user_orders"):
+        return ORDER_SERIALIZER.response(orders, headers=headers)
     return orders
 
 
+def _allowed_from(new_status: str) -> List[str]:
+    """Return the statuses ALLOWED_STATUS_TRANSITIONS lets move to new_status."""
+    return [
+        current
+        for current, allowed in settings.ALLOWED_STATUS_TRANSITIONS.items()
+        if new_status in allowed
+    ]
+
+
+async def _compare_and_set_status(
+    db: AsyncIOMotorDatabase,
+    order_id: str,
+    new_status: str,
+    allowed_from: List[str],
+    now: datetime,
+) -> Optional[Dict[str, Any]]:
+    """
+    Move an order to new_status if its status is one of allowed_from.
+
+    The check and the write are a single find_one_and_update, so concurrent
+    status changes cannot both pass validation.
+
+    Returns:
+        dict: The order before the change, or None if no order matched
+    """
+    order = await db["orders"].find_one_and_update(
+        {"_id": ObjectId(order_id), "status": {"$in": allowed_from}},
+        {"$set": {"status": new_status, "updated_at": now}},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if order is not None:
+        await record_status_change(db, order, new_status)
+    return order
+
+
+async def _current_status(db: AsyncIOMotorDatabase, order_id: str) -> str:
+    """Return an order's status, raising a 404 if it does not exist."""
+    order = await db["orders"].find_one({"_id": ObjectId(order_id)}, {"status": 1})
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Order with ID {order_id} not found",
+        )
+    return order["status"]
+
+
+def _transition_error(current_status: str, new_status: str) -> HTTPException:
+    allowed = settings.ALLOWED_STATUS_TRANSITIONS.get(current_status, [])
+    allowed_str = ", ".join(allowed) if allowed else "none"
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Invalid status transition from '{current_status}' to '{new_status}'. Allowed transitions: {allowed_str}",
+    )
+
+
 @router.put("/{order_id}/status", response_model=OrderResponse)
 async def update_order_status(
     order_id: str,
@@ -254,7 +719,8 @@ async def update_order_status(
     """
     Update the status of an order.
 
-    This will validate the status transition and update inventory as needed.
+    This will validate the status transition and queue an inventory release
+    when a pending order is cancelled.
     """
     # Validate the order ID
     if not ObjectId.is_valid(order_id):
@@ -262,6 +728,29 @@ async def update_order_status(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order ID format"
         )
 
+    new_status = status_update.status
+
+    if settings.ORDER_STATUS_CAS:
+        now = datetime.utcnow()
+        order = await _compare_and_set_status(
+            db, order_id, new_status, _allowed_from(new_status), now
+        )
+        if order is None:
+            raise _transition_error(await _current_status(db, order_id), new_status)
+
+        # Release inventory if order is cancelled from pending state
+        if (
+            order["status"] == settings.ORDER_STATUS["PENDING"]
+            and new_status == settings.ORDER_STATUS["CANCELLED"]
+        ):
+            await enqueue_outbox_entry(db, order_id, RELEASE, order["items"])
+
+        logger.info(
+            f"Updated order {order_id} status from {order['status']} to {new_status}"
+        )
+        outbox_worker.wake()
+        return {**order, "status": new_status, "updated_at": now}
+
     # Get the current order
     order = await db["orders"].find_one({"_id": ObjectId(order_id)})
     if not order:
@@ -271,26 +760,17 @@ async def update_order_status(
         )
 
     current_status = order["status"]
-    new_status = status_update.status
 
     # Check if the status transition is allowed
     if new_status not in settings.ALLOWED_STATUS_TRANSITIONS.get(current_status, []):
-        allowed = settings.ALLOWED_STATUS_TRANSITIONS.get(current_status, [])
-        allowed_str = ", ".join(allowed) if allowed else "none"
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid status transition from '{current_status}' to '{new_status}'. Allowed transitions: {allowed_str}",
-        )
+        raise _transition_error(current_status, new_status)
 
     # Handle inventory updates for specific transitions
     if current_status == settings.ORDER_STATUS["PENDING"] and new_status in [
         settings.ORDER_STATUS["CANCELLED"]
     ]:
         # Release inventory if order is cancelled from pending state
-        for item in order["items"]:
-            await inventory_service.release_inventory(
-                item["product_id"], item["quantity"]
-            )
+        await enqueue_outbox_entry(db, order_id, RELEASE, order["items"])
 
     # Update the order status
     updated_order = await db["orders"].find_one_and_update(
@@ -298,10 +778,12 @@ async def update_order_status(
         {"$set": {"status": new_status, "updated_at": datetime.utcnow()}},
         return_document=ReturnDocument.AFTER,
     )
+    await record_status_change(db, order, new_status)
 
     logger.info(
         f"Updated order {order_id} status from {current_status} to {new_status}"
     )
+    outbox_worker.wake()
     return updated_order
 
 
@@ -314,7 +796,8 @@ async def cancel_order(
     """
     Cancel an order (if not shipped).
 
-    This will set the order status to cancelled and release inventory.
+    This will set the order status to cancelled and queue the release of
+    its inventory.
     """
     # Validate the order ID
     if not ObjectId.is_valid(order_id):
@@ -322,6 +805,31 @@ async def cancel_order(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order ID format"
         )
 
+    cancelled = settings.ORDER_STATUS["CANCELLED"]
+    # Release inventory if the order was in a state that had reserved inventory
+    inventory_states = [
+        settings.ORDER_STATUS["PENDING"],
+        settings.ORDER_STATUS["PAID"],
+        settings.ORDER_STATUS["PROCESSING"],
+    ]
+
+    if settings.ORDER_STATUS_CAS:
+        order = await _compare_and_set_status(
+            db, order_id, cancelled, _allowed_from(cancelled), datetime.utcnow()
+        )
+        if order is None:
+            current_status = await _current_status(db, order_id)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot cancel order in '{current_status}' status",
+            )
+
+        if order["status"] in inventory_states:
+            await enqueue_outbox_entry(db, order_id, RELEASE, order["items"])
+        outbox_worker.wake()
+        logger.info(f"Cancelled order {order_id}")
+        return None
+
     # Get the current order
     order = await db["orders"].find_one({"_id": ObjectId(order_id)})
     if not order:
@@ -346,18 +854,8 @@ async def cancel_order(
             detail=f"Cannot cancel order in '{current_status}' status",
         )
 
-    # Release inventory if the order was in a state that had reserved inventory
-    inventory_states = [
-        settings.ORDER_STATUS["PENDING"],
-        settings.ORDER_STATUS["PAID"],
-        settings.ORDER_STATUS["PROCESSING"],
-    ]
-
     if current_status in inventory_states:
-        for item in order["items"]:
-            await inventory_service.release_inventory(
-                item["product_id"], item["quantity"]
-            )
+        await enqueue_outbox_entry(db, order_id, RELEASE, order["items"])
 
     # Update the order status to cancelled
     await db["orders"].update_one(
@@ -369,6 +867,8 @@ async def cancel_order(
             }
         },
     )
+    await record_status_change(db, order, settings.ORDER_STATUS["CANCELLED"])
 
+    outbox_worker.wake()
     logger.info(f"Cancelled order {order_id}")
     return None
@@ -10,24 +10,93 @@ class Settings(BaseSettings):
     DEBUG: bool = False
     PROJECT_NAME: str = "Order Service"
     PORT: int = 8001
-    
+
     # MongoDB settings
     MONGODB_URI: str = "mongodb://localhost:27017"
     MONGODB_DB: str = "order_db"
-    
+
     # Service URLs
     USER_SERVICE_URL: AnyHttpUrl
     PRODUCT_SERVICE_URL: AnyHttpUrl
     INVENTORY_SERVICE_URL: AnyHttpUrl
-    
-    # Retry Configuration
-    MAX_RETRIES: int = 3
-    RETRY_DELAY: int = 1  # seconds
-    
+
+    # HTTP client pool settings (shared by all inter-service clients)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    HTTP_TIMEOUT: float = 5.0  # seconds
+    HTTP_CONNECT_TIMEOUT: float = 2.0  # seconds
+    HTTP2_ENABLED: bool = False  # requires the 'h2' package
+
+    # Retries of idempotent inter-service requests
+    HTTP_RETRY_ATTEMPTS: int = 3
+    HTTP_RETRY_BACKOFF_BASE: float = 0.1  # seconds, doubled per attempt, jittered
+    HTTP_RETRY_BACKOFF_MAX: float = 1.0  # seconds
+    HTTP_RETRY_BUDGET: float = 5.0  # seconds for all attempts of one request
+
+    # Share one upstream call between identical concurrent requests
+    HTTP_COALESCING_ENABLED: bool = True
+
+    # Circuit breaker per upstream service
+    BREAKER_WINDOW: int = 20  # most recent calls considered
+    BREAKER_MIN_CALLS: int = 10  # calls needed in the window before tripping
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_SLOW_CALL_RATE: float = 0.5
+    BREAKER_SLOW_CALL_SECONDS: float = 2.0
+    BREAKER_OPEN_SECONDS: float = 30.0  # before probing again
+    BREAKER_HALF_OPEN_CALLS: int = 3  # probe calls that must succeed to close
+
+    # Product cache settings (product-service client)
+    PRODUCT_CACHE_SIZE: int = 2048
+    PRODUCT_CACHE_TTL: float = 300.0  # seconds
+    PRODUCT_CACHE_NEGATIVE_TTL: float = 30.0  # seconds, for 404s
+
+    # Product change events from product-service (Redis pub/sub); cached
+    # products are evicted as they change, with the TTLs above as fallback
+    REDIS_URL: Optional[str] = None
+    PRODUCT_EVENTS_CHANNEL: str = "product:changes"
+    PRODUCT_EVENTS_RECONNECT_DELAY: float = 5.0  # seconds
+    PRODUCT_BATCH_SIZE: int = 100  # IDs per GET /products/batch request
+    INVENTORY_BATCH_SIZE: int = 500  # IDs per POST /inventory/check-batch request
+
+    # Order validation settings
+    ORDER_VALIDATION_CONCURRENCY: int = 10  # max in-flight user checks per bulk batch
+    ORDER_VALIDATION_TIMEOUT: float = 10.0  # seconds
+
+    # Bulk order ingestion settings
+    ORDER_BULK_MAX_ORDERS: int = 1000
+    ORDER_BULK_VALIDATION_TIMEOUT: float = 30.0  # seconds
+
+    # Idempotency-Key settings for order creation
+    IDEMPOTENCY_KEY_TTL: int = 86400  # seconds a key and its response are kept
+    IDEMPOTENCY_WAIT_TIMEOUT: float = 10.0  # seconds to wait on an in-flight key
+    IDEMPOTENCY_POLL_INTERVAL: float = 0.1  # seconds
+    IDEMPOTENCY_LOCK_TIMEOUT: int = 60  # seconds before an unfinished key is stale
+
+    # Routes that skip response-model validation and encode the documents
+    # read from the database directly (see app/api/serialization.py). Off
+    # by default; supported: get_orders, get_user_orders, get_order, e.g.
+    # FAST_SERIALIZATION_ROUTES='["get_orders"]'
+    FAST_SERIALIZATION_ROUTES: List[str] = []
+
+    # Order export settings
+    ORDER_EXPORT_BATCH_SIZE: int = 500  # documents per cursor batch and chunk
+
+    # Outbox worker settings (inventory side effects of orders)
+    OUTBOX_POLL_INTERVAL: float = 1.0  # seconds between polls when idle
+    OUTBOX_BATCH_SIZE: int = 50  # entries claimed per poll
+    OUTBOX_CONCURRENCY: int = 10  # max in-flight calls per upstream
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE: float = 1.0  # seconds, doubled on every attempt
+    OUTBOX_BACKOFF_MAX: float = 60.0  # seconds
+    OUTBOX_LEASE: int = 30  # seconds before a claimed entry can be reclaimed
+    OUTBOX_ORPHAN_GRACE: int = 60  # seconds to wait for an entry's order write
+    OUTBOX_DEFER_TIMEOUT: int = 3600  # seconds an entry may stay deferred
+
     # JWT Auth settings (for testing/development)
     SECRET_KEY: str = "development-secret-key"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
-    
+
     # Order status codes
     ORDER_STATUS: Dict[str, str] = {
         "PENDING": "pending",
@@ -36,9 +105,9 @@ class Settings(BaseSettings):
         "SHIPPED": "shipped",
         "DELIVERED": "delivered",
         "CANCELLED": "cancelled",
-        "REFUNDED": "refunded"
+        "REFUNDED": "refunded",
     }
-    
+
     # Status transitions that are allowed
     ALLOWED_STATUS_TRANSITIONS: Dict[str, List[str]] = {
         "pending": ["paid", "cancelled"],
@@ -47,20 +116,26 @@ class Settings(BaseSettings):
         "shipped": ["delivered", "refunded"],
         "delivered": ["refunded"],
         "cancelled": [],
-        "refunded": []
+        "refunded": [],
     }
-    
+
+    # Validate and apply status changes in a single find_one_and_update whose
+    # filter only matches orders in a status the transition is allowed from
+    ORDER_STATUS_CAS: bool = True
+
     # Validate URLs are properly formatted
-    @validator("USER_SERVICE_URL", "PRODUCT_SERVICE_URL", "INVENTORY_SERVICE_URL", pre=True)
+    @validator(
+        "USER_SERVICE_URL", "PRODUCT_SERVICE_URL", "INVENTORY_SERVICE_URL", pre=True
+    )
     def validate_service_urls(cls, v):
         if isinstance(v, str) and not v.startswith(("http://", "https://")):
             return f"http://{v}"
         return v
-    
+
     class Config:
         env_file = ".env"
         case_sensitive = True
 
 
 # Create global settings object
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,135 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING
+
+from app.api.pagination import ORDER_SORT
+from app.core.config import settings
+
+logger = logging.getLogger("order-service")
+
+# Indexes backing the order listing routes. The (created_at, _id) suffix
+# matches ORDER_SORT so filtered listings can walk the index in order
+# instead of sorting in memory.
+ORDER_INDEXES = [
+    [("user_id", ASCENDING)],
+    [("status", ASCENDING)],
+    [("created_at", ASCENDING)],
+    [("created_at", DESCENDING), ("_id", DESCENDING)],
+    [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+    [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+    [
+        ("user_id", ASCENDING),
+        ("status", ASCENDING),
+        ("created_at", DESCENDING),
+        ("_id", DESCENDING),
+    ],
+]
+
+# Representative query shapes issued by the order routes
+_SAMPLE_DATE = datetime(2024, 1, 1)
+ORDER_QUERY_SHAPES: Dict[str, Dict[str, Any]] = {
+    "get_orders": {},
+    "get_orders?status": {"status": "pending"},
+    "get_orders?user_id": {"user_id": "000000000000000000000000"},
+    "get_orders?user_id&status": {
+        "user_id": "000000000000000000000000",
+        "status": "pending",
+    },
+    "get_orders?start_date&end_date": {
+        "created_at": {"$gte": _SAMPLE_DATE, "$lte": _SAMPLE_DATE}
+    },
+    "get_orders?status&start_date": {
+        "status": "pending",
+        "created_at": {"$gte": _SAMPLE_DATE},
+    },
+    "get_user_orders": {"user_id": "000000000000000000000000"},
+    "get_user_orders?status": {
+        "user_id": "000000000000000000000000",
+        "status": "pending",
+    },
+}
+
+
+async def ensure_order_indexes(db):
+    """Create the indexes used by the order routes."""
+    for keys in ORDER_INDEXES:
+        await db["orders"].create_index(keys)
+
+    # Expire idempotency keys (and their stored responses) automatically
+    await db["idempotency_keys"].create_index(
+        "created_at", expireAfterSeconds=settings.IDEMPOTENCY_KEY_TTL
+    )
+
+    # Outbox polling, and at most one entry of each type per order
+    await db["order_outbox"].create_index(
+        [("status", ASCENDING), ("next_attempt_at", ASCENDING)]
+    )
+    await db["order_outbox"].create_index(
+        [("order_id", ASCENDING), ("type", ASCENDING)], unique=True
+    )
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten a winning plan tree into its list of stages, root first."""
+    stages = []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append(node)
+        # Classic plans nest via inputStage(s); SBE plans wrap them in queryPlan
+        pending.extend(node.get("inputStages", []))
+        for key in ("inputStage", "queryPlan"):
+            if key in node:
+                pending.append(node[key])
+    return stages
+
+
+async def explain_order_queries(db) -> Dict[str, Dict[str, Any]]:
+    """
+    Run explain() on every order route query shape.
+
+    Returns, per shape, the winning plan's stages, the indexes it uses and
+    whether it falls back to a collection scan or an in-memory sort.
+    """
+    report = {}
+    for name, query in ORDER_QUERY_SHAPES.items():
+        cursor = db["orders"].find(query).sort(ORDER_SORT).limit(10)
+        explanation = await cursor.explain()
+        stages = _plan_stages(explanation["queryPlanner"]["winningPlan"])
+        names = [stage["stage"] for stage in stages]
+        report[name] = {
+            "stages": names,
+            "indexes": [stage["indexName"] for stage in stages if "indexName" in stage],
+            "collscan": "COLLSCAN" in names,
+            "in_memory_sort": "SORT" in names,
+        }
+        if report[name]["collscan"] or report[name]["in_memory_sort"]:
+            logger.warning(f"Order query shape {name} is not index-backed: {names}")
+    return report
+
+
+async def log_index_report(db):
+    """Log a one-line summary of explain_order_queries(), e.g. at startup."""
+    try:
+        report = await explain_order_queries(db)
+    except Exception as e:
+        logger.warning(f"Could not explain the order query shapes: {str(e)}")
+        return
+
+    uncovered = [
+        name
+        for name, shape in report.items()
+        if shape["collscan"] or shape["in_memory_sort"]
+    ]
+    collscans = sum(shape["collscan"] for shape in report.values())
+    sorts = sum(shape["in_memory_sort"] for shape in report.values())
+    logger.info(
+        f"Order query index coverage: {len(report) - len(uncovered)}/{len(report)} "
+        f"shapes index-backed, {collscans} COLLSCAN, {sorts} SORT"
+        + (f" ({', '.join(uncovered)})" if uncovered else "")
+    )
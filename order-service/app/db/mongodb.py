@@ -2,6 +2,7 @@ import logging
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.core.config import settings
+from app.db.indexes import ensure_order_indexes, log_index_report
 
 # Configure logging
 logging.basicConfig(
@@ -26,9 +27,8 @@ async def connect_to_mongo():
     mongodb.db = mongodb.client[settings.MONGODB_DB]
 
     # Create indexes
-    await mongodb.db["orders"].create_index("user_id")
-    await mongodb.db["orders"].create_index("status")
-    await mongodb.db["orders"].create_index("created_at")
+    await ensure_order_indexes(mongodb.db)
+    await log_index_report(mongodb.db)
 
     logger.info("Connected to MongoDB!")
 
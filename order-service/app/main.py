@@ -4,6 +4,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import orders
 from app.core.config import settings
 from app.db.mongodb import close_mongo_connection, connect_to_mongo
+from app.services.http import (
+    breaker_stats,
+    close_http_clients,
+    coalescing_stats,
+    start_http_clients,
+)
+from app.services.outbox import outbox_worker
+from app.services.product import product_events, product_service
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -27,7 +35,14 @@ app.include_router(orders.router, prefix=settings.API_PREFIX)
 
 # Register startup and shutdown events
 app.add_event_handler("startup", connect_to_mongo)
+app.add_event_handler("startup", start_http_clients)
+app.add_event_handler("startup", product_events.start)
+app.add_event_handler("startup", outbox_worker.start)
+app.add_event_handler("shutdown", outbox_worker.stop)
 app.add_event_handler("shutdown", close_mongo_connection)
+app.add_event_handler("shutdown", close_http_clients)
+app.add_event_handler("shutdown", product_events.stop)
+
 
 # Health check endpoint
 @app.get("/health")
@@ -35,6 +50,18 @@ async def health_check():
     return {"status": "ok", "service": "order-service"}
 
 
+# Metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    return {
+        "product_cache": product_service.cache.stats(),
+        "product_events": product_events.stats(),
+        "circuit_breakers": breaker_stats(),
+        "request_coalescing": coalescing_stats(),
+        "outbox": outbox_worker.stats(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -77,6 +77,43 @@ class OrderCreate(BaseModel):
         return v
 
 
+class OrderBulkCreate(BaseModel):
+    """Model for creating a batch of orders at once."""
+
+    orders: List[OrderCreate] = Field(
+        ..., min_items=1, max_items=settings.ORDER_BULK_MAX_ORDERS
+    )
+
+
+class OrderBulkResult(BaseModel):
+    """Model for the outcome of one order of a bulk request."""
+
+    index: int
+    success: bool
+    order_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class OrderBulkResponse(BaseModel):
+    """Model for the response of a bulk order request."""
+
+    created: int
+    failed: int
+    results: List[OrderBulkResult]
+
+
+class OrderExpire(BaseModel):
+    """Model for cancelling orders whose inventory reservation expired."""
+
+    order_ids: List[str] = Field(..., min_items=1, max_items=500)
+
+
+class OrderExpireResponse(BaseModel):
+    """Model for the outcome of an expiry request, keyed by order ID."""
+
+    results: Dict[str, str]
+
+
 class OrderUpdate(BaseModel):
     """Model for updating an order."""
 
@@ -98,6 +135,7 @@ class OrderResponse(BaseModel):
     items: List[OrderItem]
     total_price: condecimal(max_digits=10, decimal_places=2)
     status: str
+    inventory_status: Optional[str] = None
     shipping_address: OrderAddress
     created_at: datetime
     updated_at: datetime
@@ -119,3 +157,21 @@ class OrderStatusUpdate(BaseModel):
             valid_statuses = ", ".join(settings.ORDER_STATUS.values())
             raise ValueError(f"Invalid status. Must be one of: {valid_statuses}")
         return v
+
+
+class OrderStats(BaseModel):
+    """Model for one document of an order rollup (per day, status or user)."""
+
+    key: str = Field(..., alias="_id")
+    order_count: int = 0
+    item_count: int = 0
+    revenue: float = 0
+    by_status: Dict[str, int] = {}
+
+    @validator("revenue")
+    def round_revenue(cls, v):
+        # Rollups accumulate float increments; hide the rounding noise
+        return round(v, 2)
+
+    class Config:
+        allow_population_by_field_name = True
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+
+
+def request_fingerprint(body: str) -> str:
+    """Hash a request body so a reused key with a different body is detected."""
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _key_id(user_id: str, key: str) -> Dict[str, str]:
+    """Keys are scoped per user, so one user cannot replay another's order."""
+    return {"user_id": user_id, "key": key}
+
+
+async def claim_idempotency_key(
+    db: AsyncIOMotorDatabase, user_id: str, key: str, fingerprint: str
+) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Claim a user's idempotency key for the current request.
+
+    If the key was already used, returns the stored response of the first
+    request, waiting up to IDEMPOTENCY_WAIT_TIMEOUT seconds for it to finish
+    if it is still in progress.
+
+    Returns:
+        tuple: (claim_token, None) if the key was claimed and the request
+        should be processed, the token then being passed to
+        complete_idempotency_key or release_idempotency_key; (None,
+        response) if the response of the first request should be replayed
+    """
+    collection = db[IDEMPOTENCY_COLLECTION]
+    key_id = _key_id(user_id, key)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+
+    while True:
+        token = uuid.uuid4().hex
+        try:
+            await collection.insert_one(
+                {
+                    "_id": key_id,
+                    "fingerprint": fingerprint,
+                    "status": "in_progress",
+                    "token": token,
+                    "created_at": datetime.utcnow(),
+                }
+            )
+            return token, None
+        except DuplicateKeyError:
+            pass
+
+        record = await collection.find_one({"_id": key_id})
+        if record is not None:
+            if record["fingerprint"] != fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used with a different request",
+                )
+            if record["status"] == "completed":
+                logger.info(f"Replaying response for idempotency key {key}")
+                return None, record["response"]
+
+            # Take over a key whose first request died without releasing it
+            stale_before = datetime.utcnow() - timedelta(
+                seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT
+            )
+            if record["created_at"] < stale_before:
+                taken = await collection.find_one_and_update(
+                    {
+                        "_id": key_id,
+                        "status": "in_progress",
+                        "token": record.get("token"),
+                    },
+                    {"$set": {"token": token, "created_at": datetime.utcnow()}},
+                )
+                if taken is not None:
+                    logger.warning(f"Took over stale idempotency key {key}")
+                    return token, None
+
+        # Either still in progress, or released by a failed attempt and free
+        # to be claimed again on the next iteration
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress",
+            )
+        await asyncio.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+
+async def complete_idempotency_key(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    key: str,
+    token: str,
+    response: Dict[str, Any],
+):
+    """
+    Store the response for a claimed key so retries replay it.
+
+    Nothing is stored if the claim was taken over as stale in the meantime.
+    """
+    result = await db[IDEMPOTENCY_COLLECTION].update_one(
+        {"_id": _key_id(user_id, key), "status": "in_progress", "token": token},
+        {
+            "$set": {
+                "status": "completed",
+                "response": response,
+                "completed_at": datetime.utcnow(),
+            }
+        },
+    )
+    if result.matched_count == 0:
+        logger.warning(f"Idempotency key {key} was taken over before completing")
+
+
+async def release_idempotency_key(
+    db: AsyncIOMotorDatabase, user_id: str, key: str, token: str
+):
+    """
+    Forget a claimed key after a failed attempt so it can be retried.
+
+    A claim taken over as stale in the meantime is left to its new owner.
+    """
+    await db[IDEMPOTENCY_COLLECTION].delete_one(
+        {"_id": _key_id(user_id, key), "status": "in_progress", "token": token}
+    )
@@ -1,83 +1,267 @@
+import asyncio
 import httpx
 import logging
 from decimal import Decimal
-from tenacity import retry, stop_after_attempt, wait_fixed
+from typing import Dict, List, Optional, Tuple
 
 from app.core.config import settings
+from app.services.http import ServiceClient
 
 logger = logging.getLogger(__name__)
 
 
-class InventoryServiceClient:
+class InventoryServiceClient(ServiceClient):
     """Client for interacting with the Inventory Service."""
 
     def __init__(self):
-        self.base_url = str(settings.INVENTORY_SERVICE_URL)
-        self.timeout = 5.0  # seconds
-        self.max_retries = settings.MAX_RETRIES
-        self.retry_delay = settings.RETRY_DELAY
+        super().__init__(str(settings.INVENTORY_SERVICE_URL), name="inventory-service")
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-    async def check_inventory(self, product_id: str, quantity: int) -> bool:
+    async def check_inventory_batch(
+        self, items: List[Tuple[str, int]]
+    ) -> Dict[str, bool]:
         """
-        Check if the specified quantity of a product is available.
+        Check availability of several products in one request.
 
         Args:
-            product_id: The ID of the product
-            quantity: The quantity to check
+            items: List of (product_id, quantity) pairs
 
         Returns:
-            bool: True if sufficient inventory exists, False otherwise
+            dict: Availability keyed by product ID. Every product is reported
+            as unavailable if the request fails.
         """
-        logger.info(f"Checking inventory for product {product_id}, quantity {quantity}")
+        logger.info(f"Checking inventory for {len(items)} items")
+        unavailable = {product_id: False for product_id, _ in items}
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(
-                    f"{self.base_url}/inventory/check",
-                    params={"product_id": product_id, "quantity": quantity},
-                )
-
-                if response.status_code == 200:
-                    result = response.json()
-                    return result.get("available", False)
-                else:
-                    logger.error(f"Inventory check failed: {response.text}")
-                    return False
+            response = await self.request(
+                "POST",
+                "/inventory/check-batch",
+                idempotent=True,
+                coalesce=True,
+                json={
+                    "items": [
+                        {"product_id": product_id, "quantity": quantity}
+                        for product_id, quantity in items
+                    ]
+                },
+            )
+
+            if response.status_code == 200:
+                result = response.json()
+                return {
+                    item["product_id"]: item.get("available", False)
+                    for item in result.get("items", [])
+                }
+            else:
+                logger.error(f"Batch inventory check failed: {response.text}")
+                return unavailable
         except httpx.RequestError as e:
             logger.error(f"Error checking inventory: {str(e)}")
-            return False
+            return unavailable
+
+    async def get_inventory_levels(
+        self, product_ids: List[str]
+    ) -> Dict[str, Optional[int]]:
+        """
+        Get the available quantity of several products.
+
+        IDs are sent through the batch check endpoint in chunks of
+        INVENTORY_BATCH_SIZE.
+
+        Args:
+            product_ids: The IDs of the products
+
+        Returns:
+            dict: Available quantity keyed by product ID, None for products
+            not in inventory or whose check failed
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        chunks = [
+            product_ids[i : i + settings.INVENTORY_BATCH_SIZE]
+            for i in range(0, len(product_ids), settings.INVENTORY_BATCH_SIZE)
+        ]
+        levels: Dict[str, Optional[int]] = {}
+        for fetched in await asyncio.gather(
+            *(self._fetch_inventory_levels(chunk) for chunk in chunks)
+        ):
+            levels.update(fetched)
+        return levels
+
+    async def _fetch_inventory_levels(
+        self, product_ids: List[str]
+    ) -> Dict[str, Optional[int]]:
+        logger.info(f"Getting inventory levels for {len(product_ids)} products")
+        levels: Dict[str, Optional[int]] = {
+            product_id: None for product_id in product_ids
+        }
+        try:
+            response = await self.request(
+                "POST",
+                "/inventory/check-batch",
+                idempotent=True,
+                coalesce=True,
+                json={
+                    "items": [
+                        {"product_id": product_id, "quantity": 1}
+                        for product_id in product_ids
+                    ]
+                },
+            )
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-    async def reserve_inventory(self, product_id: str, quantity: int) -> bool:
+            if response.status_code == 200:
+                for item in response.json().get("items", []):
+                    levels[item["product_id"]] = item.get("current_quantity")
+            else:
+                logger.error(f"Inventory levels request failed: {response.text}")
+        except httpx.RequestError as e:
+            logger.error(f"Error getting inventory levels: {str(e)}")
+        return levels
+
+    async def reserve_inventory_batch(
+        self, items: List[Tuple[str, int]], order_id: Optional[str] = None
+    ) -> Optional[bool]:
         """
-        Reserve inventory for a product.
+        Reserve inventory for all items of an order in one transaction.
 
         Args:
-            product_id: The ID of the product
-            quantity: The quantity to reserve
+            items: List of (product_id, quantity) pairs
+            order_id: The order the reservation belongs to; makes retries safe
 
         Returns:
-            bool: True if reservation was successful, False otherwise
+            Optional[bool]: True if every item was reserved, False if the
+            reservation was rejected, None if the outcome is unknown
         """
-        logger.info(
-            f"Reserving inventory for product {product_id}, quantity {quantity}"
+        logger.info(f"Reserving inventory for {len(items)} items, order {order_id}")
+        return await self._post_batch(
+            "/inventory/reserve-batch", items, order_id, "reserved"
         )
+
+    async def reserve_inventory_for_orders(
+        self, orders: Dict[str, List[Tuple[str, int]]]
+    ) -> Optional[Dict[str, bool]]:
+        """
+        Reserve inventory for several orders in one transaction.
+
+        Each order is reserved completely or not at all, independently of
+        the others. Orders that were already reserved are reported as
+        reserved, so retries are safe.
+
+        Args:
+            orders: (product_id, quantity) pairs keyed by order ID
+
+        Returns:
+            Optional[Dict[str, bool]]: Whether each order was reserved, or
+            None if the outcome is unknown
+        """
+        logger.info(f"Reserving inventory for {len(orders)} orders")
+        return await self._post_orders("/inventory/reserve-orders", orders, "reserved")
+
+    async def release_inventory_batch(
+        self, items: List[Tuple[str, int]], order_id: Optional[str] = None
+    ) -> Optional[bool]:
+        """
+        Release reserved inventory for all items of an order in one transaction.
+
+        Args:
+            items: List of (product_id, quantity) pairs
+            order_id: The order the reservation belongs to; makes retries safe
+
+        Returns:
+            Optional[bool]: True if the release was successful, False if it was
+            rejected, None if the outcome is unknown
+        """
+        logger.info(f"Releasing inventory for {len(items)} items, order {order_id}")
+        return await self._post_batch(
+            "/inventory/release-batch", items, order_id, "released"
+        )
+
+    async def release_inventory_for_orders(
+        self, orders: Dict[str, List[Tuple[str, int]]]
+    ) -> Optional[Dict[str, bool]]:
+        """
+        Release the reservations of several orders in one transaction.
+
+        Only reservations recorded for each order are released, and only
+        once, so retries are safe.
+
+        Args:
+            orders: (product_id, quantity) pairs keyed by order ID
+
+        Returns:
+            Optional[Dict[str, bool]]: Whether each order's release
+            succeeded, or None if the outcome is unknown
+        """
+        logger.info(f"Releasing inventory for {len(orders)} orders")
+        return await self._post_orders("/inventory/release-orders", orders, "released")
+
+    async def _post_orders(
+        self, path: str, orders: Dict[str, List[Tuple[str, int]]], flag: str
+    ) -> Optional[Dict[str, bool]]:
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/inventory/reserve",
-                    json={"product_id": product_id, "quantity": quantity},
-                )
-
-                if response.status_code == 200:
-                    result = response.json()
-                    return result.get("reserved", False)
-                else:
-                    logger.error(f"Inventory reservation failed: {response.text}")
-                    return False
+            response = await self.request(
+                "POST",
+                path,
+                idempotent=True,
+                json={
+                    "orders": [
+                        {
+                            "order_id": order_id,
+                            "items": [
+                                {"product_id": product_id, "quantity": quantity}
+                                for product_id, quantity in items
+                            ],
+                        }
+                        for order_id, items in orders.items()
+                    ]
+                },
+            )
+
+            if response.status_code == 200:
+                results = response.json().get("results", {})
+                return {
+                    order_id: results.get(order_id, {}).get(flag, False)
+                    for order_id in orders
+                }
+            else:
+                logger.error(f"Inventory {path} failed: {response.text}")
+                if response.status_code >= 500:
+                    return None
+                return {order_id: False for order_id in orders}
+        except httpx.RequestError as e:
+            logger.error(f"Error calling inventory {path}: {str(e)}")
+            return None
+
+    async def _post_batch(
+        self,
+        path: str,
+        items: List[Tuple[str, int]],
+        order_id: Optional[str],
+        flag: str,
+    ) -> Optional[bool]:
+        # Server errors and network failures return None rather than False:
+        # the call may have been applied, so only a retry can settle it
+        try:
+            response = await self.request(
+                "POST",
+                path,
+                idempotent=order_id is not None,
+                json={
+                    "items": [
+                        {"product_id": product_id, "quantity": quantity}
+                        for product_id, quantity in items
+                    ],
+                    "order_id": order_id,
+                },
+            )
+
+            if response.status_code == 200:
+                result = response.json()
+                return result.get(flag, False)
+            else:
+                logger.error(f"Inventory {path} failed: {response.text}")
+                return None if response.status_code >= 500 else False
         except httpx.RequestError as e:
-            logger.error(f"Error reserving inventory: {str(e)}")
-            return False
+            logger.error(f"Error calling inventory {path}: {str(e)}")
+            return None
 
 
 inventory_service = InventoryServiceClient()
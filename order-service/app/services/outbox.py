@@ -0,0 +1,598 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.core.config import settings
+from app.db.mongodb import get_database
+from app.services.inventory import inventory_service
+from app.services.stats import record_status_change
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "order_outbox"
+
+# Outbox entry types and the upstream each one calls
+RESERVE = "reserve"
+RELEASE = "release"
+ENTRY_UPSTREAMS = {RESERVE: "inventory", RELEASE: "inventory"}
+
+# Outbox entry statuses
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+DISCARDED = "discarded"
+DEFERRED = "deferred"  # outcome only: retry later without using an attempt
+
+# Order inventory_status values
+INVENTORY_PENDING = "pending"  # reservation queued
+INVENTORY_RESERVED = "reserved"
+INVENTORY_FAILED = "failed"  # reservation rejected, nothing is held
+INVENTORY_SKIPPED = "skipped"  # order cancelled before it was reserved
+INVENTORY_UNKNOWN = "unknown"  # gave up on the reservation, it may be held
+INVENTORY_RELEASED = "released"
+
+
+class OutboxRetry(Exception):
+    """Raised by a handler when the outcome of an upstream call is unknown."""
+
+
+def _outbox_entry(
+    order_id: str, entry_type: str, items: List[Dict[str, Any]], now: datetime
+) -> Dict[str, Any]:
+    return {
+        "order_id": order_id,
+        "type": entry_type,
+        "items": [
+            {"product_id": item["product_id"], "quantity": item["quantity"]}
+            for item in items
+        ],
+        "status": PENDING,
+        "attempts": 0,
+        "deferrals": 0,
+        "next_attempt_at": now,
+        "locked_until": None,
+        "last_error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def enqueue_outbox_entry(
+    db: AsyncIOMotorDatabase,
+    order_id: str,
+    entry_type: str,
+    items: List[Dict[str, Any]],
+) -> None:
+    """
+    Queue an inventory side effect of an order for the outbox worker.
+
+    There is at most one entry of each type per order, so queueing the same
+    side effect twice is a no-op unless the first entry was discarded.
+
+    Args:
+        db: The order database
+        order_id: The order the side effect belongs to
+        entry_type: RESERVE or RELEASE
+        items: Order items with product_id and quantity
+    """
+    now = datetime.utcnow()
+    try:
+        await db[OUTBOX_COLLECTION].insert_one(
+            _outbox_entry(order_id, entry_type, items, now)
+        )
+    except DuplicateKeyError:
+        # Revive an entry that was discarded because it arrived too early
+        await db[OUTBOX_COLLECTION].update_one(
+            {"order_id": order_id, "type": entry_type, "status": DISCARDED},
+            {
+                "$set": {
+                    "status": PENDING,
+                    "attempts": 0,
+                    "deferrals": 0,
+                    "next_attempt_at": now,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            },
+        )
+        logger.info(f"Outbox {entry_type} entry for order {order_id} already queued")
+
+
+async def enqueue_outbox_entries(
+    db: AsyncIOMotorDatabase,
+    entry_type: str,
+    orders: Dict[str, List[Dict[str, Any]]],
+) -> None:
+    """
+    Queue the same kind of side effect for several new orders at once.
+
+    Args:
+        db: The order database
+        entry_type: RESERVE or RELEASE
+        orders: Order items keyed by order ID
+    """
+    now = datetime.utcnow()
+    try:
+        await db[OUTBOX_COLLECTION].insert_many(
+            [
+                _outbox_entry(order_id, entry_type, items, now)
+                for order_id, items in orders.items()
+            ],
+            ordered=False,
+        )
+    except BulkWriteError as e:
+        # Entries that already exist are fine; anything else is not
+        if e.details.get("writeConcernErrors") or any(
+            error["code"] != 11000 for error in e.details.get("writeErrors", [])
+        ):
+            raise
+
+
+def _age(entry: Dict[str, Any]) -> float:
+    return (datetime.utcnow() - entry["created_at"]).total_seconds()
+
+
+def _item_pairs(entry: Dict[str, Any]):
+    return [(item["product_id"], item["quantity"]) for item in entry["items"]]
+
+
+async def _set_inventory_status(
+    db: AsyncIOMotorDatabase, order_id: str, current: Optional[str], new: str
+) -> bool:
+    """Move an order's inventory_status from current to new, if it still is."""
+    result = await db["orders"].update_one(
+        {"_id": ObjectId(order_id), "inventory_status": current},
+        {"$set": {"inventory_status": new, "updated_at": datetime.utcnow()}},
+    )
+    return result.modified_count == 1
+
+
+async def _cancel_pending_order(
+    db: AsyncIOMotorDatabase, order_id: str, inventory_status: str
+) -> bool:
+    """Cancel an order whose reservation is still pending (compensation)."""
+    order = await db["orders"].find_one_and_update(
+        {
+            "_id": ObjectId(order_id),
+            "status": settings.ORDER_STATUS["PENDING"],
+            "inventory_status": INVENTORY_PENDING,
+        },
+        {
+            "$set": {
+                "status": settings.ORDER_STATUS["CANCELLED"],
+                "inventory_status": inventory_status,
+                "updated_at": datetime.utcnow(),
+            }
+        },
+    )
+    if order is not None:
+        await record_status_change(db, order, settings.ORDER_STATUS["CANCELLED"])
+        return True
+
+    # The order has moved past pending; record the outcome without cancelling
+    await _set_inventory_status(db, order_id, INVENTORY_PENDING, inventory_status)
+    return False
+
+
+async def _check_reserve(
+    db: AsyncIOMotorDatabase, entry: Dict[str, Any], order: Optional[Dict[str, Any]]
+) -> Optional[str]:
+    """Return the outcome of a reserve entry that needs no upstream call."""
+    order_id = entry["order_id"]
+    if order is None:
+        # The entry is written before its order; give that write time to land
+        if _age(entry) < settings.OUTBOX_ORPHAN_GRACE:
+            return DEFERRED
+        logger.warning(f"Discarding reservation for missing order {order_id}")
+        return DISCARDED
+
+    if order.get("inventory_status") != INVENTORY_PENDING:
+        return DONE
+
+    if order["status"] == settings.ORDER_STATUS["CANCELLED"]:
+        await _set_inventory_status(db, order_id, INVENTORY_PENDING, INVENTORY_SKIPPED)
+        return DONE
+
+    return None
+
+
+async def _handle_reserves(
+    db: AsyncIOMotorDatabase, entries: List[Dict[str, Any]]
+) -> List[Any]:
+    # One aggregate reservation call for every entry that still needs one
+    orders = {
+        str(order["_id"]): order
+        async for order in db["orders"].find(
+            {"_id": {"$in": [ObjectId(entry["order_id"]) for entry in entries]}},
+            {"status": 1, "inventory_status": 1},
+        )
+    }
+
+    outcomes: Dict[Any, Any] = {}
+    to_reserve = []
+    for entry in entries:
+        outcome = await _check_reserve(db, entry, orders.get(entry["order_id"]))
+        if outcome is None:
+            to_reserve.append(entry)
+        else:
+            outcomes[entry["_id"]] = outcome
+
+    if to_reserve:
+        reserved = await inventory_service.reserve_inventory_for_orders(
+            {entry["order_id"]: _item_pairs(entry) for entry in to_reserve}
+        )
+        for entry in to_reserve:
+            order_id = entry["order_id"]
+            order_reserved = None if reserved is None else reserved.get(order_id)
+            if order_reserved is None:
+                outcomes[entry["_id"]] = OutboxRetry(
+                    "Inventory reservation outcome unknown"
+                )
+                continue
+
+            if order_reserved:
+                await _set_inventory_status(
+                    db, order_id, INVENTORY_PENDING, INVENTORY_RESERVED
+                )
+                logger.info(f"Reserved inventory for order {order_id}")
+            else:
+                await _cancel_pending_order(db, order_id, INVENTORY_FAILED)
+                logger.warning(f"Inventory reservation rejected for order {order_id}")
+            outcomes[entry["_id"]] = DONE
+
+    return [outcomes[entry["_id"]] for entry in entries]
+
+
+async def _give_up_reserve(db: AsyncIOMotorDatabase, entry: Dict[str, Any]):
+    # The reservation may or may not have been applied. Cancel the order and
+    # queue a release, which inventory-service skips if nothing was reserved.
+    order_id = entry["order_id"]
+    if await _cancel_pending_order(db, order_id, INVENTORY_UNKNOWN):
+        await enqueue_outbox_entry(db, order_id, RELEASE, entry["items"])
+    logger.error(f"Gave up reserving inventory for order {order_id}")
+
+
+async def _check_release(
+    db: AsyncIOMotorDatabase, entry: Dict[str, Any], order: Optional[Dict[str, Any]]
+) -> Optional[str]:
+    """Return the outcome of a release entry that needs no upstream call."""
+    order_id = entry["order_id"]
+    if order is None:
+        logger.warning(f"Discarding release for missing order {order_id}")
+        return DISCARDED
+
+    if order["status"] != settings.ORDER_STATUS["CANCELLED"]:
+        # The entry is written before the status change; give it time to land
+        if _age(entry) < settings.OUTBOX_ORPHAN_GRACE:
+            return DEFERRED
+        logger.warning(f"Discarding release for order {order_id} (not cancelled)")
+        return DISCARDED
+
+    inventory_status = order.get("inventory_status")
+    if inventory_status == INVENTORY_PENDING:
+        # Wait for the reservation to settle first
+        return DEFERRED
+    if inventory_status in (INVENTORY_FAILED, INVENTORY_SKIPPED, INVENTORY_RELEASED):
+        return DONE
+
+    return None
+
+
+async def _released(
+    db: AsyncIOMotorDatabase, order: Dict[str, Any], released: Optional[bool]
+) -> Any:
+    """Record the outcome of an order's release call."""
+    order_id = str(order["_id"])
+    if released is None:
+        return OutboxRetry("Inventory release outcome unknown")
+    if not released:
+        logger.error(f"Inventory release rejected for order {order_id}")
+        return FAILED
+
+    await _set_inventory_status(
+        db, order_id, order.get("inventory_status"), INVENTORY_RELEASED
+    )
+    logger.info(f"Released inventory for order {order_id}")
+    return DONE
+
+
+async def _handle_releases(
+    db: AsyncIOMotorDatabase, entries: List[Dict[str, Any]]
+) -> List[Any]:
+    # One multi-order release call for every entry that still needs one
+    orders = {
+        str(order["_id"]): order
+        async for order in db["orders"].find(
+            {"_id": {"$in": [ObjectId(entry["order_id"]) for entry in entries]}},
+            {"status": 1, "inventory_status": 1},
+        )
+    }
+
+    outcomes: Dict[Any, Any] = {}
+    to_release = []
+    legacy = []
+    for entry in entries:
+        order = orders.get(entry["order_id"])
+        outcome = await _check_release(db, entry, order)
+        if outcome is not None:
+            outcomes[entry["_id"]] = outcome
+        elif order.get("inventory_status") is None:
+            legacy.append(entry)
+        else:
+            to_release.append(entry)
+
+    if to_release:
+        released = await inventory_service.release_inventory_for_orders(
+            {entry["order_id"]: _item_pairs(entry) for entry in to_release}
+        )
+        for entry in to_release:
+            outcomes[entry["_id"]] = await _released(
+                db,
+                orders[entry["order_id"]],
+                None if released is None else released.get(entry["order_id"]),
+            )
+
+    # Orders created before the outbox have no inventory_status and were not
+    # reserved under their order_id, so release them unconditionally, one
+    # call each
+    for entry in legacy:
+        released = await inventory_service.release_inventory_batch(_item_pairs(entry))
+        outcomes[entry["_id"]] = await _released(
+            db, orders[entry["order_id"]], released
+        )
+
+    return [outcomes[entry["_id"]] for entry in entries]
+
+
+async def _give_up_release(db: AsyncIOMotorDatabase, entry: Dict[str, Any]):
+    logger.error(
+        f"Gave up releasing inventory for order {entry['order_id']}; "
+        "the reservation is still held"
+    )
+
+
+class OutboxWorker:
+    """
+    Background worker that drains the order outbox.
+
+    Entries are claimed with a lease, so a worker that dies mid-entry only
+    delays it. Claimed entries are grouped by type into batches of up to
+    batch_sizes entries, and the batches run concurrently, at most
+    OUTBOX_CONCURRENCY at a time per upstream; all reservations (or
+    releases) of a batch are made with one call. Calls with an unknown outcome are retried with
+    exponential backoff; inventory-service deduplicates them by order_id.
+    Deferred entries are retried without using an attempt, until they are
+    OUTBOX_DEFER_TIMEOUT old: the worker then gives up on them as well.
+    """
+
+    # Each handler takes a batch of entries and returns one outcome per entry
+    handlers = {RESERVE: _handle_reserves, RELEASE: _handle_releases}
+    give_up_handlers = {RESERVE: _give_up_reserve, RELEASE: _give_up_release}
+    batch_sizes = {
+        RESERVE: settings.OUTBOX_BATCH_SIZE,
+        RELEASE: settings.OUTBOX_BATCH_SIZE,
+    }
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self.processed = 0
+        self.retried = 0
+        self.deferred = 0
+        self.failed = 0
+        self.expired = 0
+
+    def wake(self):
+        """Drain the outbox now instead of at the next poll."""
+        self._wakeup.set()
+
+    async def start(self):
+        """Start draining the outbox in the background."""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(get_database()))
+            logger.info("Outbox worker started")
+
+    async def stop(self):
+        """Stop the worker, letting the entries in flight finish."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=settings.OUTBOX_LEASE)
+        except asyncio.TimeoutError:
+            logger.warning("Outbox worker did not stop in time; cancelled")
+        self._task = None
+        logger.info("Outbox worker stopped")
+
+    async def _run(self, db: AsyncIOMotorDatabase):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                processed = await self.drain_once(db)
+            except Exception:
+                logger.exception("Error draining the order outbox")
+                processed = 0
+
+            # A full batch means there is probably more work waiting
+            if processed < settings.OUTBOX_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=settings.OUTBOX_POLL_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain_once(self, db: AsyncIOMotorDatabase) -> int:
+        """
+        Claim and process one batch of due entries.
+
+        Returns:
+            int: The number of entries processed
+        """
+        entries = []
+        while len(entries) < settings.OUTBOX_BATCH_SIZE:
+            entry = await self._claim(db)
+            if entry is None:
+                break
+            entries.append(entry)
+
+        by_type = defaultdict(list)
+        for entry in entries:
+            by_type[entry["type"]].append(entry)
+
+        batches = []
+        for entry_type, typed_entries in by_type.items():
+            size = self.batch_sizes.get(entry_type, 1)
+            batches.extend(
+                typed_entries[i : i + size] for i in range(0, len(typed_entries), size)
+            )
+
+        await asyncio.gather(*(self._process(db, batch) for batch in batches))
+        return len(entries)
+
+    async def _claim(self, db: AsyncIOMotorDatabase) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await db[OUTBOX_COLLECTION].find_one_and_update(
+            {
+                "$or": [
+                    {"status": PENDING, "next_attempt_at": {"$lte": now}},
+                    # Claimed by a worker that never finished it
+                    {"status": PROCESSING, "locked_until": {"$lt": now}},
+                ]
+            },
+            {
+                "$set": {
+                    "status": PROCESSING,
+                    "locked_until": now + timedelta(seconds=settings.OUTBOX_LEASE),
+                    "updated_at": now,
+                }
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _process(self, db: AsyncIOMotorDatabase, entries: List[Dict[str, Any]]):
+        entry_type = entries[0]["type"]
+        handler = self.handlers.get(entry_type)
+        if handler is None:
+            logger.error(f"Unknown outbox entry type {entry_type}")
+            for entry in entries:
+                await self._finish(db, entry, FAILED, "Unknown entry type")
+            return
+
+        upstream = ENTRY_UPSTREAMS[entry_type]
+        if upstream not in self._limits:
+            self._limits[upstream] = asyncio.Semaphore(settings.OUTBOX_CONCURRENCY)
+        async with self._limits[upstream]:
+            try:
+                outcomes = await handler(db, entries)
+            except Exception as e:
+                outcomes = [e] * len(entries)
+
+        for entry, outcome in zip(entries, outcomes):
+            if isinstance(outcome, BaseException):
+                if not isinstance(outcome, OutboxRetry):
+                    logger.error(
+                        f"Error processing outbox entry {entry['_id']}: {outcome!r}"
+                    )
+                await self._retry(db, entry, str(outcome))
+            elif outcome == DEFERRED:
+                await self._defer(db, entry)
+            else:
+                if outcome == FAILED:
+                    self.failed += 1
+                await self._finish(db, entry, outcome)
+        self.processed += len(entries)
+
+    async def _defer(self, db: AsyncIOMotorDatabase, entry: Dict[str, Any]):
+        deferrals = entry.get("deferrals", 0) + 1
+        if _age(entry) >= settings.OUTBOX_DEFER_TIMEOUT:
+            self.expired += 1
+            error = f"Still deferred after {deferrals} tries"
+            logger.error(
+                f"Outbox {entry['type']} for order {entry['order_id']}: {error}"
+            )
+            await self.give_up_handlers[entry["type"]](db, entry)
+            await self._finish(db, entry, FAILED, error, deferrals=deferrals)
+            return
+
+        self.deferred += 1
+        await self._finish(
+            db,
+            entry,
+            PENDING,
+            deferrals=deferrals,
+            next_attempt_at=datetime.utcnow()
+            + timedelta(seconds=settings.OUTBOX_POLL_INTERVAL),
+        )
+
+    async def _retry(self, db: AsyncIOMotorDatabase, entry: Dict[str, Any], error: str):
+        attempts = entry["attempts"] + 1
+        if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            self.failed += 1
+            await self.give_up_handlers[entry["type"]](db, entry)
+            await self._finish(db, entry, FAILED, error, attempts=attempts)
+            return
+
+        self.retried += 1
+        delay = min(
+            settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1),
+            settings.OUTBOX_BACKOFF_MAX,
+        )
+        logger.warning(
+            f"Outbox {entry['type']} for order {entry['order_id']} failed "
+            f"(attempt {attempts}), retrying in {delay}s: {error}"
+        )
+        await self._finish(
+            db,
+            entry,
+            PENDING,
+            error,
+            attempts=attempts,
+            next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+        )
+
+    async def _finish(
+        self,
+        db: AsyncIOMotorDatabase,
+        entry: Dict[str, Any],
+        entry_status: str,
+        error: Optional[str] = None,
+        **fields: Any,
+    ):
+        update = {
+            "status": entry_status,
+            "locked_until": None,
+            "updated_at": datetime.utcnow(),
+            **fields,
+        }
+        if error is not None:
+            update["last_error"] = error
+        await db[OUTBOX_COLLECTION].update_one({"_id": entry["_id"]}, {"$set": update})
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the worker state and entry counters."""
+        return {
+            "running": self._task is not None,
+            "processed": self.processed,
+            "retried": self.retried,
+            "deferred": self.deferred,
+            "failed": self.failed,
+            # Failed after being deferred for OUTBOX_DEFER_TIMEOUT
+            "expired": self.expired,
+        }
+
+
+outbox_worker = OutboxWorker()
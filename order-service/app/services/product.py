@@ -1,54 +1,195 @@
+import asyncio
 import httpx
 import logging
 from decimal import Decimal
 from typing import Dict, List, Optional
-from tenacity import retry, stop_after_attempt, wait_fixed
 
+from app.core.cache import MISSING, TTLCache
 from app.core.config import settings
+from app.services.http import ServiceClient
+from app.services.product_events import ProductEventSubscriber
 
 logger = logging.getLogger(__name__)
 
 
-class ProductServiceClient:
+class ProductServiceClient(ServiceClient):
+    """Client for interacting with the Product Service."""
 
     def __init__(self):
-        self.base_url = str(settings.PRODUCT_SERVICE_URL)
-        self.timeout = 5.0  # seconds
-        self.max_retries = settings.MAX_RETRIES
-        self.retry_delay = settings.RETRY_DELAY
+        super().__init__(str(settings.PRODUCT_SERVICE_URL), name="product-service")
+        self.cache = TTLCache(
+            maxsize=settings.PRODUCT_CACHE_SIZE,
+            ttl=settings.PRODUCT_CACHE_TTL,
+            negative_ttl=settings.PRODUCT_CACHE_NEGATIVE_TTL,
+        )
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-    async def verify_products(self, items: List) -> bool:
+    async def get_product(self, product_id: str) -> Optional[Dict]:
         """
-        Verify that all products in an order exist and have valid prices.
+        Get product details by ID.
+
+        Products and 404s are served from the in-process cache when present.
 
         Args:
-            items: List of OrderItem objects with product_id, quantity, and price
+            product_id: The ID of the product
 
         Returns:
-            bool: True if all products are valid, False otherwise
+            dict: Product details or None if not found
         """
-        logger.info(f"Verifying {len(items)} products")
+        product = self.cache.get(product_id)
+        if product is not MISSING:
+            return product
+
+        return await self._fetch_product(product_id)
 
-        for item in items:
-            # Fix: Access attributes directly instead of using .get()
-            product_id = item.product_id
-            price = Decimal(str(item.price))
+    def invalidate_product(self, product_id: str) -> bool:
+        """
+        Evict a product from the cache, e.g. after it was updated or deleted.
+
+        Returns:
+            bool: True if the product was cached
+        """
+        return self.cache.invalidate(product_id)
+
+    async def _fetch_product(self, product_id: str) -> Optional[Dict]:
+        logger.info(f"Getting product details for ID: {product_id}")
+        try:
+            response = await self.request("GET", f"/products/{product_id}")
 
-            product = await self.get_product(product_id)
-            if not product:
+            if response.status_code == 200:
+                product = response.json()
+                self.cache.set(product_id, product)
+                return product
+            elif response.status_code == 404:
                 logger.warning(f"Product not found: {product_id}")
-                return False
+                self.cache.set(product_id, None)
+                return None
+            else:
+                logger.error(f"Error getting product: {response.text}")
+                return None
+        except httpx.RequestError as e:
+            logger.error(f"Request error getting product: {str(e)}")
+            return None
+
+    async def get_products(self, product_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Get several products with as few requests as possible.
+
+        Cached products are served locally; the rest are fetched through the
+        batch endpoint in chunks of PRODUCT_BATCH_SIZE IDs.
+
+        Args:
+            product_ids: The IDs of the products
+
+        Returns:
+            dict: Product details keyed by ID, None for products not found
+        """
+        products: Dict[str, Optional[Dict]] = {}
+        to_fetch = []
+        for product_id in dict.fromkeys(product_ids):
+            product = self.cache.get(product_id)
+            if product is MISSING:
+                to_fetch.append(product_id)
+            else:
+                products[product_id] = product
+
+        chunks = [
+            to_fetch[i : i + settings.PRODUCT_BATCH_SIZE]
+            for i in range(0, len(to_fetch), settings.PRODUCT_BATCH_SIZE)
+        ]
+        for fetched in await asyncio.gather(
+            *(self._fetch_products(chunk) for chunk in chunks)
+        ):
+            products.update(fetched)
+
+        return products
+
+    async def _fetch_products(
+        self, product_ids: List[str]
+    ) -> Dict[str, Optional[Dict]]:
+        logger.info(f"Getting product details for {len(product_ids)} IDs")
+        unknown = {product_id: None for product_id in product_ids}
+        try:
+            response = await self.request(
+                "GET",
+                "/products/batch",
+                params={"ids": ",".join(product_ids)},
+            )
+
+            if response.status_code != 200:
+                logger.error(f"Error getting products: {response.text}")
+                return unknown
+        except httpx.RequestError as e:
+            logger.error(f"Request error getting products: {str(e)}")
+            return unknown
 
-            # Verify the price matches (allow for small difference due to decimal precision)
-            product_price = Decimal(str(product.get("price")))
-            if abs(product_price - price) > Decimal("0.01"):
-                logger.warning(
-                    f"Price mismatch for product {product_id}: {price} vs {product_price}"
-                )
-                return False
+        result = response.json()
+        products = result.get("products", {})
+        for product_id, product in products.items():
+            self.cache.set(product_id, product)
+        for product_id in result.get("missing", []):
+            self.cache.set(product_id, None)
+
+        return {product_id: products.get(product_id) for product_id in product_ids}
+
+    def _price_matches(self, product_id: str, product: Optional[Dict], price) -> bool:
+        if not product:
+            logger.warning(f"Product not found: {product_id}")
+            return False
+
+        # Verify the price matches (allow for small difference due to decimal precision)
+        product_price = Decimal(str(product.get("price")))
+        if abs(product_price - Decimal(str(price))) > Decimal("0.01"):
+            logger.warning(
+                f"Price mismatch for product {product_id}: {price} vs {product_price}"
+            )
+            return False
 
         return True
 
+    async def verify_product(self, product_id: str, price) -> bool:
+        """
+        Verify that a single product exists and has the expected price.
+
+        Args:
+            product_id: The ID of the product
+            price: The price quoted in the order
+
+        Returns:
+            bool: True if the product is valid, False otherwise
+        """
+        product = await self.get_product(product_id)
+        return self._price_matches(product_id, product, price)
+
+    async def verify_products(
+        self, items: List, products: Optional[Dict[str, Optional[Dict]]] = None
+    ) -> bool:
+        """
+        Verify that all products in an order exist and have valid prices.
+
+        Args:
+            items: List of OrderItem objects with product_id, quantity, and price
+            products: Product details already fetched with get_products, if any
+
+        Returns:
+            bool: True if all products are valid, False otherwise
+        """
+        logger.info(f"Verifying {len(items)} products")
+
+        # Fix: Access attributes directly instead of using .get()
+        if products is None:
+            products = await self.get_products([item.product_id for item in items])
+        return all(
+            self._price_matches(
+                item.product_id, products.get(item.product_id), item.price
+            )
+            for item in items
+        )
+
 
 product_service = ProductServiceClient()
+product_events = ProductEventSubscriber(
+    settings.REDIS_URL,
+    settings.PRODUCT_EVENTS_CHANNEL,
+    on_change=product_service.invalidate_product,
+    on_resync=product_service.cache.clear,
+)
@@ -0,0 +1,115 @@
+# Shared module: order-service/app/services/product_events.py is the source of truth.
+# Each service is built from its own directory, so it is copied into inventory-service.
+# Change it there and copy it over; the copies must stay identical.
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # pragma: no cover - redis is optional
+    redis = None
+
+
+class ProductEventSubscriber:
+    """
+    Listens for product-service change events and applies them to a cache.
+
+    on_change is called with the product_id of every created, updated or
+    deleted product. Pub/sub does not replay messages missed while the
+    subscriber was disconnected, so on_resync is called every time the
+    subscription is (re)established and should drop everything cached.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str],
+        channel: str,
+        on_change: Callable[[str], Any],
+        on_resync: Callable[[], Any],
+    ):
+        self.url = url
+        self.channel = channel
+        self.on_change = on_change
+        self.on_resync = on_resync
+        self._task: Optional[asyncio.Task] = None
+
+        self.connected = False
+        self.received = 0
+        self.invalid = 0
+        self.resyncs = 0
+
+    async def start(self):
+        """Start listening in the background; a no-op without REDIS_URL."""
+        if not self.url:
+            logger.info("REDIS_URL is not set; product change events are ignored")
+            return
+        if redis is None:
+            logger.warning("redis is not installed; product change events are ignored")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop listening."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            client = redis.from_url(self.url)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self.connected = True
+                self.resyncs += 1
+                self.on_resync()
+                logger.info(f"Subscribed to product change events on {self.channel}")
+
+                async for message in pubsub.listen():
+                    self.handle_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Product change event subscription failed: {str(e)}")
+            finally:
+                self.connected = False
+                await pubsub.close()
+                await client.close()
+
+            await asyncio.sleep(settings.PRODUCT_EVENTS_RECONNECT_DELAY)
+
+    def handle_message(self, data):
+        """Apply one raw event message."""
+        try:
+            event = json.loads(data)
+            product_id = event["product_id"]
+        except (TypeError, ValueError, KeyError):
+            self.invalid += 1
+            logger.warning(f"Ignoring malformed product change event: {data!r}")
+            return
+
+        self.received += 1
+        self.on_change(product_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the subscription state and event counters."""
+        return {
+            "enabled": self._task is not None,
+            "connected": self.connected,
+            "channel": self.channel,
+            "received": self.received,
+            "invalid": self.invalid,
+            "resyncs": self.resyncs,
+        }
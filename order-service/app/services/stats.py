@@ -0,0 +1,199 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from typing import Any, Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Rollup collections, keyed by day (YYYY-MM-DD, UTC), status and user_id.
+# Daily and user rollups count orders by creation and break their current
+# statuses down in by_status; status rollups hold the orders currently in
+# each status.
+DAILY_STATS = "order_stats_daily"
+STATUS_STATS = "order_stats_status"
+USER_STATS = "order_stats_user"
+
+
+def _day(order: Dict[str, Any]) -> str:
+    return order["created_at"].strftime("%Y-%m-%d")
+
+
+def _totals(order: Dict[str, Any], sign: int = 1) -> Dict[str, Any]:
+    return {
+        "order_count": sign,
+        "item_count": sign * sum(item["quantity"] for item in order["items"]),
+        "revenue": sign * order["total_price"],
+    }
+
+
+async def record_order_created(db: AsyncIOMotorDatabase, order: Dict[str, Any]):
+    """
+    Add a newly inserted order to the rollups.
+
+    Failures are logged rather than raised, since the order itself is already
+    stored; rebuild_order_stats brings the rollups back in line.
+
+    Args:
+        db: The order database
+        order: The order document as inserted
+    """
+    await record_orders_created(db, [order])
+
+
+async def record_orders_created(db: AsyncIOMotorDatabase, orders: List[Dict[str, Any]]):
+    """
+    Add several newly inserted orders to the rollups.
+
+    Increments are summed per rollup document first, so each rollup
+    collection gets one bulk write however many orders there are.
+
+    Args:
+        db: The order database
+        orders: The order documents as inserted
+    """
+    increments: Dict[str, Dict[Any, Dict[str, Any]]] = {
+        DAILY_STATS: defaultdict(Counter),
+        USER_STATS: defaultdict(Counter),
+        STATUS_STATS: defaultdict(Counter),
+    }
+    for order in orders:
+        totals = _totals(order)
+        by_creation = {**totals, f"by_status.{order['status']}": 1}
+        increments[DAILY_STATS][_day(order)].update(by_creation)
+        increments[USER_STATS][order["user_id"]].update(by_creation)
+        increments[STATUS_STATS][order["status"]].update(totals)
+
+    try:
+        await asyncio.gather(
+            *(
+                db[collection].bulk_write(
+                    [
+                        UpdateOne({"_id": key}, {"$inc": dict(inc)}, upsert=True)
+                        for key, inc in by_key.items()
+                    ],
+                    ordered=False,
+                )
+                for collection, by_key in increments.items()
+                if by_key
+            )
+        )
+    except Exception as e:
+        logger.error(f"Failed to update rollups for {len(orders)} orders: {str(e)}")
+
+
+async def record_status_change(
+    db: AsyncIOMotorDatabase, order: Dict[str, Any], new_status: str
+):
+    """
+    Move an order from its current status to new_status in the rollups.
+
+    Args:
+        db: The order database
+        order: The order document before the status change
+        new_status: The status the order was changed to
+    """
+    old_status = order["status"]
+    if old_status == new_status:
+        return
+
+    status_moves = {f"by_status.{old_status}": -1, f"by_status.{new_status}": 1}
+    try:
+        await asyncio.gather(
+            db[DAILY_STATS].update_one(
+                {"_id": _day(order)}, {"$inc": status_moves}, upsert=True
+            ),
+            db[USER_STATS].update_one(
+                {"_id": order["user_id"]}, {"$inc": status_moves}, upsert=True
+            ),
+            db[STATUS_STATS].update_one(
+                {"_id": old_status}, {"$inc": _totals(order, -1)}, upsert=True
+            ),
+            db[STATUS_STATS].update_one(
+                {"_id": new_status}, {"$inc": _totals(order)}, upsert=True
+            ),
+        )
+    except Exception as e:
+        logger.error(f"Failed to update rollups for order {order['_id']}: {str(e)}")
+
+
+def _grouped_pipeline(key: str, output: str) -> List[Dict[str, Any]]:
+    """Group orders by key, with a by_status breakdown, into output."""
+    return [
+        {
+            "$group": {
+                "_id": {"key": key, "status": "$status"},
+                "order_count": {"$sum": 1},
+                "item_count": {"$sum": {"$sum": "$items.quantity"}},
+                "revenue": {"$sum": "$total_price"},
+            }
+        },
+        {
+            "$group": {
+                "_id": "$_id.key",
+                "order_count": {"$sum": "$order_count"},
+                "item_count": {"$sum": "$item_count"},
+                "revenue": {"$sum": "$revenue"},
+                "by_status": {"$push": {"k": "$_id.status", "v": "$order_count"}},
+            }
+        },
+        {"$addFields": {"by_status": {"$arrayToObject": "$by_status"}}},
+        {"$out": output},
+    ]
+
+
+ROLLUP_PIPELINES: Dict[str, List[Dict[str, Any]]] = {
+    DAILY_STATS: _grouped_pipeline(
+        {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+        DAILY_STATS,
+    ),
+    USER_STATS: _grouped_pipeline("$user_id", USER_STATS),
+    STATUS_STATS: [
+        {
+            "$group": {
+                "_id": "$status",
+                "order_count": {"$sum": 1},
+                "item_count": {"$sum": {"$sum": "$items.quantity"}},
+                "revenue": {"$sum": "$total_price"},
+            }
+        },
+        {"$out": STATUS_STATS},
+    ],
+}
+
+
+async def rebuild_order_stats(db: AsyncIOMotorDatabase) -> Dict[str, int]:
+    """
+    Recompute every rollup collection from the orders collection.
+
+    Each pipeline ends in $out, which replaces its rollup collection
+    atomically. Orders written while a rebuild runs may be missed or counted
+    twice, so rebuild when order traffic is low.
+
+    Returns:
+        Dict[str, int]: The number of rollup documents per collection
+    """
+    counts = {}
+    for collection, pipeline in ROLLUP_PIPELINES.items():
+        await db["orders"].aggregate(pipeline).to_list(length=None)
+        counts[collection] = await db[collection].count_documents({})
+        logger.info(f"Rebuilt {collection} with {counts[collection]} documents")
+    return counts
+
+
+if __name__ == "__main__":
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from app.core.config import settings
+
+    async def main():
+        client = AsyncIOMotorClient(settings.MONGODB_URI)
+        try:
+            print(await rebuild_order_stats(client[settings.MONGODB_DB]))
+        finally:
+            client.close()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Awaitable, Callable, Dict, List
+
+from app.core.config import settings
+from app.models.order import OrderCreate, OrderItem
+from app.services.inventory import inventory_service
+from app.services.product import product_service
+from app.services.user import user_service
+
+logger = logging.getLogger(__name__)
+
+
+class OrderValidationError(Exception):
+    """Raised when an order fails one of its upstream checks."""
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class OrderValidationTimeout(Exception):
+    """Raised when the upstream checks do not finish within the deadline."""
+
+
+async def _check_user(user_id: str) -> None:
+    if not await user_service.verify_user(user_id):
+        raise OrderValidationError("Invalid user ID")
+
+
+async def _check_products(items: List[OrderItem]) -> None:
+    if not await product_service.verify_products(items):
+        raise OrderValidationError(
+            "One or more products are invalid or have incorrect prices"
+        )
+
+
+async def _check_inventory(items: List[OrderItem]) -> None:
+    availability = await inventory_service.check_inventory_batch(
+        [(item.product_id, item.quantity) for item in items]
+    )
+    unavailable_items = [
+        f"Product {item.product_id} (quantity: {item.quantity})"
+        for item in items
+        if not availability.get(item.product_id, False)
+    ]
+    if unavailable_items:
+        raise OrderValidationError(
+            f"Insufficient inventory for: {', '.join(unavailable_items)}"
+        )
+
+
+async def validate_order(order: OrderCreate) -> None:
+    """
+    Run the user, product and inventory checks for an order concurrently.
+
+    The whole stage must finish within ORDER_VALIDATION_TIMEOUT seconds. The
+    first failing check cancels the ones still running.
+
+    Raises:
+        OrderValidationError: If any check fails
+        OrderValidationTimeout: If the deadline expires first
+    """
+    checks: List[Callable[[], Awaitable[None]]] = [
+        partial(_check_user, order.user_id),
+        partial(_check_products, order.items),
+        partial(_check_inventory, order.items),
+    ]
+
+    logger.info(f"Validating order with {len(checks)} upstream checks")
+    tasks = [asyncio.ensure_future(check()) for check in checks]
+
+    try:
+        done, pending = await asyncio.wait(
+            tasks,
+            timeout=settings.ORDER_VALIDATION_TIMEOUT,
+            return_when=asyncio.FIRST_EXCEPTION,
+        )
+    finally:
+        unfinished = [task for task in tasks if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+    for task in done:
+        if task.exception() is not None:
+            raise task.exception()
+
+    if pending:
+        raise OrderValidationTimeout(
+            f"Order validation did not finish within "
+            f"{settings.ORDER_VALIDATION_TIMEOUT} seconds"
+        )
+
+
+async def _validate_orders_bulk(orders: List[OrderCreate]) -> Dict[int, str]:
+    semaphore = asyncio.Semaphore(settings.ORDER_VALIDATION_CONCURRENCY)
+
+    async def verify_user(user_id: str) -> bool:
+        async with semaphore:
+            return await user_service.verify_user(user_id)
+
+    # Every user and product is looked up once, however many orders use it
+    user_ids = list(dict.fromkeys(order.user_id for order in orders))
+    product_ids = list(
+        dict.fromkeys(item.product_id for order in orders for item in order.items)
+    )
+    user_results, products, levels = await asyncio.gather(
+        asyncio.gather(*(verify_user(user_id) for user_id in user_ids)),
+        product_service.get_products(product_ids),
+        inventory_service.get_inventory_levels(product_ids),
+    )
+    valid_users = dict(zip(user_ids, user_results))
+
+    errors: Dict[int, str] = {}
+    for index, order in enumerate(orders):
+        if not valid_users[order.user_id]:
+            errors[index] = "Invalid user ID"
+        elif not await product_service.verify_products(order.items, products):
+            errors[index] = "One or more products are invalid or have incorrect prices"
+
+    # Allocate the available stock to the remaining orders in request order,
+    # so the batch as a whole never asks for more than there is
+    remaining = dict(levels)
+    for index, order in enumerate(orders):
+        if index in errors:
+            continue
+
+        requested: Dict[str, int] = {}
+        for item in order.items:
+            requested[item.product_id] = (
+                requested.get(item.product_id, 0) + item.quantity
+            )
+
+        unavailable_items = [
+            f"Product {product_id} (quantity: {quantity})"
+            for product_id, quantity in requested.items()
+            if (remaining.get(product_id) or 0) < quantity
+        ]
+        if unavailable_items:
+            errors[index] = (
+                f"Insufficient inventory for: {', '.join(unavailable_items)}"
+            )
+            continue
+
+        for product_id, quantity in requested.items():
+            remaining[product_id] -= quantity
+
+    return errors
+
+
+async def validate_orders_bulk(orders: List[OrderCreate]) -> Dict[int, str]:
+    """
+    Run the user, product and inventory checks for a batch of orders.
+
+    Users and products are deduplicated across the batch, and inventory is
+    checked per product in aggregate: the available stock is allocated to
+    the orders in request order, and orders that no longer fit fail. The
+    whole stage must finish within ORDER_BULK_VALIDATION_TIMEOUT seconds.
+
+    Returns:
+        Dict[int, str]: Error message keyed by the index of each failed order
+
+    Raises:
+        OrderValidationTimeout: If the deadline expires first
+    """
+    logger.info(f"Validating {len(orders)} orders in bulk")
+    try:
+        return await asyncio.wait_for(
+            _validate_orders_bulk(orders),
+            timeout=settings.ORDER_BULK_VALIDATION_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        raise OrderValidationTimeout(
+            f"Bulk order validation did not finish within "
+            f"{settings.ORDER_BULK_VALIDATION_TIMEOUT} seconds"
+        )
@@ -0,0 +1,90 @@
+from app.core.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def _breaker(**kwargs):
+    options = dict(window=10, min_calls=4, open_seconds=30, half_open_calls=2)
+    options.update(kwargs)
+    return CircuitBreaker("upstream", **options)
+
+
+def _call(breaker, failed=False, latency=0.01):
+    assert breaker.allow_request()
+    breaker.record(failed, latency)
+
+
+def test_breaker_waits_for_min_calls_before_opening(clock):
+    breaker = _breaker()
+
+    for _ in range(3):
+        _call(breaker, failed=True)
+    assert breaker.state == CLOSED
+
+    _call(breaker, failed=True)
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_breaker_stays_closed_below_the_failure_rate(clock):
+    breaker = _breaker()
+
+    for failed in (True, False, False, False, False):
+        _call(breaker, failed=failed)
+
+    assert breaker.state == CLOSED
+    assert breaker.stats()["failure_rate"] == 0.2
+
+
+def test_slow_calls_open_the_breaker(clock):
+    breaker = _breaker(slow_call_seconds=1.0)
+
+    for _ in range(4):
+        _call(breaker, latency=1.5)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["slow_calls"] == 4
+
+
+def test_successful_probes_close_the_breaker(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, failed=True)
+
+    clock.advance(30)
+    _call(breaker)
+    assert breaker.state == HALF_OPEN
+    _call(breaker)
+
+    assert breaker.state == CLOSED
+    # The failures from before it opened are forgotten
+    assert breaker.stats()["failure_rate"] == 0.0
+
+
+def test_a_failed_probe_opens_the_breaker_again(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, failed=True)
+
+    clock.advance(30)
+    _call(breaker, failed=True)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+    assert not breaker.allow_request()
+
+
+def test_probes_that_never_report_back_do_not_wedge_the_breaker(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        _call(breaker, failed=True)
+
+    clock.advance(30)
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+    # Both probes are in flight, so no more calls are let through...
+    assert not breaker.allow_request()
+
+    # ...until open_seconds pass without their outcome
+    clock.advance(30)
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
@@ -0,0 +1,60 @@
+from app.core.cache import MISSING, TTLCache
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+
+    clock.advance(59)
+    assert cache.get("a") == 1
+    clock.advance(1)
+    assert cache.get("a") is MISSING
+
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_none_is_cached_as_a_negative_result(clock):
+    cache = TTLCache(maxsize=10, ttl=60, negative_ttl=5)
+    cache.set("a", None)
+
+    assert cache.get("a") is None
+    clock.advance(5)
+    assert cache.get("a") is MISSING
+
+
+def test_a_zero_ttl_disables_caching(clock):
+    cache = TTLCache(maxsize=10, ttl=60, negative_ttl=0)
+    cache.set("a", None)
+    assert cache.get("a") is MISSING
+
+    cache = TTLCache(maxsize=10, ttl=0)
+    cache.set("a", 1)
+    assert cache.get("a") is MISSING
+
+
+def test_the_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_and_clear(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.invalidate("a") is True
+    assert cache.invalidate("a") is False
+    assert cache.get("a") is MISSING
+
+    cache.clear()
+    assert cache.get("b") is MISSING
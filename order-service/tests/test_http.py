@@ -0,0 +1,208 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.http import CircuitOpenError, ServiceClient, _registry
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_RETRY_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "HTTP_RETRY_BACKOFF_BASE", 0)
+    monkeypatch.setattr(settings, "HTTP_RETRY_BACKOFF_MAX", 0)
+    monkeypatch.setattr(settings, "HTTP_COALESCING_ENABLED", True)
+
+
+@pytest.fixture
+def upstream():
+    """A ServiceClient whose requests are answered by upstream.handler."""
+    service_client = ServiceClient("http://upstream", name="upstream")
+    service_client.calls = []
+
+    async def handle(request):
+        service_client.calls.append(request)
+        return await service_client.handler(request)
+
+    service_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+    yield service_client
+    _registry.remove(service_client)
+
+
+def _responses(*statuses):
+    """Answer each call with the next status, repeating the last one."""
+    statuses = list(statuses)
+
+    async def handler(request):
+        status_code = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        return httpx.Response(status_code, json={"status": status_code})
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_idempotent_requests_are_retried(upstream):
+    upstream.handler = _responses(503, 502, 200)
+
+    response = await upstream.request("GET", "/items")
+
+    assert response.status_code == 200
+    assert len(upstream.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_after_the_last_attempt(upstream):
+    upstream.handler = _responses(503)
+
+    response = await upstream.request("GET", "/items")
+
+    assert response.status_code == 503
+    assert len(upstream.calls) == settings.HTTP_RETRY_ATTEMPTS
+
+
+@pytest.mark.asyncio
+async def test_other_errors_are_not_retried(upstream):
+    upstream.handler = _responses(500, 200)
+
+    response = await upstream.request("GET", "/items")
+
+    assert response.status_code == 500
+    assert len(upstream.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_posts_are_retried_only_when_marked_idempotent(upstream):
+    upstream.handler = _responses(503)
+    response = await upstream.request("POST", "/items", json={})
+    assert response.status_code == 503
+    assert len(upstream.calls) == 1
+
+    upstream.handler = _responses(503, 200)
+    response = await upstream.request("POST", "/items", idempotent=True, json={})
+    assert response.status_code == 200
+    assert len(upstream.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_network_errors_are_retried_then_raised(upstream):
+    async def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    upstream.handler = handler
+
+    with pytest.raises(httpx.ConnectError):
+        await upstream.request("GET", "/items")
+    assert len(upstream.calls) == settings.HTTP_RETRY_ATTEMPTS
+
+
+@pytest.mark.asyncio
+async def test_an_open_breaker_rejects_requests_without_calling(upstream):
+    upstream.handler = _responses(200)
+    for _ in range(upstream.breaker.min_calls):
+        upstream.breaker.record(True, 0.0)
+
+    with pytest.raises(CircuitOpenError):
+        await upstream.request("GET", "/items")
+    assert upstream.calls == []
+
+
+def _held(status_code=200):
+    """A handler that answers only once release is set."""
+    release = asyncio.Event()
+
+    async def handler(request):
+        await release.wait()
+        return httpx.Response(status_code, json={"path": request.url.path})
+
+    return handler, release
+
+
+async def _concurrently(release, *requests):
+    tasks = [asyncio.ensure_future(request) for request in requests]
+    await asyncio.sleep(0)
+    release.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_gets_share_one_call(upstream):
+    upstream.handler, release = _held()
+
+    responses = await _concurrently(
+        release,
+        *(upstream.request("GET", "/items", params={"id": "a"}) for _ in range(3)),
+    )
+
+    assert [response.json() for response in responses] == [{"path": "/items"}] * 3
+    assert len(upstream.calls) == 1
+    assert upstream.coalescing_stats() == {
+        "coalescable": 3,
+        "coalesced": 2,
+        "coalesce_rate": 0.6667,
+        "in_flight": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_different_requests_are_not_coalesced(upstream):
+    upstream.handler, release = _held()
+
+    await _concurrently(
+        release,
+        upstream.request("GET", "/items", params={"id": "a"}),
+        upstream.request("GET", "/items", params={"id": "b"}),
+        upstream.request("GET", "/items", params={"id": "a"}, coalesce=False),
+        upstream.request("POST", "/items", json={"id": "a"}),
+        upstream.request("POST", "/items", json={"id": "a"}),
+    )
+
+    assert len(upstream.calls) == 5
+    assert upstream.coalesced == 0
+
+
+@pytest.mark.asyncio
+async def test_coalescing_can_be_switched_off(upstream, monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_COALESCING_ENABLED", False)
+    upstream.handler, release = _held()
+
+    await _concurrently(
+        release, upstream.request("GET", "/items"), upstream.request("GET", "/items")
+    )
+
+    assert len(upstream.calls) == 2
+    assert upstream.coalescable == 0
+
+
+@pytest.mark.asyncio
+async def test_a_shared_call_error_reaches_every_caller(upstream):
+    release = asyncio.Event()
+
+    async def handler(request):
+        await release.wait()
+        raise httpx.ConnectError("connection refused", request=request)
+
+    upstream.handler = handler
+    results = await _concurrently(
+        release, upstream.request("GET", "/items"), upstream.request("GET", "/items")
+    )
+
+    assert [type(result) for result in results] == [httpx.ConnectError] * 2
+    # Retried as a whole once, not once per caller
+    assert len(upstream.calls) == settings.HTTP_RETRY_ATTEMPTS
+
+
+@pytest.mark.asyncio
+async def test_a_cancelled_caller_does_not_cancel_the_shared_call(upstream):
+    upstream.handler, release = _held()
+
+    first = asyncio.ensure_future(upstream.request("GET", "/items"))
+    second = asyncio.ensure_future(upstream.request("GET", "/items"))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    response = await second
+    assert response.status_code == 200
+    assert first.cancelled()
+    assert len(upstream.calls) == 1
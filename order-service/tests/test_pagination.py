@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.api.pagination import apply_cursor, decode_cursor, encode_cursor, next_cursor
+
+
+def _document(**kwargs):
+    document = {"_id": ObjectId(), "created_at": datetime(2024, 5, 1, 12, 30, 15, 250)}
+    document.update(kwargs)
+    return document
+
+
+def test_cursor_round_trips():
+    document = _document()
+
+    cursor = encode_cursor(document)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == {
+        "created_at": document["created_at"],
+        "_id": document["_id"],
+    }
+
+
+@pytest.mark.parametrize(
+    "cursor", ["not a cursor", "e30", encode_cursor(_document())[:-4]]
+)
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+def test_apply_cursor_restricts_the_query_to_later_pages():
+    document = _document()
+    query = {"user_id": "user-1"}
+
+    apply_cursor(query, encode_cursor(document), skip=0)
+
+    assert query == {
+        "user_id": "user-1",
+        "$or": [
+            {"created_at": {"$lt": document["created_at"]}},
+            {"created_at": document["created_at"], "_id": {"$lt": document["_id"]}},
+        ],
+    }
+
+
+def test_apply_cursor_without_a_cursor_leaves_the_query_alone():
+    query = {}
+    apply_cursor(query, None, skip=20)
+    assert query == {}
+
+
+def test_skip_cannot_be_combined_with_a_cursor():
+    with pytest.raises(HTTPException) as e:
+        apply_cursor({}, encode_cursor(_document()), skip=20)
+    assert e.value.status_code == 400
+
+
+def test_next_cursor_points_past_the_last_document_of_a_full_page():
+    documents = [_document(), _document()]
+
+    assert next_cursor(documents, limit=2) == encode_cursor(documents[-1])
+    assert next_cursor(documents, limit=3) is None
@@ -0,0 +1,102 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import serialization
+from app.api.serialization import DocumentSerializer, dumps, use_fast_serialization
+from app.core.config import settings
+from app.models.order import OrderResponse
+
+
+def _order(**kwargs):
+    order = {
+        "_id": ObjectId(),
+        "user_id": "user-1",
+        "items": [
+            {"product_id": str(ObjectId()), "quantity": 2, "price": Decimal("9.99")},
+            {"product_id": str(ObjectId()), "quantity": 1, "price": Decimal("120.50")},
+        ],
+        "total_price": Decimal("140.48"),
+        "status": "pending",
+        "inventory_status": "reserved",
+        "shipping_address": {
+            "line1": "1 Main St",
+            "city": "Springfield",
+            "state": "IL",
+            "postal_code": "62701",
+            "country": "US",
+        },
+        "created_at": datetime(2024, 5, 1, 12, 30, 15, 250000),
+        "updated_at": datetime(2024, 5, 1, 12, 31),
+    }
+    order.update(kwargs)
+    return order
+
+
+def _client(documents):
+    """An app serving documents both through the response_model and fast."""
+    app = FastAPI()
+    serializer = DocumentSerializer(OrderResponse)
+
+    @app.get("/model", response_model=List[OrderResponse])
+    async def model():
+        return documents
+
+    @app.get("/fast")
+    async def fast():
+        return serializer.response(documents)
+
+    @app.get("/fast/first")
+    async def fast_first():
+        return serializer.response(documents[0])
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "order",
+    [
+        _order(),
+        # Optional fields missing from older documents take their defaults
+        _order(inventory_status=None),
+        {key: value for key, value in _order().items() if key != "inventory_status"},
+    ],
+)
+def test_fast_serialization_matches_the_response_model(order):
+    client = _client([order])
+
+    expected = client.get("/model").json()
+
+    assert client.get("/fast").json() == expected
+    assert client.get("/fast/first").json() == expected[0]
+
+
+def test_fast_serialization_keeps_decimals_exact():
+    order = _order(total_price=Decimal("0.10"))
+
+    body = DocumentSerializer(OrderResponse).to_dict(order)
+
+    assert body["total_price"] == "0.10"
+    assert body["items"][0]["price"] == "9.99"
+    assert body["_id"] == str(order["_id"])
+
+
+def test_dumps_falls_back_to_the_json_module(monkeypatch):
+    content = {"created_at": datetime(2024, 5, 1, 12, 30), "total": "1.00"}
+    expected = dumps(content)
+
+    monkeypatch.setattr(serialization, "orjson", None)
+
+    assert dumps(content) == expected
+
+
+def test_fast_serialization_is_opt_in_per_route(monkeypatch):
+    monkeypatch.setattr(settings, "FAST_SERIALIZATION_ROUTES", ["get_orders"])
+
+    assert use_fast_serialization("get_orders")
+    assert not use_fast_serialization("get_order")
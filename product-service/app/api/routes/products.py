@@ -1,10 +1,29 @@
 import logging
 from fastapi import APIRouter, Depends, Query, HTTPException, Path
-from app.models.product import ProductResponse, ProductCreate, PyObjectId, ProductUpdate
+from app.models.product import (
+    ProductBatchResponse,
+    ProductResponse,
+    ProductCreate,
+    PyObjectId,
+    ProductUpdate,
+)
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.api.dependencies import get_db, get_current_user
+from app.api.serialization import (
+    DocumentSerializer,
+    json_response,
+    use_fast_serialization,
+)
 from typing import List, Optional, Dict, Any
+from app.services.events import (
+    PRODUCT_CREATED,
+    PRODUCT_DELETED,
+    PRODUCT_UPDATED,
+    product_events,
+)
 from app.services.inventory_service import inventory_service
+from app.core.config import settings
+from bson import ObjectId
 from pymongo import ReturnDocument
 
 # Configure logger
@@ -13,6 +32,8 @@ logger = logging.getLogger(__name__)
 # Create router
 router = APIRouter(prefix="", tags=["Products"])
 
+PRODUCT_SERIALIZER = DocumentSerializer(ProductResponse)
+
 
 @router.post("/", response_model=ProductResponse, status_code=201)
 async def create_product(
@@ -24,6 +45,8 @@ async def create_product(
     Create a new product and automatically create inventory for it.
     """
     product_dict = product.dict()
+    # Bumped on every change and carried in change events
+    product_dict["version"] = 1
 
     result = await db["products"].insert_one(product_dict)
     print(f"result is: {result}")
@@ -36,6 +59,9 @@ async def create_product(
 
     logger.info(f"Created product: {result.inserted_id}")
 
+    # Consumers may have cached a 404 for this ID
+    await product_events.publish(str(result.inserted_id), PRODUCT_CREATED, 1)
+
     # Automatically create inventory for the new product
     # try:
     #     # Use the product's quantity as the initial inventory
@@ -85,9 +111,58 @@ async def get_products(
     cursor = db["products"].find(query).skip(skip).limit(limit)
     products = await cursor.to_list(length=limit)
 
+    if use_fast_serialization("get_products"):
+        return PRODUCT_SERIALIZER.response(products)
     return products
 
 
+@router.get("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    ids: List[str] = Query(
+        ..., description="Product IDs, comma-separated or as repeated parameters"
+    ),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+):
+    """
+    Get several products by ID with a single query.
+
+    Returns the products that were found keyed by ID, and the IDs that were
+    not found (including malformed ones).
+    """
+    product_ids = list(
+        dict.fromkeys(
+            pid.strip() for value in ids for pid in value.split(",") if pid.strip()
+        )
+    )
+    if len(product_ids) > settings.PRODUCT_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.PRODUCT_BATCH_MAX_IDS} product IDs can be requested at once",
+        )
+
+    object_ids = {ObjectId(pid): pid for pid in product_ids if ObjectId.is_valid(pid)}
+    projection = {field: 1 for field in ProductResponse.__fields__ if field != "id"}
+    cursor = db["products"].find({"_id": {"$in": list(object_ids)}}, projection)
+
+    products = {}
+    async for product in cursor:
+        products[object_ids[product["_id"]]] = product
+
+    missing = [pid for pid in product_ids if pid not in products]
+
+    if use_fast_serialization("get_products_batch"):
+        return json_response(
+            {
+                "products": {
+                    pid: PRODUCT_SERIALIZER.to_dict(product)
+                    for pid, product in products.items()
+                },
+                "missing": missing,
+            }
+        )
+    return {"products": products, "missing": missing}
+
+
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: str = Path(..., description="The ID of the product to retrieve"),
@@ -103,6 +178,8 @@ async def get_product(
 
     product = await db["products"].find_one({"_id": product_obj_id})
     if product:
+        if use_fast_serialization("get_product"):
+            return PRODUCT_SERIALIZER.response(product)
         return product
 
     raise HTTPException(
@@ -131,12 +208,15 @@ async def update_product(
 
     product = await db["products"].find_one_and_update(
         {"_id": product_obj_id},
-        {"$set": update_data},
+        {"$set": update_data, "$inc": {"version": 1}},
         return_document=ReturnDocument.AFTER,
     )
 
     if product:
         logger.info(f"Updated product: {product_id}")
+        await product_events.publish(
+            product_id, PRODUCT_UPDATED, product["version"], update_data
+        )
         return product
 
     raise HTTPException(
@@ -158,9 +238,14 @@ async def delete_product(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid product ID format")
 
-    result = await db["products"].delete_one({"_id": product_obj_id})
-    if result.deleted_count:
+    deleted = await db["products"].find_one_and_delete(
+        {"_id": product_obj_id}, projection={"version": 1}
+    )
+    if deleted:
         logger.info(f"Deleted product: {product_id}")
+        await product_events.publish(
+            product_id, PRODUCT_DELETED, deleted.get("version", 0) + 1
+        )
         return None
 
     raise HTTPException(
@@ -0,0 +1,117 @@
+# Shared module: order-service/app/api/serialization.py is the source of truth.
+# Each service is built from its own directory, so it is copied into product-service.
+# Change it there and copy it over; the copies must stay identical.
+
+import json
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from bson import ObjectId
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+    logger.warning("orjson is not installed; fast serialization uses the json module")
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content as JSON with orjson, or the json module without it."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_json_default, separators=(",", ":")).encode()
+
+
+def json_response(
+    body: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Build a raw JSON response; returning it bypasses the response_model."""
+    return Response(
+        content=dumps(body),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def use_fast_serialization(route: str) -> bool:
+    """Return whether a route is switched to the fast serialization path."""
+    return route in settings.FAST_SERIALIZATION_ROUTES
+
+
+class DocumentSerializer:
+    """
+    Converts documents read from our own database into a response model's
+    JSON shape without validating them.
+
+    The field mapping is compiled once from the model: each field gets its
+    source key (the alias, as stored in Mongo), a default and a converter
+    that produces what the model's JSON encoding would (ObjectId and Decimal
+    fields as strings, nested models recursively). Fields that need no
+    conversion are copied as they are.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._fields: List[Tuple[str, Any, Optional[Callable[[Any], Any]]]] = [
+            (field.alias, field.default, self._converter(field))
+            for field in model.__fields__.values()
+        ]
+
+    @classmethod
+    def _converter(cls, field) -> Optional[Callable[[Any], Any]]:
+        type_ = field.type_
+        if isinstance(type_, type) and issubclass(type_, BaseModel):
+            convert = DocumentSerializer(type_).to_dict
+        elif isinstance(type_, type) and issubclass(type_, (ObjectId, Decimal)):
+            convert = str
+        elif type_ is float:
+            convert = float
+        else:
+            return None
+
+        if field.shape == SHAPE_LIST:
+            return lambda values: [convert(value) for value in values]
+        if field.shape == SHAPE_SINGLETON:
+            return convert
+        return None
+
+    def to_dict(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert one document."""
+        result = {}
+        for key, default, convert in self._fields:
+            value = document.get(key, default)
+            if convert is not None and value is not None:
+                value = convert(value)
+            result[key] = value
+        return result
+
+    def response(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        """
+        Build a raw JSON response from one document or an iterable of them.
+        """
+        if isinstance(content, dict):
+            body = self.to_dict(content)
+        else:
+            body = [self.to_dict(document) for document in content]
+        return json_response(body, status_code, headers)
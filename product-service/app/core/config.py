@@ -1,5 +1,5 @@
 import os
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseSettings, validator, AnyHttpUrl
 
 
@@ -13,9 +13,50 @@ class Settings(BaseSettings):
     MONGODB_URI: str = "mongodb://localhost:27017"
     MONGODB_DB: str = "product_db"
 
+    # Maximum number of IDs accepted by GET /batch
+    PRODUCT_BATCH_MAX_IDS: int = 300
+
+    # Routes that skip response-model validation and encode the documents
+    # read from the database directly (see app/api/serialization.py). Off
+    # by default; supported: get_products, get_products_batch, get_product, e.g.
+    # FAST_SERIALIZATION_ROUTES='["get_products"]'
+    FAST_SERIALIZATION_ROUTES: List[str] = []
+
+    # Product change events, published on a Redis pub/sub channel so that
+    # consumers can invalidate their caches; disabled when REDIS_URL is unset
+    REDIS_URL: Optional[str] = None
+    PRODUCT_EVENTS_CHANNEL: str = "product:changes"
+    PRODUCT_EVENTS_TIMEOUT: float = 1.0  # seconds
+
     # Service URLs
     INVENTORY_SERVICE_URL: Optional[AnyHttpUrl] = None
 
+    # HTTP client pool settings (shared by all inter-service clients)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    HTTP_TIMEOUT: float = 5.0  # seconds
+    HTTP_CONNECT_TIMEOUT: float = 2.0  # seconds
+    HTTP2_ENABLED: bool = False  # requires the 'h2' package
+
+    # Retries of idempotent inter-service requests
+    HTTP_RETRY_ATTEMPTS: int = 3
+    HTTP_RETRY_BACKOFF_BASE: float = 0.1  # seconds, doubled per attempt, jittered
+    HTTP_RETRY_BACKOFF_MAX: float = 1.0  # seconds
+    HTTP_RETRY_BUDGET: float = 5.0  # seconds for all attempts of one request
+
+    # Share one upstream call between identical concurrent requests
+    HTTP_COALESCING_ENABLED: bool = True
+
+    # Circuit breaker per upstream service
+    BREAKER_WINDOW: int = 20  # most recent calls considered
+    BREAKER_MIN_CALLS: int = 10  # calls needed in the window before tripping
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_SLOW_CALL_RATE: float = 0.5
+    BREAKER_SLOW_CALL_SECONDS: float = 2.0
+    BREAKER_OPEN_SECONDS: float = 30.0  # before probing again
+    BREAKER_HALF_OPEN_CALLS: int = 3  # probe calls that must succeed to close
+
     # JWT Auth settings (for testing/development)
     SECRET_KEY: str = "development-secret-key"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
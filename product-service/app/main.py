@@ -4,6 +4,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import products
 from app.core.config import settings
 from app.db.mongodb import close_mongo_connection, connect_to_mongo
+from app.services.events import product_events
+from app.services.http import (
+    breaker_stats,
+    close_http_clients,
+    coalescing_stats,
+    start_http_clients,
+)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -29,7 +36,11 @@ app.include_router(products.router, prefix=settings.API_PREFIX)
 
 # Register startup and shutdown events
 app.add_event_handler("startup", connect_to_mongo)
+app.add_event_handler("startup", start_http_clients)
+app.add_event_handler("startup", product_events.connect)
 app.add_event_handler("shutdown", close_mongo_connection)
+app.add_event_handler("shutdown", close_http_clients)
+app.add_event_handler("shutdown", product_events.close)
 
 
 # Health check endpoint
@@ -38,6 +49,16 @@ async def health_check():
     return {"status": "ok", "service": "product-service"}
 
 
+# Metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    return {
+        "circuit_breakers": breaker_stats(),
+        "request_coalescing": coalescing_stats(),
+        "product_events": product_events.stats(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from bson import ObjectId
 from pydantic import BaseModel, Field, validator
 
@@ -59,6 +59,16 @@ class ProductResponse(ProductBase):
         json_encoders = {ObjectId: str}
 
 
+class ProductBatchResponse(BaseModel):
+    """Model for a bulk product lookup."""
+
+    products: Dict[str, ProductResponse]
+    missing: List[str]
+
+    class Config:
+        json_encoders = {ObjectId: str}
+
+
 class ProductUpdate(BaseModel):
     """Model for partial updates to a product."""
 
@@ -0,0 +1,111 @@
+import json
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # pragma: no cover - redis is optional
+    redis = None
+
+PRODUCT_CREATED = "created"
+PRODUCT_UPDATED = "updated"
+PRODUCT_DELETED = "deleted"
+
+
+class ProductEventPublisher:
+    """
+    Publishes product change events on a Redis pub/sub channel.
+
+    Each event is a JSON object with the product_id, the event type, the
+    fields that changed and the product's version after the change, so that
+    consumers can evict or refresh their cached copies. Publishing is best
+    effort: failures are logged and never fail the write that caused them,
+    and consumers keep their cache TTLs as the fallback.
+    """
+
+    def __init__(self, url: Optional[str], channel: str):
+        self.url = url
+        self.channel = channel
+        self.client = None
+        self.published = 0
+        self.failed = 0
+
+    async def connect(self):
+        """Create the Redis client; events are disabled without REDIS_URL."""
+        if not self.url:
+            logger.info("REDIS_URL is not set; product change events are disabled")
+            return
+        if redis is None:
+            logger.warning("redis is not installed; product change events are disabled")
+            return
+        self.client = redis.from_url(
+            self.url,
+            socket_timeout=settings.PRODUCT_EVENTS_TIMEOUT,
+            socket_connect_timeout=settings.PRODUCT_EVENTS_TIMEOUT,
+        )
+
+    async def close(self):
+        """Close the Redis client."""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def publish(
+        self,
+        product_id: str,
+        event: str,
+        version: Optional[int],
+        fields: Iterable[str] = (),
+    ) -> bool:
+        """
+        Publish a change to one product.
+
+        Args:
+            product_id: The ID of the product
+            event: PRODUCT_CREATED, PRODUCT_UPDATED or PRODUCT_DELETED
+            version: The product's version after the change
+            fields: The names of the fields that changed
+
+        Returns:
+            bool: True if the event was published
+        """
+        if self.client is None:
+            return False
+
+        message = json.dumps(
+            {
+                "product_id": product_id,
+                "event": event,
+                "fields": list(fields),
+                "version": version,
+                "at": datetime.utcnow().isoformat(),
+            }
+        )
+        try:
+            await self.client.publish(self.channel, message)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Failed to publish {event} event for {product_id}: {str(e)}")
+            return False
+
+        self.published += 1
+        return True
+
+    def stats(self):
+        """Return publish counters."""
+        return {
+            "enabled": self.client is not None,
+            "channel": self.channel,
+            "published": self.published,
+            "failed": self.failed,
+        }
+
+
+product_events = ProductEventPublisher(
+    settings.REDIS_URL, settings.PRODUCT_EVENTS_CHANNEL
+)
@@ -0,0 +1,107 @@
+from bson import ObjectId
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import get_db
+from app.api.routes import products
+from app.core.config import settings
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def skip(self, skip):
+        return FakeCursor(self.documents[skip:])
+
+    def limit(self, limit):
+        return FakeCursor(self.documents[:limit])
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for the product read routes."""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query, projection=None):
+        ids = query.get("_id", {}).get("$in")
+        return FakeCursor(
+            [
+                dict(document)
+                for document in self.documents
+                if ids is None or document["_id"] in ids
+            ]
+        )
+
+    async def find_one(self, query):
+        for document in self.documents:
+            if document["_id"] == query["_id"]:
+                return dict(document)
+        return None
+
+
+PRODUCTS = [
+    {
+        "_id": ObjectId(),
+        "name": "Smartphone X",
+        "description": "Latest model",
+        "category": "Electronics",
+        "price": 699.99,
+        "quantity": 50,
+        "version": 3,
+    },
+    {
+        # Stored as an int, returned as a float
+        "_id": ObjectId(),
+        "name": "Cable",
+        "description": "USB-C",
+        "category": "Accessories",
+        "price": 10,
+        "quantity": 0,
+        "version": 1,
+    },
+]
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(products.router)
+    app.dependency_overrides[get_db] = lambda: {"products": FakeCollection(PRODUCTS)}
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "route, path",
+    [
+        ("get_products", "/"),
+        (
+            "get_products_batch",
+            f"/batch?ids={PRODUCTS[1]['_id']},{PRODUCTS[0]['_id']},bad",
+        ),
+        ("get_product", f"/{PRODUCTS[1]['_id']}"),
+    ],
+)
+def test_fast_serialization_matches_the_response_model(
+    client, monkeypatch, route, path
+):
+    monkeypatch.setattr(settings, "FAST_SERIALIZATION_ROUTES", [])
+    expected = client.get(path)
+
+    monkeypatch.setattr(settings, "FAST_SERIALIZATION_ROUTES", [route])
+    response = client.get(path)
+
+    assert response.status_code == expected.status_code == 200
+    assert response.json() == expected.json()